@@ -0,0 +1,344 @@
+"""Benchmarks of the list, export and sync commands against a fake kong.
+
+The fake kong admin api (`tests/fake_kong.py`) runs in a separate process, so
+its cpu time and memory do not show up in the measurements of the cli. For every
+dataset size and command the wall time (best of `--repeat`), the number of admin
+api requests and the peak memory (tracemalloc, separate run) are recorded.
+
+    python -m benchmarks.run --sizes 1000 --sizes 10000 --output bench.json
+    python -m benchmarks.run --sizes 1000 --sizes 10000 --compare bench.json
+
+Note: the fake kong keeps everything in memory, 1M consumers need several GiB.
+It is imported from the test suite, so run the benchmarks from the root of the
+repository, where the `tests` package is importable.
+"""
+from datetime import datetime, timezone
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+import os
+import platform
+import subprocess
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import tracemalloc
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import click
+from click.testing import CliRunner
+import pkg_resources
+import requests
+from tabulate import tabulate
+
+from kongcli._cli import cli
+from kongcli._util import _reset_cache, json_dumps, json_loads
+
+from tests.fake_kong import FakeKong
+
+Result = Dict[str, Any]
+
+CASES = (
+    "list consumers",
+    "list services",
+    "list routes",
+    "plugins list",
+    "export",
+    "config build",
+    "diff",
+)
+
+
+def seed(kong: FakeKong, size: int) -> None:
+    """Synthetic dataset with `size` consumers.
+
+    Every consumer has an acl group and a key-auth, every 4th a basic-auth and
+    every 10th a rate-limiting plugin; there is a service per 100 consumers with
+    two routes, each protected by an acl plugin.
+    """
+    consumers = [
+        {"id": str(uuid), "username": f"user-{i}", "custom_id": str(i)}
+        for i, uuid in enumerate(_uuids(1, size))
+    ]
+    kong.load("consumers", consumers)
+    kong.load(
+        "acls",
+        (
+            {"consumer": c["id"], "group": f"group-{i % 10}"}
+            for i, c in enumerate(consumers)
+        ),
+    )
+    kong.load("key-auths", ({"consumer": c["id"], "key": c["id"]} for c in consumers))
+    kong.load(
+        "basic-auths",
+        ({"consumer": c["id"], "username": c["username"]} for c in consumers[::4]),
+    )
+
+    services = [
+        {"id": str(uuid), "name": f"service-{i}", "host": f"upstream-{i}.local"}
+        for i, uuid in enumerate(_uuids(2, max(1, size // 100)))
+    ]
+    kong.load("services", services)
+    routes = [
+        {
+            "id": uuid,
+            "service": s["id"],
+            "name": f"{s['name']}-{j}",
+            "paths": [f"/{s['name']}/{j}"],
+        }
+        for (s, j), uuid in zip(
+            ((s, j) for s in services for j in range(2)), _uuids(3, 2 * len(services))
+        )
+    ]
+    kong.load("routes", routes)
+
+    plugins = [
+        {"name": "acl", "route": r["id"], "config": {"whitelist": ["group-0"]}}
+        for r in routes
+    ]
+    plugins += [
+        {"name": "rate-limiting", "consumer": c["id"], "config": {"minute": 60}}
+        for c in consumers[::10]
+    ]
+    kong.load("plugins", plugins)
+
+
+def _uuids(kind: int, count: int) -> List[str]:
+    # deterministic, so that results of different runs are comparable
+    return [f"{kind:08x}-0000-4000-8000-{i:012x}" for i in range(count)]
+
+
+def _serve(version: str, size: int, conn: Connection) -> None:
+    kong = FakeKong(version=version)
+    seed(kong, size)
+    with kong:
+        conn.send(kong.url)
+        conn.recv()
+
+
+def _total_requests(url: str) -> int:
+    # the status request counts itself
+    total: int = requests.get(f"{url}/status").json()["server"]["total_requests"]
+    return total
+
+
+def _args(case: str, url: str, tmp: str) -> List[str]:
+    export_file = os.path.join(tmp, "export.json")
+    if case == "export":
+        return ["export", export_file]
+    if case == "config build":
+        return ["config", "build", "-o", os.path.join(tmp, "kong.json"), url]
+    if case == "diff":
+        return ["diff", export_file, url]
+    return case.split()
+
+
+def _invoke(url: str, args: List[str]) -> None:
+    _reset_cache()
+    result = CliRunner(mix_stderr=False).invoke(
+        cli, ["--url", url, "--tablefmt", "plain"] + args, obj={}
+    )
+    if result.exit_code != 0:
+        raise click.ClickException(
+            f"`kongcli {' '.join(args)}` failed: {result.stderr or result.exception}"
+        )
+
+
+def measure(
+    case: str, url: str, tmp: str, repeat: int = 3, memory: bool = True
+) -> Result:
+    args = _args(case, url, tmp)
+    seconds = []
+    count = 0
+    for _ in range(repeat):
+        before = _total_requests(url)
+        start = perf_counter()
+        _invoke(url, args)
+        seconds.append(perf_counter() - start)
+        count = _total_requests(url) - before - 1
+
+    peak: Optional[int] = None
+    if memory:
+        tracemalloc.start()
+        try:
+            _invoke(url, args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "case": case,
+        "seconds": min(seconds),
+        "requests": count,
+        "peak_bytes": peak,
+    }
+
+
+def run(
+    sizes: Sequence[int],
+    cases: Sequence[str] = CASES,
+    version: str = "2.1.0",
+    repeat: int = 3,
+    memory: bool = True,
+) -> Dict[str, Any]:
+    results = []
+    for size in sizes:
+        parent, child = Pipe()
+        server = Process(target=_serve, args=(version, size, child), daemon=True)
+        server.start()
+        try:
+            while not parent.poll(0.1):
+                if not server.is_alive():
+                    raise click.ClickException("The fake kong did not start.")
+            url = parent.recv()
+            with TemporaryDirectory() as tmp:
+                # `diff` compares against the export
+                ordered = sorted(cases, key=lambda c: c != "export")
+                if "diff" in ordered and "export" not in ordered:
+                    _invoke(url, _args("export", url, tmp))
+                for case in ordered:
+                    result = measure(case, url, tmp, repeat, memory)
+                    result["size"] = size
+                    results.append(result)
+                    click.echo(
+                        f"{size:>8} {case:<15} {result['seconds']:8.3f}s {result['requests']:>6} requests",
+                        err=True,
+                    )
+        finally:
+            parent.send("stop")
+            server.join()
+
+    return {
+        "kongcli": pkg_resources.get_distribution("kongcli").version,
+        "revision": _revision(),
+        "python": platform.python_version(),
+        "kong": version,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "results": results,
+    }
+
+
+def _revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            universal_newlines=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _key(result: Result) -> Tuple[str, int]:
+    return result["case"], result["size"]
+
+
+def _mib(value: Optional[int]) -> Optional[float]:
+    return None if value is None else value / 1024 / 1024
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], tablefmt: str) -> str:
+    """Table of the changes in time, requests and memory from `old` to `new`."""
+    before = {_key(r): r for r in old["results"]}
+    rows = []
+    for r in new["results"]:
+        o = before.get(_key(r))
+        if o is None:
+            continue
+        rows.append(
+            [
+                r["case"],
+                r["size"],
+                o["seconds"],
+                r["seconds"],
+                r["seconds"] / o["seconds"] if o["seconds"] else None,
+                o["requests"],
+                r["requests"],
+                _mib(o["peak_bytes"]),
+                _mib(r["peak_bytes"]),
+            ]
+        )
+    return tabulate(
+        rows,
+        headers=[
+            "case",
+            "size",
+            f"s ({old.get('revision') or old['kongcli']})",
+            f"s ({new.get('revision') or new['kongcli']})",
+            "ratio",
+            "requests before",
+            "requests after",
+            "peak MiB before",
+            "peak MiB after",
+        ],
+        tablefmt=tablefmt,
+        floatfmt=".3f",
+    )
+
+
+@click.command()
+@click.option(
+    "--sizes",
+    type=int,
+    multiple=True,
+    default=[1000, 10000],
+    show_default=True,
+    help="Number of consumers of the datasets (repeat the option), e.g. 1000, 10000, 100000, 1000000.",
+)
+@click.option(
+    "--case",
+    "cases",
+    type=click.Choice(CASES),
+    multiple=True,
+    help="Only run these benchmarks (repeat the option).",
+)
+@click.option("--kong-version", default="2.1.0", show_default=True)
+@click.option("--repeat", type=int, default=3, show_default=True)
+@click.option("--no-memory", is_flag=True, help="Skip the peak memory runs.")
+@click.option("-o", "--output", type=click.File("w"), help="Write the results as json.")
+@click.option(
+    "--compare",
+    "baseline",
+    type=click.File("r"),
+    help="Compare with the results of a previous run.",
+)
+@click.option("--tablefmt", default="simple", show_default=True)
+def main(
+    sizes: Tuple[int, ...],
+    cases: Tuple[str, ...],
+    kong_version: str,
+    repeat: int,
+    no_memory: bool,
+    output: Any,
+    baseline: Any,
+    tablefmt: str,
+) -> None:
+    """Benchmark kongcli commands on synthetic datasets of the given sizes."""
+    result = run(sizes, cases or CASES, kong_version, repeat, not no_memory)
+    click.echo(
+        tabulate(
+            [
+                [
+                    r["case"],
+                    r["size"],
+                    r["seconds"],
+                    r["requests"],
+                    _mib(r["peak_bytes"]),
+                ]
+                for r in result["results"]
+            ],
+            headers=["case", "size", "seconds", "requests", "peak MiB"],
+            tablefmt=tablefmt,
+            floatfmt=".3f",
+        )
+    )
+    if output:
+        output.write(json_dumps(result))
+        output.write("\n")
+    if baseline:
+        click.echo()
+        click.echo(compare(json_loads(baseline.read()), result, tablefmt))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import click
+from tabulate import tabulate
+
+from ._effective import find_entity, PluginIndex
+from ._router import route_name
+from ._snapshot import foreign_id
+from ._timings import phase
+from ._util import get, json_dumps
+from .kong import general
+
+# the acl plugin config keys before and after kong 0.14.1 / 2.x
+ALLOW = ("whitelist", "allow")
+DENY = ("blacklist", "deny")
+
+
+def popcount(bits: int) -> int:
+    return bin(bits).count("1")
+
+
+def members(bits: int) -> Iterator[int]:
+    """Indexes of the set bits, in increasing order."""
+    text = bin(bits)[:1:-1]
+    idx = text.find("1")
+    while idx >= 0:
+        yield idx
+        idx = text.find("1", idx + 1)
+
+
+class Rule:
+    """The effective acl plugin of a route (none, allow or deny groups)."""
+
+    def __init__(self, plugin: Optional[Dict[str, Any]], scope: str = "") -> None:
+        config = (plugin or {}).get("config") or {}
+        self.plugin = plugin
+        self.scope = scope
+        self.allow: Set[str] = set()
+        self.deny: Set[str] = set()
+        for k in ALLOW:
+            self.allow |= set(config.get(k) or [])
+        for k in DENY:
+            self.deny |= set(config.get(k) or [])
+
+    @property
+    def mode(self) -> str:
+        if self.plugin is None:
+            return "none"
+        return "allow" if self.allow else "deny"
+
+    @property
+    def groups(self) -> Set[str]:
+        return self.allow if self.allow else self.deny
+
+
+class AclMatrix:
+    """Which consumers pass the acl plugin of which routes and services.
+
+    Every acl group is a bitset (a python int) of its consumers, bit `i` for
+    the `i`th consumer. The consumers allowed on a route are the union of its
+    allow groups, or all consumers minus the union of its deny groups; on a
+    service the union of its routes. So the whole matrix takes one pass over
+    the acls and a few big int operations per route.
+    """
+
+    def __init__(
+        self,
+        consumers: List[Dict[str, Any]],
+        acls: List[Dict[str, Any]],
+        plugins: List[Dict[str, Any]],
+        routes: List[Dict[str, Any]],
+    ) -> None:
+        self.consumers = consumers
+        self.index = {c["id"]: idx for idx, c in enumerate(consumers)}
+        self.all = (1 << len(consumers)) - 1
+
+        self.groups: Dict[str, int] = defaultdict(int)
+        for a in acls:
+            idx = self.index.get(foreign_id(a, "consumer") or "")
+            if idx is not None:
+                self.groups[a["group"]] |= 1 << idx
+
+        plugin_index = PluginIndex(plugins)
+        self.rules: Dict[str, Rule] = {}
+        self.routes: Dict[str, int] = {}
+        self.services: Dict[Optional[str], int] = defaultdict(int)
+        self.routes_of: Dict[Optional[str], List[str]] = defaultdict(list)
+        for r in routes:
+            service_id = foreign_id(r, "service")
+            resolved = plugin_index.resolve("acl", None, r["id"], service_id)
+            rule = Rule(resolved[1], resolved[0]) if resolved else Rule(None)
+            self.rules[r["id"]] = rule
+            self.routes[r["id"]] = bits = self.allowed(rule)
+            self.services[service_id] |= bits
+            self.routes_of[service_id].append(r["id"])
+
+    def union(self, groups: Set[str]) -> int:
+        bits = 0
+        for g in groups:
+            bits |= self.groups.get(g, 0)
+        return bits
+
+    def allowed(self, rule: Rule) -> int:
+        if rule.plugin is None:
+            return self.all
+        bits = self.union(rule.allow) if rule.allow else self.all
+        return bits & ~self.union(rule.deny) & self.all
+
+    def consumer_groups(self, consumer_id: str) -> Set[str]:
+        bit = 1 << self.index[consumer_id]
+        return {g for g, bits in self.groups.items() if bits & bit}
+
+
+def _consumer_name(c: Dict[str, Any]) -> str:
+    return str(c.get("username") or c.get("custom_id") or c["id"])
+
+
+@click.command()
+@click.option(
+    "--by",
+    type=click.Choice(["service", "route"]),
+    default="service",
+    show_default=True,
+    help="Compute the access per service (via any of its routes) or per route.",
+)
+@click.option("--consumer", "consumer_id", help="Only this consumer (id or name).")
+@click.option("--service", "service_id", help="Only this service (id or name).")
+@click.option("--route", "route_id", help="Only this route (id or name).")
+@click.option(
+    "--ndjson",
+    is_flag=True,
+    help="Export the matrix: one json object per service or route with the "
+    "names of the allowed consumers.",
+)
+@click.pass_context
+def matrix(
+    ctx: click.Context,
+    by: str,
+    consumer_id: Optional[str],
+    service_id: Optional[str],
+    route_id: Optional[str],
+    ndjson: bool,
+) -> None:
+    """Show which consumers pass the acl plugins of which services.
+
+    The effective acl plugin of every route (route, service or global) decides
+    with its allow groups (whitelist) or deny groups (blacklist); routes
+    without an acl plugin allow every consumer. A consumer can reach a service,
+    if it can reach any of its routes. Authentication is not taken into account.
+
+    With `--consumer` and `--service` (or `--route`), the single pair is
+    explained.
+    """
+    session = ctx.obj["session"]
+    tablefmt = ctx.obj["tablefmt"]
+
+    with phase("fetch"):
+        consumers = get("consumers", lambda: general.all_of("consumers", session))
+        acls = get("acls", lambda: general.all_of("acls", session))
+        plugins = get("plugins", lambda: general.all_of("plugins", session))
+        routes = get("routes", lambda: general.all_of("routes", session))
+        services = get("services", lambda: general.all_of("services", session))
+
+    with phase("compute"):
+        acl_matrix = AclMatrix(consumers, acls, plugins, routes)
+
+    consumer = service = route = None
+    if consumer_id:
+        consumer = find_entity(consumers, consumer_id, ("id", "username", "custom_id"))
+    if service_id:
+        service = find_entity(services, service_id, ("id", "name"))
+    if route_id:
+        route = find_entity(routes, route_id, ("id", "name"))
+    service_names = {s["id"]: s.get("name") or s["id"] for s in services}
+
+    if route is not None:
+        route_ids = [route["id"]]
+    elif service is not None:
+        route_ids = acl_matrix.routes_of.get(service["id"], [])
+    else:
+        route_ids = [r["id"] for r in routes]
+
+    if consumer is not None and (service is not None or route is not None):
+        _explain(acl_matrix, consumer, route_ids, routes, service_names, tablefmt)
+        return
+
+    with phase("render"):
+        routes_by_id = {r["id"]: r for r in routes}
+        mask = acl_matrix.all
+        if consumer is not None:
+            mask = 1 << acl_matrix.index[consumer["id"]]
+        total = popcount(mask)
+
+        targets: List[Tuple[Dict[str, Any], int]] = []
+        if by == "route" or route is not None:
+            for r_id in route_ids:
+                rule = acl_matrix.rules[r_id]
+                s_id = foreign_id(routes_by_id[r_id], "service")
+                row = {
+                    "route": route_name(routes_by_id[r_id]),
+                    "service": service_names.get(s_id or "", s_id),
+                    "acl": rule.mode,
+                    "scope": rule.scope,
+                    "groups": sorted(rule.groups),
+                }
+                targets.append((row, acl_matrix.routes[r_id] & mask))
+        else:
+            s_ids = [service["id"]] if service else [s["id"] for s in services]
+            for s_id in s_ids:
+                rules = [
+                    acl_matrix.rules[r] for r in acl_matrix.routes_of.get(s_id, [])
+                ]
+                row = {
+                    "service": service_names[s_id],
+                    "routes": len(rules),
+                    "acl": ", ".join(sorted({rule.mode for rule in rules})),
+                    "groups": sorted(set().union(*(rule.groups for rule in rules))),
+                }
+                targets.append((row, acl_matrix.services.get(s_id, 0) & mask))
+
+        if ndjson:
+            for row, bits in targets:
+                row["consumers"] = [
+                    _consumer_name(consumers[idx]) for idx in members(bits)
+                ]
+                click.echo(json_dumps(row))
+            return
+        data = []
+        for row, bits in targets:
+            row["groups"] = "\n".join(row["groups"])
+            allowed = popcount(bits)
+            if consumer is not None:
+                row["allowed"] = bool(allowed)
+            else:
+                row["allowed"] = allowed
+                row["share %"] = 100 * allowed / total if total else 0.0
+            data.append(row)
+        click.echo(tabulate(data, headers="keys", tablefmt=tablefmt, floatfmt=".1f"))
+
+
+def _explain(
+    acl_matrix: AclMatrix,
+    consumer: Dict[str, Any],
+    route_ids: List[str],
+    routes: List[Dict[str, Any]],
+    service_names: Dict[str, str],
+    tablefmt: str,
+) -> None:
+    """Show why a consumer can (not) pass the acl plugins of the routes."""
+    routes_by_id = {r["id"]: r for r in routes}
+    bit = 1 << acl_matrix.index[consumer["id"]]
+    groups = acl_matrix.consumer_groups(consumer["id"])
+    rows = []
+    for r_id in route_ids:
+        rule = acl_matrix.rules[r_id]
+        allowed = bool(acl_matrix.routes[r_id] & bit)
+        if rule.plugin is None:
+            reason = "no acl plugin"
+        elif rule.allow:
+            matching = sorted(groups & rule.allow)
+            reason = (
+                f"in allowed groups {', '.join(matching)}"
+                if matching
+                else "in no allowed group"
+            )
+        else:
+            matching = sorted(groups & rule.deny)
+            reason = (
+                f"in denied groups {', '.join(matching)}"
+                if matching
+                else "in no denied group"
+            )
+        s_id = foreign_id(routes_by_id[r_id], "service")
+        rows.append(
+            {
+                "consumer": _consumer_name(consumer),
+                "route": route_name(routes_by_id[r_id]),
+                "service": service_names.get(s_id or "", s_id),
+                "acl": rule.mode,
+                "scope": rule.scope,
+                "allowed": allowed,
+                "reason": reason,
+            }
+        )
+    click.echo(tabulate(rows, headers="keys", tablefmt=tablefmt))
+
+
+@click.group(name="acl")
+def acl_cli() -> None:
+    """Analyze the access of consumers via acl groups."""
+    pass
+
+
+acl_cli.add_command(matrix)
@@ -0,0 +1,450 @@
+from collections import defaultdict
+import random
+from threading import Lock
+from time import perf_counter, sleep
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+import click
+from loguru import logger
+from tabulate import tabulate
+
+from ._budget import BudgetExceeded
+from ._probe import latency_rows, proxy_session, Result, send, Target
+from ._timings import histogram_table, percentile
+from ._util import dict_from_dot, run_concurrently
+from .kong import general, plugins
+
+OPERATIONS = ("list", "retrieve", "create", "delete")
+# prefix of the names of all entities created by the benchmarks
+PREFIX = "kongcli-bench-"
+
+
+def _parse_mix(mix: str) -> Dict[str, int]:
+    weights: Dict[str, int] = {}
+    for part in mix.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in OPERATIONS or not weight.isdigit():
+            logger.error(
+                f"Invalid mix `{part}`, use e.g. `list=40,retrieve=40,create=10,delete=10`."
+            )
+            raise click.Abort()
+        weights[name] = int(weight)
+    if not sum(weights.values()):
+        logger.error("At least one operation needs a weight > 0.")
+        raise click.Abort()
+    return weights
+
+
+def latency_table(
+    results: Dict[str, List[float]],
+    errors: Dict[str, int],
+    seconds: float,
+    tablefmt: str,
+) -> str:
+    """Throughput and latency percentiles (in ms) per group of `results`."""
+    rows: List[Tuple[Any, ...]] = []
+    for name, latencies in sorted(results.items()):
+        latencies = sorted(latencies)
+        if not latencies:
+            rows.append((name, 0, errors.get(name, 0), 0.0, None, None, None, None))
+            continue
+        rows.append(
+            (
+                name,
+                len(latencies),
+                errors.get(name, 0),
+                len(latencies) / seconds if seconds else None,
+                1000 * percentile(latencies, 50),
+                1000 * percentile(latencies, 90),
+                1000 * percentile(latencies, 99),
+                1000 * latencies[-1],
+            )
+        )
+    table: str = tabulate(
+        rows,
+        headers=[
+            "",
+            "count",
+            "errors",
+            "per s",
+            "p50 ms",
+            "p90 ms",
+            "p99 ms",
+            "max ms",
+        ],
+        tablefmt=tablefmt,
+        floatfmt=".1f",
+    )
+    return table
+
+
+class _Entities:
+    """Thread-safe pool of the entities created by the benchmark."""
+
+    def __init__(self, seed: int) -> None:
+        self.lock = Lock()
+        self.ids: List[str] = []
+        self.random = random.Random(seed)
+
+    def add(self, id_: str) -> None:
+        with self.lock:
+            self.ids.append(id_)
+
+    def pick(self) -> Optional[str]:
+        with self.lock:
+            return self.random.choice(self.ids) if self.ids else None
+
+    def take(self) -> Optional[str]:
+        with self.lock:
+            if not self.ids:
+                return None
+            idx = self.random.randrange(len(self.ids))
+            self.ids[idx], self.ids[-1] = self.ids[-1], self.ids[idx]
+            return self.ids.pop()
+
+
+def _payload(resource: str) -> Dict[str, Any]:
+    name = f"{PREFIX}{uuid4().hex}"
+    if resource == "consumers":
+        return {"username": name}
+    return {"name": name, "host": f"{name}.invalid"}
+
+
+@click.command()
+@click.option(
+    "--resource",
+    type=click.Choice(["consumers", "services"]),
+    default="consumers",
+    show_default=True,
+    help="Resource to list, retrieve, create and delete.",
+)
+@click.option(
+    "--mix",
+    default="list=10,retrieve=60,create=15,delete=15",
+    show_default=True,
+    help="Relative weights of the operations list (all pages), retrieve, create and delete.",
+)
+@click.option(
+    "--requests",
+    "count",
+    type=click.IntRange(min=1),
+    default=1000,
+    show_default=True,
+    help="Number of operations.",
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Number of operations in parallel.",
+)
+@click.option(
+    "--rate",
+    type=float,
+    help="Target number of operations started per second (default: as fast as possible).",
+)
+@click.option(
+    "--warmup",
+    type=click.IntRange(min=1),
+    default=20,
+    show_default=True,
+    help="Number of entities created (unmeasured) before the benchmark.",
+)
+@click.option("--seed", type=int, default=0, help="Seed for the operation order.")
+@click.pass_context
+def admin(
+    ctx: click.Context,
+    resource: str,
+    mix: str,
+    count: int,
+    concurrency: int,
+    rate: Optional[float],
+    warmup: int,
+    seed: int,
+) -> None:
+    """Measure the throughput of the admin api.
+
+    Runs `--requests` operations, chosen randomly according to `--mix`, with
+    `--concurrency` threads (and at most `--rate` per second). Retrieve and
+    delete work on entities created by the benchmark, all of which are deleted
+    afterwards. Reports throughput and latency percentiles per operation and a
+    latency histogram.
+    """
+    session = ctx.obj["session"]
+    tablefmt = ctx.obj["tablefmt"]
+
+    weights = _parse_mix(mix)
+    rnd = random.Random(seed)
+    operations = rnd.choices(list(weights), weights=list(weights.values()), k=count)
+    entities = _Entities(seed)
+
+    def list_() -> None:
+        general.all_of(resource, session)
+
+    def create() -> None:
+        entity = general.add(resource, session, **_payload(resource))
+        entities.add(entity["id"])
+
+    def retrieve() -> None:
+        id_ = entities.pick()
+        if id_ is None:
+            create()
+        else:
+            general.retrieve(resource, session, id_)
+
+    def delete() -> None:
+        id_ = entities.take()
+        if id_ is None:
+            create()
+            return
+        try:
+            general.delete(resource, session, id_)
+        except Exception:
+            # still to be cleaned up
+            entities.add(id_)
+            raise
+
+    calls: Dict[str, Callable[[], None]] = {
+        "list": list_,
+        "retrieve": retrieve,
+        "create": create,
+        "delete": delete,
+    }
+    latencies: Dict[str, List[float]] = {name: [] for name in weights}
+    errors: Dict[str, int] = defaultdict(int)
+    lock = Lock()
+
+    def run(operation: str) -> None:
+        start = perf_counter()
+        try:
+            calls[operation]()
+        except BudgetExceeded:
+            raise
+        except Exception as e:
+            logger.warning(f"`{operation}` failed: {e}")
+            with lock:
+                errors[operation] += 1
+            return
+        seconds = perf_counter() - start
+        with lock:
+            latencies[operation].append(seconds)
+
+    try:
+        logger.info(f"Creating {warmup} {resource} for the warmup ...")
+        run_concurrently(lambda _: create(), range(warmup), concurrency)
+        logger.info(f"Running {count} operations ...")
+        start = perf_counter()
+        run_concurrently(run, operations, concurrency, rate)
+        total = perf_counter() - start
+    finally:
+        _cleanup(session, resource, entities.ids, concurrency)
+
+    all_latencies = [s for values in latencies.values() for s in values]
+    latencies["total"] = all_latencies
+    errors["total"] = sum(errors.values())
+    click.echo(
+        f"{count} operations in {total:.2f} s with concurrency {concurrency}"
+        f"{f' and rate {rate}/s' if rate else ''}: "
+        f"{count / total:.1f} operations per second."
+    )
+    click.echo(latency_table(latencies, errors, total, tablefmt))
+    if all_latencies:
+        click.echo(histogram_table(all_latencies, tablefmt))
+
+
+def _cleanup(session: Any, resource: str, ids: List[str], concurrency: int) -> None:
+    """Delete the entities created by a benchmark (already deleted ones are fine)."""
+    logger.info(f"Deleting {len(ids)} {resource} created by the benchmark ...")
+
+    def delete(id_: str) -> Tuple[str, Optional[str]]:
+        try:
+            general.delete(resource, session, id_)
+        except Exception as e:
+            if not str(e).startswith("404"):
+                return id_, str(e)
+        return id_, None
+
+    failed = [
+        (id_, error)
+        for id_, error in run_concurrently(delete, ids, concurrency)
+        if error
+    ]
+    for id_, error in failed:
+        logger.error(f"Could not delete `{id_}`: {error}")
+    if failed:
+        logger.error(f"Delete the {resource} starting with `{PREFIX}` manually.")
+
+
+def _wait_for_route(proxy: Any, t: Target, timeout: float = 10.0) -> None:
+    # kong rebuilds its router asynchronously after changes
+    deadline = perf_counter() + timeout
+    while True:
+        try:
+            status = send(proxy, [t], 1, 1)[0][0][2]
+        except Exception:
+            status = None
+        if status not in (None, 404):
+            return
+        if perf_counter() > deadline:
+            logger.error(f"The route `{t!r}` is not reachable through the proxy.")
+            raise click.Abort()
+        sleep(0.2)
+
+
+@click.command()
+@click.option(
+    "--upstream",
+    default="http://httpbin:80",
+    show_default=True,
+    help="Url of the upstream as seen from kong (the default fits the docker-compose).",
+)
+@click.option(
+    "--path",
+    default="/anything",
+    show_default=True,
+    help="Path of the requests below the route.",
+)
+@click.option(
+    "--config",
+    "-c",
+    type=(str, str),
+    multiple=True,
+    help="Plugin config, e.g. `-c minute 100000 -c policy local` (see `raw -d`).",
+)
+@click.option(
+    "--proxy",
+    envvar="KONG_PROXY",
+    default="http://localhost:8000",
+    show_default=True,
+    help="Base url of the kong proxy.",
+)
+@click.option(
+    "--header",
+    "-H",
+    multiple=True,
+    help="Send this header with every request, e.g. `apikey: secret`.",
+)
+@click.option(
+    "--requests",
+    "count",
+    type=click.IntRange(min=1),
+    default=500,
+    show_default=True,
+    help="Number of requests per measurement.",
+)
+@click.option(
+    "--warmup",
+    type=click.IntRange(min=0),
+    default=50,
+    show_default=True,
+    help="Number of (unmeasured) requests before each measurement.",
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Number of requests in parallel.",
+)
+@click.option("--rate", type=float, help="Maximal number of requests per second.")
+@click.argument("plugin_name")
+@click.pass_context
+def plugin(
+    ctx: click.Context,
+    plugin_name: str,
+    upstream: str,
+    path: str,
+    config: Tuple[Tuple[str, str], ...],
+    proxy: str,
+    header: Tuple[str, ...],
+    count: int,
+    warmup: int,
+    concurrency: int,
+    rate: Optional[float],
+) -> None:
+    """Measure the proxy overhead of a plugin.
+
+    Creates a throwaway service and route to the `--upstream`, measures the
+    latency and throughput through the proxy, enables the plugin with the given
+    `--config` on the route and measures again. Service, route and plugin are
+    deleted afterwards.
+    """
+    session = ctx.obj["session"]
+    tablefmt = ctx.obj["tablefmt"]
+
+    name = f"{PREFIX}{uuid4().hex}"
+    service = general.add("services", session, name=name, url=upstream)
+    route_id = None
+    try:
+        route = general.add(
+            "routes", session, service={"id": service["id"]}, paths=[f"/{name}"]
+        )
+        route_id = route["id"]
+        t = Target(name, name, "GET", f"/{name}{path}", None)
+        proxy_ = proxy_session(proxy, header)
+        try:
+            _wait_for_route(proxy_, t)
+
+            measurements: Dict[str, Tuple[List[Result], float]] = {}
+            send(proxy_, [t], warmup, concurrency)
+            logger.info(f"Measuring {count} requests without `{plugin_name}` ...")
+            measurements["baseline"] = send(proxy_, [t], count, concurrency, rate)
+
+            plugins.enable_on(
+                session,
+                "routes",
+                route_id,
+                plugin_name,
+                config=dict_from_dot(config),
+            )
+            send(proxy_, [t], warmup, concurrency)
+            logger.info(f"Measuring {count} requests with `{plugin_name}` ...")
+            measurements[plugin_name] = send(proxy_, [t], count, concurrency, rate)
+        finally:
+            proxy_.close()
+    finally:
+        # deleting the route (and service) also deletes the plugin
+        if route_id is not None:
+            general.delete("routes", session, route_id)
+        general.delete("services", session, service["id"])
+
+    rows = []
+    for label, (results, seconds) in measurements.items():
+        row = latency_rows({(label,): results})[0]
+        rows.append(row[:3] + (len(results) / seconds,) + row[3:])
+    base, with_plugin = rows
+    delta = ("delta", None, None) + tuple(
+        b - a for a, b in zip(base[3:], with_plugin[3:])
+    )
+    click.echo(
+        tabulate(
+            rows + [delta],
+            headers=[
+                "",
+                "requests",
+                "status",
+                "per s",
+                "p50 ms",
+                "p90 ms",
+                "p99 ms",
+                "max ms",
+            ],
+            tablefmt=tablefmt,
+            floatfmt=".1f",
+        )
+    )
+    for label, (results, _) in measurements.items():
+        click.echo(f"\n{label}:")
+        click.echo(histogram_table([s for _, s, _ in results], tablefmt))
+
+
+@click.group(name="bench")
+def bench_cli() -> None:
+    """Benchmark the kong admin api and proxy."""
+    pass
+
+
+bench_cli.add_command(admin)
+bench_cli.add_command(plugin)
@@ -0,0 +1,54 @@
+from contextlib import contextmanager
+from threading import Lock
+from typing import Iterator, List, Optional, Tuple
+
+import click
+
+from ._session import LiveServerSession
+
+
+class BudgetExceeded(click.ClickException):
+    """Raised instead of sending a request over the budget.
+
+    Commands that report failures per entity have to re-raise it, so that the
+    command stops.
+    """
+
+
+class RequestBudget:
+    """Count the requests of a session; stop, when there would be more than `limit`.
+
+    The requests are counted before they are sent, a request over the budget is
+    not sent at all.
+    """
+
+    def __init__(self, limit: Optional[int] = None) -> None:
+        self.limit = limit
+        self.lock = Lock()
+        self.requests: List[Tuple[str, str]] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.requests)
+
+    def on_send(self, method: str, url: str) -> None:
+        with self.lock:
+            if self.limit is not None and len(self.requests) >= self.limit:
+                raise BudgetExceeded(
+                    f"Exceeded the budget of {self.limit} requests with "
+                    f"`{method.upper()} {url}`."
+                )
+            self.requests.append((method.upper(), url))
+
+
+@contextmanager
+def request_budget(
+    session: LiveServerSession, limit: Optional[int] = None
+) -> Iterator[RequestBudget]:
+    """Count the requests made through `session` in the block."""
+    budget = RequestBudget(limit)
+    session.send_hooks.append(budget.on_send)
+    try:
+        yield budget
+    finally:
+        session.send_hooks.remove(budget.on_send)
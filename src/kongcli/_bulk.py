@@ -0,0 +1,167 @@
+from collections import Counter
+from datetime import datetime, timezone
+import sys
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+import click
+from loguru import logger
+from tabulate import tabulate
+
+from ._budget import BudgetExceeded
+from ._selection import entity_name, has_selectors, select, selector_options
+from ._tracing import span
+from ._util import get, parse_datetimes, run_concurrently, substitude_ids
+from .kong import general
+
+
+def _without_credentials(
+    session: Any, entities: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    with_credentials = set()
+    for resource, key in (("key-auths", "key-auth"), ("basic-auths", "basic-auth")):
+        for cred in get(key, lambda: general.all_of(resource, session)):
+            substitude_ids(cred)
+            with_credentials.add(cred.get("consumer.id"))
+    return [e for e in entities if e["id"] not in with_credentials]
+
+
+def _created_before(
+    entities: List[Dict[str, Any]], before: datetime
+) -> List[Dict[str, Any]]:
+    if before.tzinfo is None:
+        before = before.replace(tzinfo=timezone.utc)
+    result = []
+    for e in entities:
+        created = {"created_at": e.get("created_at")}
+        if created["created_at"] is None:
+            continue
+        parse_datetimes(created)
+        if created["created_at"] < before:
+            result.append(e)
+    return result
+
+
+def _delete_many_on_resource(resource: str) -> click.Command:
+    assert resource in ("consumers", "services", "routes", "plugins")
+
+    @click.command(name=f"delete-many-{resource}")
+    @selector_options(resource)
+    @click.option(
+        "--created-before",
+        type=click.DateTime(),
+        help="Select entities created before this date (UTC).",
+    )
+    @click.option(
+        "--no-credentials",
+        is_flag=True,
+        hidden=resource != "consumers",
+        help="Select consumers without key-auth and basic-auth credentials "
+        "(hmac-auth, jwt and oauth2 credentials are not checked).",
+    )
+    @click.option(
+        "--rate",
+        type=float,
+        help="Maximal number of delete requests per second.",
+    )
+    @click.option("--dry-run", is_flag=True, help="Only show what would be deleted.")
+    @click.option("--yes", is_flag=True, help="Do not ask for confirmation.")
+    @click.argument("ids", nargs=-1)
+    @click.pass_context
+    def delete_many(
+        ctx: click.Context,
+        ids: Tuple[str, ...],
+        created_before: Optional[datetime],
+        no_credentials: bool,
+        rate: Optional[float],
+        dry_run: bool,
+        yes: bool,
+        **selectors: Any,
+    ) -> None:
+        """Delete all entities matching the given filters.
+
+        Entities given by id / name (or `--ids-from`) and the ones matching the
+        selectors are candidates; `--created-before` and `--no-credentials`
+        restrict them further. All given filters have to match. Only key-auth
+        and basic-auth credentials count for `--no-credentials`.
+
+        The number of matching entities is shown and has to be confirmed before
+        they are deleted in parallel (see `--concurrency` and `--rate`).
+        """
+        session = ctx.obj["session"]
+        tablefmt = ctx.obj["tablefmt"]
+
+        if not (ids or has_selectors(**selectors) or created_before or no_credentials):
+            click.echo("Provide at least one filter.", err=True)
+            raise click.Abort()
+        if no_credentials and resource != "consumers":
+            click.echo("`--no-credentials` only works for consumers.", err=True)
+            raise click.Abort()
+
+        if ids or has_selectors(**selectors):
+            entities = select(resource, session, ids, **selectors)
+        else:
+            entities = get(resource, lambda: general.all_of(resource, session))
+        if created_before:
+            entities = _created_before(entities, created_before)
+        if no_credentials:
+            entities = _without_credentials(session, entities)
+
+        rows = [(e["id"], entity_name(resource, e) or "") for e in entities]
+        if dry_run:
+            click.echo(tabulate(rows, headers=["id", "name"], tablefmt=tablefmt))
+        click.echo(f"{len(entities)} {resource} selected for deletion.", err=True)
+        if dry_run or not entities:
+            return
+        if not yes:
+            click.confirm(f"Delete {len(entities)} {resource}?", abort=True, err=True)
+
+        lock = Lock()
+        with click.progressbar(
+            length=len(entities), label=f"Delete {resource}", file=sys.stderr
+        ) as bar:
+
+            def _delete(entity: Dict[str, Any]) -> Tuple[str, str]:
+                with span(f"delete {resource}", id=entity["id"]):
+                    try:
+                        general.delete(resource, session, entity["id"])
+                        result = ("deleted", "")
+                    except BudgetExceeded:
+                        raise
+                    except Exception as e:
+                        logger.error(f"Cannot delete {resource} `{entity['id']}`: {e}")
+                        result = ("failed", str(e))
+                with lock:
+                    bar.update(1)
+                return result
+
+            results = run_concurrently(
+                _delete,
+                entities,
+                concurrency=selectors.get("concurrency", 10),
+                rate=rate,
+            )
+
+        failed = [
+            (row[0], row[1], error)
+            for row, (action, error) in zip(rows, results)
+            if action == "failed"
+        ]
+        if failed:
+            click.echo(
+                tabulate(failed, headers=["id", "name", "error"], tablefmt=tablefmt)
+            )
+        counts = Counter(action for action, _ in results)
+        click.echo(
+            f"deleted: {counts['deleted']}, failed: {counts['failed']}", err=True
+        )
+        if counts["failed"]:
+            ctx.exit(1)
+
+    return delete_many
+
+
+delete_many_consumers = _delete_many_on_resource("consumers")
+delete_many_services = _delete_many_on_resource("services")
+delete_many_routes = _delete_many_on_resource("routes")
+delete_many_plugins = _delete_many_on_resource("plugins")
@@ -1,3 +1,4 @@
+from contextlib import ExitStack
 import sys
 from typing import Any, Optional
 
@@ -6,13 +7,28 @@ from loguru import logger
 import pkg_resources
 from tabulate import tabulate_formats
 
+from ._acl import acl_cli
+from ._bench import bench_cli
+from ._budget import request_budget
 from ._consumers import consumers_cli, list_consumers
+from ._declarative import config_cli
 from ._plugins import list_global_plugins, plugins_cli
+from ._probe import probe
+from ._profiling import start_cpu_profile, start_memory_profile
 from ._raw import raw
+from ._recording import Recorder
+from ._recording import replay as replay_from
 from ._routes import list_routes, routes_cli
 from ._services import list_services, services_cli
 from ._session import LiveServerSession
-from ._util import get, json_pretty
+from ._snapshot import diff_cmd, export
+from ._timings import disable as disable_timings
+from ._timings import enable as enable_timings
+from ._tracing import span
+from ._tracing import start as start_tracing
+from ._tracing import stop as stop_tracing
+from ._util import get, json_pretty, log_cache_stats
+from ._watch import watch_status
 from .kong.general import information, status_call
 
 
@@ -39,6 +55,41 @@ from .kong.general import information, status_call
     version=pkg_resources.get_distribution("kongcli").version, prog_name="kongcli"
 )
 @click.option("-v", "--verbose", count=True, help="Add more verbose output.")
+@click.option(
+    "--timings",
+    is_flag=True,
+    help="Print the latency per endpoint and the time per phase (phases may nest) to stderr.",
+)
+@click.option(
+    "--profile",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Run the command under cProfile (main thread only) and write the pstats to this file.",
+)
+@click.option(
+    "--profile-memory",
+    is_flag=True,
+    help="Trace memory allocations and print the top allocation sites to stderr.",
+)
+@click.option(
+    "--trace",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write spans of the command, the kong api calls and http requests as json lines to this file.",
+)
+@click.option(
+    "--record",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Append every request and response to this file (json lines).",
+)
+@click.option(
+    "--replay",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Serve the responses from a file written with `--record` instead of asking kong.",
+)
+@click.option(
+    "--max-requests",
+    type=click.IntRange(min=0),
+    help="Stop the command, before it sends more requests to the kong admin api.",
+)
 @click.pass_context
 def cli(
     ctx: click.Context,
@@ -49,6 +100,13 @@ def cli(
     tablefmt: str,
     font: str,
     verbose: int,
+    timings: bool,
+    profile: Optional[str],
+    profile_memory: bool,
+    trace: Optional[str],
+    record: Optional[str],
+    replay: Optional[str],
+    max_requests: Optional[int],
 ) -> None:
     """Interact with your kong admin api.
 
@@ -61,15 +119,8 @@ def cli(
     --passwd KONG_BASIC_PASSWD basic auth password for the kong admin api
     """
     ctx.ensure_object(dict)
-    logger.remove()
-    if verbose == 0:
-        logger.add(sys.stderr, level="ERROR")
-    if verbose == 1:
-        logger.add(sys.stderr, level="WARNING")
-    if verbose == 2:
-        logger.add(sys.stderr, level="INFO")
-    if verbose >= 3:
-        logger.add(sys.stderr, level="DEBUG")
+    _setup_logging(ctx, verbose)
+    _setup_profiling(ctx, profile, profile_memory, tablefmt)
 
     session: Optional[LiveServerSession] = ctx.obj.get("session")
     if session is None:
@@ -78,6 +129,8 @@ def cli(
         ctx.obj["session"] = session
     logger.debug(f"Will use `{session.prefix_url}` as prefix for every request.")
 
+    _setup_recording(ctx, session, record, replay)
+
     if apikey:
         session.headers.update({"apikey": apikey})
     if basic and not passwd:
@@ -88,6 +141,101 @@ def cli(
     ctx.obj["tablefmt"] = tablefmt
     ctx.obj["font"] = font
 
+    if timings:
+        _setup_timings(ctx, session, tablefmt)
+    if trace:
+        _setup_tracing(ctx, session, trace)
+    if max_requests is not None:
+        _setup_budget(ctx, session, max_requests)
+
+
+def _setup_logging(ctx: click.Context, verbose: int) -> None:
+    logger.remove()
+    if verbose == 0:
+        logger.add(sys.stderr, level="ERROR")
+    if verbose == 1:
+        logger.add(sys.stderr, level="WARNING")
+    if verbose == 2:
+        logger.add(sys.stderr, level="INFO")
+    if verbose >= 3:
+        logger.add(sys.stderr, level="DEBUG")
+        ctx.call_on_close(log_cache_stats)
+
+
+def _setup_profiling(
+    ctx: click.Context, profile: Optional[str], profile_memory: bool, tablefmt: str
+) -> None:
+    if profile:
+        ctx.call_on_close(start_cpu_profile(profile))
+    if profile_memory:
+        ctx.call_on_close(start_memory_profile(tablefmt))
+
+
+def _setup_recording(
+    ctx: click.Context,
+    session: LiveServerSession,
+    record: Optional[str],
+    replay: Optional[str],
+) -> None:
+    if record and replay:
+        logger.error("Use either `--record` or `--replay`.")
+        raise click.Abort()
+    if record:
+        recording = open(record, "a")
+        recorder = Recorder(recording)
+        session.request_hooks.append(recorder.on_request)
+
+        def stop_recording() -> None:
+            session.request_hooks.remove(recorder.on_request)
+            recording.close()
+
+        ctx.call_on_close(stop_recording)
+    if replay:
+        with open(replay) as f:
+            replay_from(session, f)
+
+
+def _setup_timings(
+    ctx: click.Context, session: LiveServerSession, tablefmt: str
+) -> None:
+    collected = enable_timings()
+    session.request_hooks.append(collected.on_request)
+
+    def report() -> None:
+        disable_timings()
+        session.request_hooks.remove(collected.on_request)
+        click.echo(collected.report(tablefmt), err=True)
+
+    # also report on errors, i.e. when the result callback is not called
+    ctx.call_on_close(report)
+
+
+def _setup_tracing(ctx: click.Context, session: LiveServerSession, trace: str) -> None:
+    output = open(trace, "w")
+    tracer = start_tracing(output)
+    session.request_hooks.append(tracer.on_request)
+    root = ExitStack()
+    root.enter_context(span(f"kongcli {ctx.invoked_subcommand}"))
+
+    def finish() -> None:
+        root.close()
+        stop_tracing()
+        session.request_hooks.remove(tracer.on_request)
+        output.close()
+
+    ctx.call_on_close(finish)
+
+
+def _setup_budget(
+    ctx: click.Context, session: LiveServerSession, max_requests: int
+) -> None:
+    budget = ExitStack()
+    counted = budget.enter_context(request_budget(session, max_requests))
+    ctx.call_on_close(budget.close)
+    ctx.call_on_close(
+        lambda: logger.info(f"Made {counted.count} requests to the admin api.")
+    )
+
 
 @cli.resultcallback()
 def cleanup(*args: Any, **kwargs: Any) -> None:
@@ -95,11 +243,17 @@ def cleanup(*args: Any, **kwargs: Any) -> None:
     ctx.obj["session"].close()
 
 
+cli.add_command(acl_cli)
+cli.add_command(bench_cli)
+cli.add_command(config_cli)
 cli.add_command(consumers_cli)
 cli.add_command(plugins_cli)
 cli.add_command(services_cli)
 cli.add_command(routes_cli)
+cli.add_command(probe)
 cli.add_command(raw)
+cli.add_command(export)
+cli.add_command(diff_cmd)
 
 
 @cli.command()
@@ -111,11 +265,36 @@ def info(ctx: click.Context) -> None:
 
 
 @cli.command()
+@click.option(
+    "--watch",
+    "interval",
+    type=click.FloatRange(min=0.1),
+    metavar="SECONDS",
+    help="Poll the status every SECONDS and print the rates of the counters.",
+)
+@click.option(
+    "--ndjson", is_flag=True, help="With `--watch`, print one json object per line."
+)
+@click.option(
+    "--count",
+    type=click.IntRange(min=1),
+    help="With `--watch`, stop after this many polls.",
+)
 @click.pass_context
-def status(ctx: click.Context) -> None:
-    """Show status information on the kong instance."""
-    info = get("status", lambda: status_call(ctx.obj["session"]))
-    click.echo(json_pretty(info))
+def status(
+    ctx: click.Context, interval: Optional[float], ndjson: bool, count: Optional[int]
+) -> None:
+    """Show status information on the kong instance.
+
+    With `--watch`, the status is polled over a kept-alive connection and one line
+    per poll shows the connections and requests per second and the current
+    connection gauges (or the whole status as json with `--ndjson`).
+    """
+    if interval is None:
+        info = get("status", lambda: status_call(ctx.obj["session"]))
+        click.echo(json_pretty(info))
+        return
+    watch_status(ctx.obj["session"], interval, ndjson, count)
 
 
 @cli.group(name="list", chain=True)
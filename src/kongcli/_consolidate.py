@@ -0,0 +1,363 @@
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import click
+from loguru import logger
+from tabulate import tabulate
+
+from ._budget import BudgetExceeded
+from ._router import (
+    Entry,
+    is_regex,
+    literal_prefix,
+    Request,
+    route_name,
+    Router,
+    sample,
+    source_option,
+)
+from ._snapshot import entity_hash, foreign_id, load, VOLATILE
+from ._util import get, invalidate, json_dumps, run_concurrently
+from .kong import general
+
+# route fields that do not change which requests match or how they are proxied
+IGNORED = VOLATILE | {"name", "paths", "service"}
+
+
+def merge_key(route: Dict[str, Any], plugin_hashes: List[str]) -> str:
+    """Routes with the same key only differ by their paths (and names)."""
+    canonical = {k: v for k, v in route.items() if k not in IGNORED}
+    for k in ("methods", "hosts", "protocols", "snis", "tags"):
+        if canonical.get(k):
+            canonical[k] = sorted(canonical[k])
+    canonical["service"] = foreign_id(route, "service")
+    canonical["plugins"] = sorted(plugin_hashes)
+    return json_dumps(canonical)
+
+
+def plugin_hashes(plugins: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Hashes of the plugins (without ids) by route id."""
+    result: Dict[str, List[str]] = defaultdict(list)
+    for p in plugins:
+        route_id = foreign_id(p, "route")
+        if route_id is None:
+            continue
+        # consumer scoped plugins are different plugins per consumer
+        result[route_id].append(entity_hash(p, {"consumer": foreign_id(p, "consumer")}))
+    return result
+
+
+def proposals(
+    routes: List[Dict[str, Any]],
+    plugins: List[Dict[str, Any]],
+    max_paths: int,
+) -> List[List[Dict[str, Any]]]:
+    """Groups of routes to merge into the first (oldest) route of the group.
+
+    Routes without paths are left alone. Groups are split, so that no merged
+    route has more than `max_paths` paths.
+    """
+    hashes = plugin_hashes(plugins)
+    groups: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for route in routes:
+        if not route.get("paths"):
+            continue
+        groups[merge_key(route, hashes.get(route["id"], []))].append(route)
+
+    result = []
+    for group in groups.values():
+        if len(group) < 2:
+            continue
+        group.sort(key=lambda r: (r.get("created_at") or 0, r["id"]))
+        chunk: List[Dict[str, Any]] = []
+        paths: Set[str] = set()
+        for route in group:
+            if chunk and len(paths | set(route["paths"])) > max_paths:
+                result.append(chunk)
+                chunk, paths = [], set()
+            chunk.append(route)
+            paths |= set(route["paths"])
+        result.append(chunk)
+    result.sort(key=lambda chunk: (chunk[0].get("created_at") or 0, chunk[0]["id"]))
+    return [chunk for chunk in result if len(chunk) > 1]
+
+
+def merged_paths(group: List[Dict[str, Any]]) -> List[str]:
+    # unique, in order
+    return list(dict.fromkeys(p for route in group for p in route["paths"]))
+
+
+def merged_routes(
+    routes: List[Dict[str, Any]], groups: List[List[Dict[str, Any]]]
+) -> List[Dict[str, Any]]:
+    """The routes after merging the groups."""
+    kept = {group[0]["id"]: merged_paths(group) for group in groups}
+    gone = {route["id"] for group in groups for route in group[1:]}
+    return [
+        {**r, "paths": kept[r["id"]]} if r["id"] in kept else r
+        for r in routes
+        if r["id"] not in gone
+    ]
+
+
+def _longest(route: Dict[str, Any]) -> int:
+    return max((len(p) for p in route.get("paths") or []), default=0)
+
+
+def _overlapping(router: Router, path: str) -> Iterator[Entry]:
+    """Entries with a (literal) prefix of `path` or starting with `path`."""
+    prefix = literal_prefix(path) if is_regex(path) else path
+    for trie in router.tries():
+        yield from trie.lookup(prefix)
+        yield from trie.under(prefix)
+
+
+def _probes(router: Router, group: List[Dict[str, Any]]) -> Iterator[Request]:
+    """Requests to the paths of the group and to the paths around them."""
+    first = group[0]
+    methods = sorted(first.get("methods") or ["GET"])
+    hosts = [h.replace("*", "x") for h in first.get("hosts") or []] or [None]
+    headers = {k: vs[0] for k, vs in (first.get("headers") or {}).items() if vs}
+    paths: Set[str] = set()
+    for path in merged_paths(group):
+        for e in _overlapping(router, path):
+            if e.path is None:
+                continue
+            if e.regex is not None:
+                found = sample(e.path)
+                paths.update([found] if found is not None else [])
+            else:
+                paths.update([e.path, f"{e.path}x", f"{e.path.rstrip('/')}/x"])
+    for method in methods:
+        for host in hosts:
+            for path in sorted(paths):
+                yield method, host, path, headers
+
+
+def _routing_change(
+    group: List[Dict[str, Any]],
+    before: Router,
+    after: Router,
+    merged_into: Dict[str, str],
+) -> Optional[str]:
+    """Why merging the group changes the route of some request, or None."""
+    ids = {r["id"] for r in group}
+    for method, host, path, headers in _probes(before, group):
+        was = before.match(method, host, path, headers)
+        now = after.match(method, host, path, headers)
+        was_id = was.route["id"] if was else None
+        now_id = now.route["id"] if now else None
+        if merged_into.get(was_id or "", was_id) != now_id:
+            name = route_name(was.route) if was else "no route"
+            return f"`{method} {path}` would match another route than `{name}`"
+    # kong also orders the routes of a category by their longest path, which
+    # the merge raises for all but the route with the longest path
+    longest = max(_longest(r) for r in group)
+    for route in group:
+        for path in route["paths"]:
+            if is_regex(path):
+                continue
+            for e in _overlapping(before, path):
+                other = e.route
+                if other["id"] in ids or e.path is None or e.regex is not None:
+                    continue
+                if e.path.startswith(path) and len(e.path) > len(path):
+                    if _longest(route) <= _longest(other) <= longest:
+                        return (
+                            f"`{path}` would be tried before `{e.path}` of "
+                            f"`{route_name(other)}`"
+                        )
+    return None
+
+
+def safe_proposals(
+    routes: List[Dict[str, Any]],
+    services: List[Dict[str, Any]],
+    groups: List[List[Dict[str, Any]]],
+) -> Tuple[List[List[Dict[str, Any]]], List[Tuple[List[Dict[str, Any]], str]]]:
+    """Split the groups into the ones that keep the routing and the others.
+
+    The router is simulated (see `_router`) before and after all merges, for
+    requests to the paths of every group and to the paths of other routes
+    around them. A group is also rejected, if it raises the longest path of
+    one of its routes above that of another route with a path below it.
+    """
+    before = Router(routes, services)
+    rejected: List[Tuple[List[Dict[str, Any]], str]] = []
+    while True:
+        after = Router(merged_routes(routes, groups), services)
+        merged_into = {r["id"]: group[0]["id"] for group in groups for r in group}
+        changed = []
+        for group in groups:
+            reason = _routing_change(group, before, after, merged_into)
+            if reason is not None:
+                changed.append((group, reason))
+        if not changed:
+            return groups, rejected
+        # merging the other groups may have been fine without these
+        rejected += changed
+        unsafe = {id(group) for group, _ in changed}
+        groups = [group for group in groups if id(group) not in unsafe]
+
+
+def _apply(
+    session: Any, groups: List[List[Dict[str, Any]]], concurrency: int
+) -> Counter:
+    counts: Counter = Counter()
+    for group in groups:
+        keep, others = group[0], group[1:]
+        # the kept route takes all paths first: the other routes are duplicates
+        # until they are deleted, requests never miss a route
+        try:
+            general.update("routes", session, keep["id"], paths=merged_paths(group))
+        except BudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Cannot update route `{route_name(keep)}`: {e}")
+            counts["failed"] += 1
+            continue
+        counts["updated"] += 1
+
+        def _delete(route: Dict[str, Any]) -> str:
+            try:
+                general.delete("routes", session, route["id"])
+                click.echo(f"Deleted route `{route['id']}` ({route_name(route)}).")
+                return "deleted"
+            except BudgetExceeded:
+                raise
+            except Exception as e:
+                logger.error(f"Cannot delete route `{route_name(route)}`: {e}")
+                return "failed"
+
+        counts.update(run_concurrently(_delete, others, concurrency))
+    invalidate("routes")
+    return counts
+
+
+@click.command()
+@source_option
+@click.option(
+    "--max-paths",
+    type=click.IntRange(min=2),
+    default=100,
+    show_default=True,
+    help="Maximal number of paths of a merged route.",
+)
+@click.option(
+    "--apply",
+    "apply_",
+    is_flag=True,
+    help="Merge the routes: update the oldest route of every group with all "
+    "paths, then delete the others.",
+)
+@click.option("--yes", is_flag=True, help="Do not ask for confirmation.")
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Number of delete requests in parallel.",
+)
+@click.pass_context
+def consolidate(
+    ctx: click.Context,
+    source: Optional[str],
+    max_paths: int,
+    apply_: bool,
+    yes: bool,
+    concurrency: int,
+) -> None:
+    """Propose to merge routes that only differ by their paths.
+
+    Routes of the same service with the same methods, hosts, headers,
+    protocols, other settings (strip_path, preserve_host, regex_priority, ...)
+    and the same plugins (compared by name and config) are merged into one
+    route with all their paths. Fewer routes make kong rebuild its router
+    faster.
+
+    Groups are left out, if kong would route some request differently after
+    the merge, e.g. because a merged route gets a longer path than it had and
+    is tried before another route.
+
+    With `--apply`, the oldest route of a group keeps its id, name and plugins
+    and gets all paths, then the other routes (and their plugins) are deleted.
+    The ids of the deleted routes are printed.
+    """
+    session = ctx.obj["session"]
+    tablefmt = ctx.obj["tablefmt"]
+
+    if source:
+        if apply_:
+            logger.error("`--apply` only works for the live kong, not `--from`.")
+            raise click.Abort()
+        snapshot = load(source, session)
+        routes, services, plugins = (
+            snapshot["routes"],
+            snapshot["services"],
+            snapshot["plugins"],
+        )
+    else:
+        routes = get("routes", lambda: general.all_of("routes", session))
+        services = get("services", lambda: general.all_of("services", session))
+        plugins = get("plugins", lambda: general.all_of("plugins", session))
+
+    groups, rejected = safe_proposals(
+        routes, services, proposals(routes, plugins, max_paths)
+    )
+    for group, reason in rejected:
+        logger.warning(f"Skip merging into `{route_name(group[0])}`: {reason}.")
+    service_names = {s["id"]: s.get("name") or s["id"] for s in services}
+    rows: List[Tuple[Any, ...]] = []
+    for group in groups:
+        service_id = foreign_id(group[0], "service")
+        rows.append(
+            (
+                service_names.get(service_id, service_id),
+                route_name(group[0]),
+                len(group) - 1,
+                len(merged_paths(group)),
+                ", ".join(sorted(group[0].get("methods") or [])),
+            )
+        )
+    rows.sort(key=lambda row: (-row[2], row[0] or "", row[1]))
+    if rows:
+        click.echo(
+            tabulate(
+                rows,
+                headers=["service", "keep", "merge", "paths", "methods"],
+                tablefmt=tablefmt,
+            )
+        )
+    merged = sum(len(group) - 1 for group in groups)
+    click.echo(
+        f"{merged + len(groups)} of {len(routes)} routes can be merged into "
+        f"{len(groups)} routes, {len(routes) - merged} routes remain.",
+        err=True,
+    )
+    if rejected:
+        click.echo(
+            f"{len(rejected)} groups are left out, merging them would change "
+            "which route matches some requests (see `-v`).",
+            err=True,
+        )
+    if not apply_ or not groups:
+        return
+    click.echo(
+        "The deleted routes are printed, take a snapshot (`kongcli export`) "
+        "to be able to restore them.",
+        err=True,
+    )
+    if not yes:
+        click.confirm(
+            f"Merge {merged + len(groups)} routes into {len(groups)}?",
+            abort=True,
+            err=True,
+        )
+    counts = _apply(session, groups, concurrency)
+    click.echo(
+        f"updated: {counts['updated']}, deleted: {counts['deleted']}, "
+        f"failed: {counts['failed']}",
+        err=True,
+    )
+    if counts["failed"]:
+        ctx.exit(1)
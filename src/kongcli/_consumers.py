@@ -1,19 +1,107 @@
-from typing import Optional, Tuple
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, TextIO, Tuple
 from uuid import UUID
 
 import click
+from loguru import logger
 from pyfiglet import print_figlet
 from tabulate import tabulate
 
+from ._bulk import delete_many_consumers
 from ._plugins import (
     enable_rate_limiting_consumers,
     enable_request_size_limiting_consumers,
     enable_response_ratelimiting_consumers,
 )
-from ._util import get, json_pretty, parse_datetimes, sort_dict, substitude_ids
+from ._timings import phase
+from ._tracing import span
+from ._util import (
+    get,
+    json_pretty,
+    parse_datetimes,
+    run_concurrently,
+    sort_dict,
+    substitude_ids,
+)
+from ._watch import watch_option, watch_rows
 from .kong import consumers, general
 
 
+def _consumer_rows(
+    session: Any, full_keys: bool, full_plugins: bool
+) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Consumers joined with their acls, plugins and credentials as table rows."""
+    with phase("fetch"):
+        consumers = get("consumers", lambda: general.all_of("consumers", session))
+        plugins = get("plugins", lambda: general.all_of("plugins", session))
+        acls = get("acls", lambda: general.all_of("acls", session))
+        basic_auths = get("basic-auth", lambda: general.all_of("basic-auths", session))
+        key_auths = get("key-auth", lambda: general.all_of("key-auths", session))
+
+    with phase("normalize"):
+        for entity in acls + plugins + basic_auths + key_auths:
+            substitude_ids(entity)
+
+    with phase("join"):
+        # group by consumer once, instead of scanning all entities per consumer
+        related: Dict[str, Dict[str, List[Dict[str, Any]]]] = defaultdict(
+            lambda: defaultdict(list)
+        )
+        for kind, entities in (
+            ("acls", acls),
+            ("plugins", plugins),
+            ("basic_auths", basic_auths),
+            ("key_auths", key_auths),
+        ):
+            for e in entities:
+                if e.get("consumer.id"):
+                    related[e["consumer.id"]][kind].append(e)
+
+        data = []
+        for c in consumers:
+            cdata = {
+                "id": c["id"],
+                "custom_id": c.get("custom_id", ""),
+                "username": c.get("username", ""),
+                "acl_groups": set(),
+                "plugins": [],
+                "basic_auth": set(),
+                "key_auth": set(),
+            }
+            crelated = related.get(c["id"], {})
+            for a in crelated.get("acls", []):
+                cdata["acl_groups"] |= {a["group"]}
+            for p in crelated.get("plugins", []):
+                if full_plugins:
+                    cdata["plugins"] += [(p["name"], p["config"])]
+                else:
+                    cdata["plugins"] += [p["name"]]
+            for b in crelated.get("basic_auths", []):
+                cdata["basic_auth"] |= {f'{b["username"]}:xxx'}
+            for k in crelated.get("key_auths", []):
+                key = k["key"]
+                if not full_keys:
+                    key = f"{key[:6]}..."
+                cdata["key_auth"] |= {key}
+
+            cdata["acl_groups"] = "\n".join(sorted(cdata["acl_groups"]))
+            if full_plugins:
+                cdata["plugins"] = "\n".join(
+                    f"{name}:\n{json_pretty(p)}" for name, p in sorted(cdata["plugins"])
+                )
+            else:
+                cdata["plugins"] = "\n".join(sorted(cdata["plugins"]))
+            cdata["basic_auth"] = "\n".join(sorted(cdata["basic_auth"]))
+            cdata["key_auth"] = "\n".join(sorted(cdata["key_auth"]))
+            data.append((c, cdata))
+    return data
+
+
+def _consumer_sort_key(row: Dict[str, Any]) -> Any:
+    # kong >= 1.0 returns unset fields as null
+    return (len(row["custom_id"] or ""), row["username"] or "")
+
+
 @click.command()
 @click.option(
     "--full-keys",
@@ -25,8 +113,15 @@ from .kong import consumers, general
     is_flag=True,
     help="Whether to show full plugin config.",
 )
+@watch_option
 @click.pass_context
-def list_consumers(ctx: click.Context, full_keys: bool, full_plugins: bool) -> None:
+def list_consumers(
+    ctx: click.Context,
+    full_keys: bool,
+    full_plugins: bool,
+    interval: Optional[float],
+    count: Optional[int],
+) -> None:
     """List all consumers along with relevant information."""
     session = ctx.obj["session"]
     tablefmt = ctx.obj["tablefmt"]
@@ -34,59 +129,17 @@ def list_consumers(ctx: click.Context, full_keys: bool, full_plugins: bool) -> N
 
     print_figlet("Consumers", font=font, width=160)
 
-    consumers = get("consumers", lambda: general.all_of("consumers", session))
-    plugins = get("plugins", lambda: general.all_of("plugins", session))
-    acls = get("acls", lambda: general.all_of("acls", session))
-    basic_auths = get("basic-auth", lambda: general.all_of("basic-auths", session))
-    key_auths = get("key-auth", lambda: general.all_of("key-auths", session))
+    def rows() -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        return _consumer_rows(session, full_keys, full_plugins)
 
-    data = []
-    for c in consumers:
-        cdata = {
-            "id": c["id"],
-            "custom_id": c.get("custom_id", ""),
-            "username": c.get("username", ""),
-            "acl_groups": set(),
-            "plugins": [],
-            "basic_auth": set(),
-            "key_auth": set(),
-        }
-        for a in acls:
-            substitude_ids(a)
-            if c["id"] == a.get("consumer.id"):
-                cdata["acl_groups"] |= {a["group"]}
-        for p in plugins:
-            substitude_ids(p)
-            if c["id"] == p.get("consumer.id"):
-                if full_plugins:
-                    cdata["plugins"] += [(p["name"], p["config"])]
-                else:
-                    cdata["plugins"] += [p["name"]]
-        for b in basic_auths:
-            substitude_ids(b)
-            if c["id"] == b.get("consumer.id"):
-                cdata["basic_auth"] |= {f'{b["username"]}:xxx'}
-        for k in key_auths:
-            substitude_ids(k)
-            if c["id"] == k.get("consumer.id"):
-                key = k["key"]
-                if not full_keys:
-                    key = f"{key[:6]}..."
-                cdata["key_auth"] |= {key}
+    if interval is not None:
+        watch_rows(rows, "id", _consumer_sort_key, tablefmt, interval, count)
+        return
 
-        cdata["acl_groups"] = "\n".join(sorted(cdata["acl_groups"]))
-        if full_plugins:
-            cdata["plugins"] = "\n".join(
-                f"{name}:\n{json_pretty(p)}" for name, p in sorted(cdata["plugins"])
-            )
-        else:
-            cdata["plugins"] = "\n".join(sorted(cdata["plugins"]))
-        cdata["basic_auth"] = "\n".join(sorted(cdata["basic_auth"]))
-        cdata["key_auth"] = "\n".join(sorted(cdata["key_auth"]))
-        data.append(cdata)
-
-    data.sort(key=lambda d: (len(d["custom_id"]), d["username"]))
-    click.echo(tabulate(data, headers="keys", tablefmt=tablefmt))
+    data = [row for _, row in rows()]
+    with phase("render"):
+        data.sort(key=_consumer_sort_key)
+        click.echo(tabulate(data, headers="keys", tablefmt=tablefmt))
 
 
 @click.command()
@@ -95,13 +148,19 @@ def list_consumers(ctx: click.Context, full_keys: bool, full_plugins: bool) -> N
     "--custom_id",
     help="Field for storing an existing unique ID for the consumer - useful for mapping Kong with users in your existing database.",
 )
+@click.option(
+    "--upsert",
+    is_flag=True,
+    help="Create or replace the consumer by its username with a single idempotent request (kong >= 1.0).",
+)
 @click.pass_context
 def create(
-    ctx: click.Context, username: Optional[str], custom_id: Optional[str]
+    ctx: click.Context, username: Optional[str], custom_id: Optional[str], upsert: bool
 ) -> None:
     """Create a user / consumer of your services / routes.
 
-    You must select either `custom_id` or `username` or both.
+    You must select either `custom_id` or `username` or both. With `--upsert`
+    the `username` is required.
     """
     if not (username or custom_id):
         click.echo(
@@ -110,10 +169,20 @@ def create(
         )
         raise click.Abort()
 
+    if upsert and not username:
+        click.echo("You must set `--username` to upsert a consumer.", err=True)
+        raise click.Abort()
+
     session = ctx.obj["session"]
     tablefmt = ctx.obj["tablefmt"]
 
-    user = general.add("consumers", session, username=username, custom_id=custom_id)
+    if upsert:
+        assert username
+        user = general.upsert(
+            "consumers", session, username, username=username, custom_id=custom_id
+        )
+    else:
+        user = general.add("consumers", session, username=username, custom_id=custom_id)
     for k in ("tags", "username", "custom_id", "created_at"):
         if k not in user:
             user[k] = None
@@ -173,42 +242,174 @@ def retrieve(
     click.echo(tabulate([user], headers="keys", tablefmt=tablefmt))
 
 
-@click.command()
-@click.argument("id_username")
-@click.argument("groups", nargs=-1)
-@click.pass_context
-def add_groups(ctx: click.Context, id_username: str, groups: Tuple[str, ...]) -> None:
-    """Add the given groups to the consumer."""
+def _read_group_pairs(
+    args: Tuple[str, ...],
+    more: Tuple[str, ...],
+    from_file: Optional[TextIO],
+) -> Dict[str, List[str]]:
+    # with `-c`, all arguments are groups: `-c alice g1 g2` adds g1 and g2
+    if more:
+        given, groups = more, args
+    else:
+        given, groups = args[:1], args[1:]
+    if not given and not from_file:
+        click.echo("Missing consumer: give one, `-c` or `--from-file`.", err=True)
+        raise click.Abort()
+    pairs: Dict[str, List[str]] = {}
+    for c in given:
+        pairs.setdefault(c, [])
+        pairs[c] += [g for g in groups if g not in pairs[c]]
+    if from_file:
+        for line in from_file:
+            parts = line.replace(",", " ").split()
+            if not parts or parts[0].startswith("#"):
+                continue
+            if len(parts) != 2:
+                click.echo(f"Expect `consumer group` per line, got: {line}", err=True)
+                raise click.Abort()
+            c, g = parts
+            pairs.setdefault(c, [])
+            if g not in pairs[c]:
+                pairs[c].append(g)
+    return pairs
+
+
+def _change_groups(
+    ctx: click.Context, pairs: Dict[str, List[str]], concurrency: int, add: bool
+) -> None:
+    session = ctx.obj["session"]
+    tablefmt = ctx.obj["tablefmt"]
 
-    if not groups:
-        return
+    def _current(id_username: str) -> Tuple[Dict[str, Any], List[str]]:
+        with span("retrieve consumer with groups", consumer=id_username):
+            user = general.retrieve("consumers", session, id_username)
+            return user, consumers.groups(session, id_username)
 
-    session = ctx.obj["session"]
+    current = dict(
+        zip(pairs, run_concurrently(_current, pairs, concurrency=concurrency))
+    )
 
-    for group in groups:
-        consumers.add_group(session, id_username, group)
+    todo = []
+    for id_username, groups in pairs.items():
+        existing = set(current[id_username][1])
+        for group in groups:
+            if add and group in existing:
+                logger.info(f"Consumer `{id_username}` already in group `{group}`.")
+            elif not add and group not in existing:
+                logger.info(f"Consumer `{id_username}` not in group `{group}`.")
+            else:
+                todo.append((id_username, group))
+
+    def _change(pair: Tuple[str, str]) -> None:
+        with span(
+            "add group" if add else "delete group", consumer=pair[0], group=pair[1]
+        ):
+            if add:
+                consumers.add_group(session, *pair)
+            else:
+                consumers.delete_group(session, *pair)
+
+    run_concurrently(_change, todo, concurrency=concurrency)
+
+    # show the groups after the change, whoever else changed them meanwhile
+    def _groups(id_username: str) -> List[str]:
+        with span("retrieve groups", consumer=id_username):
+            return consumers.groups(session, id_username)
+
+    changed = list(dict.fromkeys(c for c, _ in todo))
+    result = dict(
+        zip(changed, run_concurrently(_groups, changed, concurrency=concurrency))
+    )
 
-    ctx.invoke(retrieve, id_username=id_username, acls=True)
+    data = []
+    for id_username, (user, groups) in current.items():
+        for k in ("tags", "username", "custom_id", "created_at"):
+            if k not in user:
+                user[k] = None
+        parse_datetimes(user)
+        user = sort_dict(user)
+        user["acls"] = "\n".join(sorted(result.get(id_username, groups)))
+        data.append(user)
+    click.echo(tabulate(data, headers="keys", tablefmt=tablefmt))
 
 
 @click.command()
-@click.argument("id_username")
-@click.argument("groups", nargs=-1)
+@click.option(
+    "--consumer",
+    "-c",
+    "more",
+    multiple=True,
+    help="Consumers to add the groups to, instead of the first argument.",
+)
+@click.option(
+    "--from-file",
+    type=click.File("r"),
+    help="File with one `consumer group` pair per line (`-` for stdin).",
+)
+@click.option(
+    "--concurrency", type=int, default=10, help="Number of requests in parallel."
+)
+@click.argument("args", nargs=-1, metavar="[ID_USERNAME] GROUPS...")
 @click.pass_context
-def delete_groups(
-    ctx: click.Context, id_username: str, groups: Tuple[str, ...]
+def add_groups(
+    ctx: click.Context,
+    args: Tuple[str, ...],
+    more: Tuple[str, ...],
+    from_file: Optional[TextIO],
+    concurrency: int,
 ) -> None:
-    """Delete the given groups from the consumer."""
+    """Add the given groups to the consumer(s).
 
-    if not groups:
+    The first argument is the consumer, the others are the groups. With `-c`,
+    all arguments are groups for the consumers given by `-c`.
+
+    Groups the consumer is already in are skipped, the missing ones are added in
+    parallel.
+    """
+    pairs = _read_group_pairs(args, more, from_file)
+    if not any(pairs.values()):
         return
 
-    session = ctx.obj["session"]
+    _change_groups(ctx, pairs, concurrency, add=True)
 
-    for group in groups:
-        consumers.delete_group(session, id_username, group)
 
-    ctx.invoke(retrieve, id_username=id_username, acls=True)
+@click.command()
+@click.option(
+    "--consumer",
+    "-c",
+    "more",
+    multiple=True,
+    help="Consumers to delete the groups from, instead of the first argument.",
+)
+@click.option(
+    "--from-file",
+    type=click.File("r"),
+    help="File with one `consumer group` pair per line (`-` for stdin).",
+)
+@click.option(
+    "--concurrency", type=int, default=10, help="Number of requests in parallel."
+)
+@click.argument("args", nargs=-1, metavar="[ID_USERNAME] GROUPS...")
+@click.pass_context
+def delete_groups(
+    ctx: click.Context,
+    args: Tuple[str, ...],
+    more: Tuple[str, ...],
+    from_file: Optional[TextIO],
+    concurrency: int,
+) -> None:
+    """Delete the given groups from the consumer(s).
+
+    The first argument is the consumer, the others are the groups. With `-c`,
+    all arguments are groups for the consumers given by `-c`.
+
+    Groups the consumer is not in are skipped, the others are deleted in parallel.
+    """
+    pairs = _read_group_pairs(args, more, from_file)
+    if not any(pairs.values()):
+        return
+
+    _change_groups(ctx, pairs, concurrency, add=False)
 
 
 @click.command()
@@ -285,6 +486,7 @@ consumers_cli.add_command(list_consumers, name="list")
 consumers_cli.add_command(create)
 consumers_cli.add_command(retrieve)
 consumers_cli.add_command(delete)
+consumers_cli.add_command(delete_many_consumers, name="delete-many")
 consumers_cli.add_command(add_groups, name="add-groups")
 consumers_cli.add_command(delete_groups, name="delete-groups")
 consumers_cli.add_command(enable_rate_limiting_consumers, name="enable-rate-limiting")
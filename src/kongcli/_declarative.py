@@ -0,0 +1,317 @@
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, TextIO, Tuple
+
+import click
+from loguru import logger
+
+from ._session import LiveServerSession
+from ._snapshot import FOREIGN, foreign_id, load, RESOURCES, Snapshot, VOLATILE
+from ._util import json_dumps, json_loads
+from .kong import general
+
+# resource in the admin api -> top level key in the declarative config
+KEYS = {
+    "consumers": "consumers",
+    "services": "services",
+    "routes": "routes",
+    "plugins": "plugins",
+    "acls": "acls",
+    "key-auths": "keyauth_credentials",
+    "basic-auths": "basicauth_credentials",
+}
+# default `client_max_body_size` of the kong admin api
+MAX_SIZE = 10 * 1024 * 1024
+
+Config = Dict[str, Any]
+
+
+def _clean(entity: Dict[str, Any]) -> Dict[str, Any]:
+    result = {}
+    for k, v in entity.items():
+        if v is None or k in VOLATILE - {"id"}:
+            continue
+        if k in FOREIGN or (k.endswith("_id") and k[:-3] in FOREIGN):
+            continue
+        result[k] = v
+    for key in FOREIGN:
+        ref = foreign_id(entity, key)
+        if ref:
+            result[key] = ref
+    return result
+
+
+def build(snapshot: Snapshot, format_version: str = "2.1") -> Config:
+    """Build a flat declarative config from a snapshot (see `kongcli export`).
+
+    Entities keep their ids, references to other entities are given by id.
+    Basic-auth credentials are skipped: kong only exports the hashes of the
+    passwords and would hash them again on import.
+    """
+    config: Config = {"_format_version": format_version}
+    for resource in RESOURCES:
+        if resource == "basic-auths":
+            if snapshot[resource]:
+                logger.warning(
+                    f"Skip {len(snapshot[resource])} basic-auth credentials: "
+                    "kong exports hashed passwords."
+                )
+            continue
+        entities = [_clean(e) for e in snapshot[resource]]
+        if entities:
+            config[KEYS[resource]] = entities
+    return config
+
+
+def read(source: str, session: LiveServerSession) -> Config:
+    """Read a declarative config, an export file or a live kong admin api."""
+    if not source.startswith(("http://", "https://")):
+        with open(source) as f:
+            data = json_loads(f.read())
+        if isinstance(data, dict) and "_format_version" in data:
+            logger.info(f"Read declarative config from `{source}`.")
+            return data
+    return build(load(source, session))
+
+
+def merge(configs: List[Config], format_version: str) -> Config:
+    result: Config = {"_format_version": format_version}
+    for config in configs:
+        for k, v in config.items():
+            if k == "_format_version":
+                continue
+            if isinstance(v, list):
+                result.setdefault(k, []).extend(v)
+            else:
+                result[k] = v
+    return result
+
+
+def _duplicates(name: str, values: List[Any]) -> List[str]:
+    return [
+        f"duplicate {name} `{v}`"
+        for v, count in sorted(Counter(values).items(), key=str)
+        if count > 1
+    ]
+
+
+def _structure(config: Config) -> List[str]:
+    errors: List[str] = []
+    if not isinstance(config.get("_format_version"), str):
+        errors.append("`_format_version` has to be a string, e.g. `2.1`")
+    for k, v in config.items():
+        if k == "_format_version":
+            continue
+        if k not in KEYS.values():
+            errors.append(f"unknown top level key `{k}`")
+        elif not isinstance(v, list) or not all(isinstance(e, dict) for e in v):
+            errors.append(f"`{k}` has to be a list of entities")
+    return errors
+
+
+def _entities(config: Config, key: str) -> List[Dict[str, Any]]:
+    return list(config.get(key) or [])
+
+
+def _unique(config: Config) -> List[str]:
+    errors: List[str] = []
+    for key in KEYS.values():
+        errors += _duplicates(
+            f"id in `{key}`", [e["id"] for e in _entities(config, key) if e.get("id")]
+        )
+    for key, name, fields in (
+        ("services", "service", ("name",)),
+        ("routes", "route", ("name",)),
+        ("consumers", "consumer", ("username", "custom_id")),
+    ):
+        for f in fields:
+            errors += _duplicates(
+                f"{name} {f}", [e[f] for e in _entities(config, key) if e.get(f)]
+            )
+    errors += _duplicates(
+        "acl group of consumer",
+        [(a.get("consumer"), a.get("group")) for a in _entities(config, "acls")],
+    )
+    errors += _duplicates(
+        "key-auth key",
+        [k.get("key") for k in _entities(config, "keyauth_credentials")],
+    )
+    errors += _duplicates(
+        "basic-auth username",
+        [b.get("username") for b in _entities(config, "basicauth_credentials")],
+    )
+    errors += _duplicates(
+        "plugin (name, consumer, service, route)",
+        [
+            (p.get("name"), p.get("consumer"), p.get("service"), p.get("route"))
+            for p in _entities(config, "plugins")
+        ],
+    )
+    return errors
+
+
+# top level key -> (one of these fields is required, references)
+REQUIRED: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "consumers": (("username", "custom_id"), ()),
+    "services": (("host", "url"), ()),
+    "routes": (("paths", "hosts", "methods", "snis", "sources"), ("service",)),
+    "plugins": (("name",), ()),
+    "acls": (("group",), ("consumer",)),
+    "keyauth_credentials": (("key",), ("consumer",)),
+    "basicauth_credentials": (("username",), ("consumer",)),
+}
+
+
+def _entity_errors(
+    where: str, entity: Dict[str, Any], key: str, refs: Dict[str, Set[str]]
+) -> List[str]:
+    errors: List[str] = []
+    one_of, references = REQUIRED[key]
+    if not any(entity.get(f) for f in one_of):
+        errors.append(f"{where} needs one of {', '.join(one_of)}")
+    for ref in references:
+        if not entity.get(ref):
+            errors.append(f"{where} needs a {ref}")
+    for ref in FOREIGN:
+        target = entity.get(ref)
+        if isinstance(target, dict):
+            target = target.get("id")
+        if target and target not in refs[ref]:
+            errors.append(f"{where} references unknown {ref} `{target}`")
+    return errors
+
+
+def validate(config: Config) -> List[str]:
+    """Check the structure and integrity of a flat declarative config.
+
+    Returns a list of errors, an empty list means the config looks fine. Kong does
+    a more thorough validation of the plugin configurations on `POST /config`.
+    """
+    errors = _structure(config)
+    if errors:
+        return errors
+
+    errors = _unique(config)
+    refs: Dict[str, Set[str]] = {}
+    for key, fields in (
+        ("consumers", ("id", "username", "custom_id")),
+        ("services", ("id", "name")),
+        ("routes", ("id", "name")),
+    ):
+        refs[key[:-1]] = {
+            e[f] for e in _entities(config, key) for f in fields if e.get(f)
+        }
+    for key in REQUIRED:
+        for idx, e in enumerate(_entities(config, key)):
+            errors += _entity_errors(f"`{key}[{idx}]`", e, key, refs)
+    return errors
+
+
+def _prepare(
+    ctx: click.Context,
+    sources: Tuple[str, ...],
+    format_version: Optional[str],
+    max_size: int,
+) -> str:
+    session = ctx.obj["session"]
+    configs = [read(source, session) for source in sources]
+    versions = [c["_format_version"] for c in configs if "_format_version" in c]
+    version = format_version or (versions[0] if versions else "2.1")
+    config = merge(configs, version)
+
+    errors = validate(config)
+    payload = json_dumps(config)
+    if len(payload.encode()) > max_size:
+        errors.append(
+            f"config has {len(payload.encode())} bytes, the maximum is {max_size}"
+        )
+    for error in errors:
+        logger.error(error)
+    if errors:
+        click.echo(f"Declarative config is invalid: {len(errors)} error(s).", err=True)
+        raise click.Abort()
+
+    counts = ", ".join(
+        f"{key}: {len(config[key])}" for key in KEYS.values() if key in config
+    )
+    click.echo(f"Declarative config is valid ({counts}).", err=True)
+    return payload
+
+
+_sources = click.argument("sources", nargs=-1, required=True)
+_format_version = click.option(
+    "--format-version",
+    help="The `_format_version` of the config (default: from the sources or 2.1).",
+)
+_max_size = click.option(
+    "--max-size",
+    type=int,
+    default=MAX_SIZE,
+    show_default=True,
+    help="Maximal size of the config in bytes.",
+)
+
+
+@click.command()
+@_format_version
+@_max_size
+@click.option("--output", "-o", type=click.File("w"), default="-")
+@_sources
+@click.pass_context
+def build_cmd(
+    ctx: click.Context,
+    sources: Tuple[str, ...],
+    format_version: Optional[str],
+    max_size: int,
+    output: TextIO,
+) -> None:
+    """Build and validate a declarative config.
+
+    Each source is a declarative config in json, a file created with
+    `kongcli export` or a url to a kong admin api. The entities of all sources
+    are merged into a single config.
+    """
+    output.write(_prepare(ctx, sources, format_version, max_size))
+    output.write("\n")
+
+
+@click.command()
+@_format_version
+@_max_size
+@click.option(
+    "--dry-run", is_flag=True, help="Only build and validate the config locally."
+)
+@_sources
+@click.pass_context
+def push(
+    ctx: click.Context,
+    sources: Tuple[str, ...],
+    format_version: Optional[str],
+    max_size: int,
+    dry_run: bool,
+) -> None:
+    """Replace the config of a DB-less kong with one `POST /config`.
+
+    The sources are handled like in `kongcli config build`. The config is
+    validated locally before it is sent.
+    """
+    session = ctx.obj["session"]
+    payload = _prepare(ctx, sources, format_version, max_size)
+    if dry_run:
+        return
+    result = general.config(session, payload)
+    counts = ", ".join(
+        f"{k}: {len(v)}"
+        for k, v in sorted(result.items())
+        if isinstance(v, (list, dict))
+    )
+    click.echo(f"Pushed declarative config ({counts}).")
+
+
+@click.group(name="config")
+def config_cli() -> None:
+    """Manage the declarative config of DB-less kong nodes."""
+    pass
+
+
+config_cli.add_command(build_cmd, name="build")
+config_cli.add_command(push)
@@ -0,0 +1,248 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import click
+from loguru import logger
+from tabulate import tabulate
+
+from ._router import route_name
+from ._snapshot import foreign_id
+from ._timings import phase
+from ._util import get, json_dumps, json_pretty
+from .kong import general
+
+# kong's precedence of plugins configured on several entities, most specific first
+SCOPES = (
+    ("consumer", "route", "service"),
+    ("consumer", "route"),
+    ("consumer", "service"),
+    ("route", "service"),
+    ("consumer",),
+    ("route",),
+    ("service",),
+    (),
+)
+ANY = "*"
+
+Key = Tuple[str, Optional[str], Optional[str], Optional[str]]
+Resolved = Tuple[str, Dict[str, Any]]
+
+
+class PluginIndex:
+    """Enabled plugins by `(name, consumer id, route id, service id)`."""
+
+    def __init__(self, plugins: List[Dict[str, Any]]) -> None:
+        self.by_key: Dict[Key, Dict[str, Any]] = {}
+        # name -> consumer id -> keys of the plugins configured for the consumer
+        self.by_consumer: Dict[str, Dict[str, List[Key]]] = defaultdict(
+            lambda: defaultdict(list)
+        )
+        self.names: Set[str] = set()
+        for p in plugins:
+            # kong skips disabled plugins, less specific ones take over
+            if p.get("enabled") is False:
+                continue
+            key = (
+                p["name"],
+                foreign_id(p, "consumer"),
+                foreign_id(p, "route"),
+                foreign_id(p, "service"),
+            )
+            self.by_key[key] = p
+            self.names.add(p["name"])
+            if key[1] is not None:
+                self.by_consumer[p["name"]][key[1]].append(key)
+
+    def resolve(
+        self,
+        name: str,
+        consumer: Optional[str],
+        route: Optional[str],
+        service: Optional[str],
+    ) -> Optional[Resolved]:
+        """`(scope, plugin)` kong runs for a request, or None."""
+        ids = {"consumer": consumer, "route": route, "service": service}
+        for scope in SCOPES:
+            if any(ids[s] is None for s in scope):
+                continue
+            plugin = self.by_key.get(
+                (
+                    name,
+                    consumer if "consumer" in scope else None,
+                    route if "route" in scope else None,
+                    service if "service" in scope else None,
+                )
+            )
+            if plugin is not None:
+                return "+".join(scope) or "global", plugin
+        return None
+
+
+Row = Tuple[str, str, str, Resolved]
+
+
+def effective_rows(index: PluginIndex, routes: List[Dict[str, Any]]) -> Iterator[Row]:
+    """`(consumer id, route id, plugin name, (scope, plugin))` for all pairs.
+
+    The result is compressed with `*` for the consumer or route: for a consumer
+    on a route, the first of the rows `(consumer, route)`, `(consumer, *)`,
+    `(*, route)` and `(*, *)` of a plugin applies. Only consumers with plugins of
+    their own get rows, so the effort grows with the number of plugins, not with
+    the number of consumers times routes.
+    """
+    service_of = {r["id"]: foreign_id(r, "service") for r in routes}
+    routes_of: Dict[Optional[str], List[str]] = defaultdict(list)
+    for r in routes:
+        routes_of[service_of[r["id"]]].append(r["id"])
+
+    for name in sorted(index.names):
+        resolved = index.resolve(name, None, None, None)
+        if resolved is not None:
+            yield ANY, ANY, name, resolved
+        # routes where a route+service plugin beats a consumer plugin
+        route_service: Dict[str, Resolved] = {}
+        for route_id, service_id in service_of.items():
+            resolved = index.resolve(name, None, route_id, service_id)
+            if resolved is None or resolved[0] == "global":
+                continue
+            yield ANY, route_id, name, resolved
+            if resolved[0] == "route+service":
+                route_service[route_id] = resolved
+
+        for consumer_id, keys in index.by_consumer[name].items():
+            explicit: Set[str] = set()
+            consumer_only = False
+            for _, _, route_id, service_id in keys:
+                if route_id is not None:
+                    explicit.add(route_id)
+                elif service_id is not None:
+                    explicit.update(routes_of.get(service_id, []))
+                else:
+                    consumer_only = True
+            for route_id in sorted(explicit & service_of.keys()):
+                resolved = index.resolve(
+                    name, consumer_id, route_id, service_of[route_id]
+                )
+                assert resolved is not None
+                yield consumer_id, route_id, name, resolved
+            if consumer_only:
+                resolved = index.resolve(name, consumer_id, None, None)
+                assert resolved is not None
+                yield consumer_id, ANY, name, resolved
+                for route_id in sorted(route_service.keys() - explicit):
+                    yield consumer_id, route_id, name, route_service[route_id]
+
+
+def find_entity(
+    entities: List[Dict[str, Any]], id_or_name: str, keys: Tuple[str, ...]
+) -> Dict[str, Any]:
+    """The entity with `id_or_name` as one of `keys`; aborts, if there is none."""
+    for e in entities:
+        if any(e.get(k) == id_or_name for k in keys):
+            return e
+    logger.error(f"`{id_or_name}` not found.")
+    raise click.Abort()
+
+
+@click.command()
+@click.option("--consumer", "consumer_id", help="Id, username or custom_id.")
+@click.option("--route", "route_id", help="Id or name of the route.")
+@click.option(
+    "--plugin",
+    "-p",
+    "plugin_names",
+    multiple=True,
+    help="Only resolve these plugins, e.g. `rate-limiting`.",
+)
+@click.option("--ndjson", is_flag=True, help="Print one json object per row.")
+@click.pass_context
+def effective(
+    ctx: click.Context,
+    consumer_id: Optional[str],
+    route_id: Optional[str],
+    plugin_names: Tuple[str, ...],
+    ndjson: bool,
+) -> None:
+    """Show the plugins and configs kong runs for a consumer on a route.
+
+    Of the enabled plugins with the same name, kong runs the most specific one:
+    consumer+route+service, consumer+route, consumer+service, route+service,
+    consumer, route, service and finally global.
+
+    With `--consumer` and `--route`, the plugins of this pair are shown.
+    Otherwise the plugins of all consumer and route pairs are resolved from
+    indexes of the plugins (restricted to `--consumer` or `--route`, if given).
+    A `*` stands for all consumers (routes): for a consumer on a route, the
+    first of the rows `(consumer, route)`, `(consumer, *)`, `(*, route)` and
+    `(*, *)` of a plugin applies.
+    """
+    session = ctx.obj["session"]
+    tablefmt = ctx.obj["tablefmt"]
+
+    with phase("fetch"):
+        plugins = get("plugins", lambda: general.all_of("plugins", session))
+        routes = get("routes", lambda: general.all_of("routes", session))
+        services = get("services", lambda: general.all_of("services", session))
+        consumers = get("consumers", lambda: general.all_of("consumers", session))
+
+    with phase("resolve"):
+        index = PluginIndex(plugins)
+        if plugin_names:
+            index.names &= set(plugin_names)
+        consumer = route = None
+        if consumer_id:
+            consumer = find_entity(
+                consumers, consumer_id, ("id", "username", "custom_id")
+            )
+        if route_id:
+            route = find_entity(routes, route_id, ("id", "name"))
+
+        rows: List[Row] = []
+        if consumer is not None and route is not None:
+            for name in sorted(index.names):
+                resolved = index.resolve(
+                    name, consumer["id"], route["id"], foreign_id(route, "service")
+                )
+                if resolved is not None:
+                    rows.append((consumer["id"], route["id"], name, resolved))
+        else:
+            for row in effective_rows(index, routes):
+                if consumer is not None and row[0] not in (ANY, consumer["id"]):
+                    continue
+                if route is not None and row[1] not in (ANY, route["id"]):
+                    continue
+                rows.append(row)
+
+    with phase("render"):
+        consumer_names = {
+            c["id"]: c.get("username") or c.get("custom_id") or c["id"]
+            for c in consumers
+        }
+        routes_by_id = {r["id"]: r for r in routes}
+        service_names = {s["id"]: s.get("name") or s["id"] for s in services}
+        data = []
+        for c_id, r_id, name, (scope, plugin) in rows:
+            service_id = (
+                foreign_id(routes_by_id[r_id], "service") if r_id != ANY else None
+            )
+            data.append(
+                {
+                    "consumer": consumer_names.get(c_id, c_id),
+                    "route": route_name(routes_by_id[r_id]) if r_id != ANY else ANY,
+                    "service": service_names.get(service_id or "", service_id),
+                    "plugin": name,
+                    "scope": scope,
+                    "id": plugin["id"],
+                    "config": plugin.get("config"),
+                }
+            )
+        if ndjson:
+            for d in data:
+                click.echo(json_dumps(d))
+            return
+        pretty = consumer is not None and route is not None
+        for d in data:
+            d["config"] = (
+                json_pretty(d["config"]) if pretty else json_dumps(d["config"])
+            )
+        click.echo(tabulate(data, headers="keys", tablefmt=tablefmt))
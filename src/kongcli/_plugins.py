@@ -1,4 +1,7 @@
+from collections import Counter
 from operator import itemgetter
+import sys
+from threading import Lock
 from typing import Any, Dict, Iterable, Optional, Tuple
 from uuid import UUID
 
@@ -7,7 +10,20 @@ from loguru import logger
 from pyfiglet import print_figlet
 from tabulate import tabulate
 
-from ._util import get, json_pretty, parse_datetimes, sort_dict, substitude_ids
+from ._budget import BudgetExceeded
+from ._bulk import delete_many_plugins
+from ._effective import effective
+from ._selection import entity_name, has_selectors, select, selector_options
+from ._timings import phase
+from ._tracing import span
+from ._util import (
+    get,
+    json_pretty,
+    parse_datetimes,
+    run_concurrently,
+    sort_dict,
+    substitude_ids,
+)
 from .kong import general, plugins
 
 
@@ -21,26 +37,29 @@ def list_global_plugins(ctx: click.Context) -> None:
 
     print_figlet("Global Plugins", font=font, width=160)
 
-    plugins = get("plugins", lambda: general.all_of("plugins", session))
-
-    data = []
-    for p in plugins:
-        substitude_ids(p)
-        p = sort_dict(p)
-        if (
-            p.get("route.id") is None
-            and p.get("service.id") is None
-            and p.get("consumer.id") is None
-        ):
-            p["config"] = json_pretty(p["config"])
-            parse_datetimes(p)
-            data.append(p)
-
-    click.echo(
-        tabulate(
-            sorted(data, key=itemgetter("name")), headers="keys", tablefmt=tablefmt
+    with phase("fetch"):
+        plugins = get("plugins", lambda: general.all_of("plugins", session))
+
+    with phase("join"):
+        data = []
+        for p in plugins:
+            substitude_ids(p)
+            p = sort_dict(p)
+            if (
+                p.get("route.id") is None
+                and p.get("service.id") is None
+                and p.get("consumer.id") is None
+            ):
+                p["config"] = json_pretty(p["config"])
+                parse_datetimes(p)
+                data.append(p)
+
+    with phase("render"):
+        click.echo(
+            tabulate(
+                sorted(data, key=itemgetter("name")), headers="keys", tablefmt=tablefmt
+            )
         )
-    )
 
 
 @click.command()
@@ -52,34 +71,35 @@ def list_plugins(ctx: click.Context) -> None:
     font = ctx.obj["font"]
 
     print_figlet("Plugins", font=font, width=160)
-    plugins = get("plugins", lambda: general.all_of("plugins", session))
-    services = get("services", lambda: general.all_of("services", session))
-    consumers = get("consumers", lambda: general.all_of("consumers", session))
-
-    for p in plugins:
-        substitude_ids(p)
-        p = sort_dict(p)
-        p["config"] = json_pretty(p["config"])
-        parse_datetimes(p)
-        service_id = p.get("service.id")
-        if service_id:
-            for s in services:
-                if s["id"] == service_id:
-                    p["service_name"] = s["name"]
-                    break
-        consumer_id = p.get("consumer.id")
-        if consumer_id:
-            for c in consumers:
-                if c["id"] == consumer_id:
-                    p["consumer_name"] = c["username"]
-                    p["consumer_custom_id"] = c["custom_id"]
-                    break
+    with phase("fetch"):
+        plugins = get("plugins", lambda: general.all_of("plugins", session))
+        services = get("services", lambda: general.all_of("services", session))
+        consumers = get("consumers", lambda: general.all_of("consumers", session))
+
+    with phase("join"):
+        services_by_id = {s["id"]: s for s in services}
+        consumers_by_id = {c["id"]: c for c in consumers}
+        data = []
+        for p in plugins:
+            substitude_ids(p)
+            p = sort_dict(p)
+            p["config"] = json_pretty(p["config"])
+            parse_datetimes(p)
+            service = services_by_id.get(p.get("service.id"))
+            if service:
+                p["service_name"] = service.get("name")
+            consumer = consumers_by_id.get(p.get("consumer.id"))
+            if consumer:
+                p["consumer_name"] = consumer.get("username")
+                p["consumer_custom_id"] = consumer.get("custom_id")
+            data.append(p)
 
-    click.echo(
-        tabulate(
-            sorted(plugins, key=itemgetter("name")), headers="keys", tablefmt=tablefmt
+    with phase("render"):
+        click.echo(
+            tabulate(
+                sorted(data, key=itemgetter("name")), headers="keys", tablefmt=tablefmt
+            )
         )
-    )
 
 
 @click.command()
@@ -91,6 +111,111 @@ def schema(ctx: click.Context, plugin_name: str) -> None:
     click.echo(json_pretty(plugins.schema(session, plugin_name)))
 
 
+def _is_subset(want: Any, have: Any) -> bool:
+    # kong fills in defaults, hence only compare the given parts of the config
+    if isinstance(want, dict) and isinstance(have, dict):
+        return all(k in have and _is_subset(v, have[k]) for k, v in want.items())
+    return bool(want == have)
+
+
+def _enable_on_many(
+    ctx: click.Context,
+    resource: str,
+    ids: Tuple[str, ...],
+    plugin_name: str,
+    payload: Dict[str, Any],
+    selectors: Dict[str, Any],
+) -> None:
+    """Enable the plugin on all selected entities of `resource` in parallel.
+
+    Entities that already have the plugin with the same config are skipped, a
+    differing config is updated.
+    """
+    session = ctx.obj["session"]
+    tablefmt = ctx.obj["tablefmt"]
+
+    if not ids and not has_selectors(**selectors):
+        click.echo(f"Provide ids / names or selectors for the {resource}.", err=True)
+        raise click.Abort()
+
+    entities = select(resource, session, ids, **selectors)
+    if not entities:
+        click.echo(f"No {resource} selected.", err=True)
+        return
+
+    scope = resource[:-1]
+    existing: Dict[str, Dict[str, Any]] = {}
+    for p in get("plugins", lambda: general.all_of("plugins", session)):
+        substitude_ids(p)
+        if p["name"] != plugin_name:
+            continue
+        scopes = {k: p.get(f"{k}.id") for k in ("consumer", "service", "route")}
+        scope_id = scopes.pop(scope)
+        if scope_id and not any(scopes.values()):
+            existing[scope_id] = p
+
+    lock = Lock()
+    with click.progressbar(
+        length=len(entities), label=f"Enable {plugin_name}", file=sys.stderr
+    ) as bar:
+
+        def _apply(entity: Dict[str, Any]) -> Tuple[str, str, str, str]:
+            with span(f"enable {plugin_name}", resource=resource, id=entity["id"]):
+                name = entity_name(resource, entity) or ""
+                plugin = existing.get(entity["id"])
+                try:
+                    if plugin is None:
+                        plugin = plugins.enable_on(
+                            session, resource, entity["id"], plugin_name, **payload
+                        )
+                        action = "enabled"
+                    elif plugin["enabled"] == payload["enabled"] and _is_subset(
+                        payload["config"], plugin["config"]
+                    ):
+                        action = "unchanged"
+                    else:
+                        plugin = general.update(
+                            "plugins",
+                            session,
+                            plugin["id"],
+                            name=plugin_name,
+                            **payload,
+                        )
+                        action = "updated"
+                    result = (entity["id"], name, action, plugin["id"])
+                except BudgetExceeded:
+                    raise
+                except Exception as e:
+                    logger.error(
+                        f"Cannot enable {plugin_name} on `{entity['id']}`: {e}"
+                    )
+                    result = (entity["id"], name, "failed", str(e))
+            with lock:
+                bar.update(1)
+            return result
+
+        results = run_concurrently(
+            _apply, entities, concurrency=selectors.get("concurrency", 10)
+        )
+
+    click.echo(
+        tabulate(
+            sorted(results, key=itemgetter(2, 1)),
+            headers=[f"{scope}_id", "name", "action", "plugin_id / error"],
+            tablefmt=tablefmt,
+        )
+    )
+    counts = Counter(r[2] for r in results)
+    click.echo(
+        ", ".join(
+            f"{k}: {counts[k]}" for k in ("enabled", "updated", "unchanged", "failed")
+        ),
+        err=True,
+    )
+    if counts["failed"]:
+        ctx.exit(1)
+
+
 def _enable_basic_auth_on_resource(resource: str) -> click.Command:
     assert resource in ("services", "routes", "global")
 
@@ -225,6 +350,7 @@ def _enable_key_auth_on_resource(resource: str) -> click.Command:
     assert resource in ("services", "routes", "global")
 
     @click.command(name=f"enable-key-auth-on-{resource}")
+    @selector_options(resource)
     @click.option(
         "--not-enabled",
         is_flag=True,
@@ -255,23 +381,27 @@ def _enable_key_auth_on_resource(resource: str) -> click.Command:
         is_flag=True,
         help="A boolean value that indicates whether the plugin should run (and try to authenticate) on `OPTIONS` preflight requests, if set to `false` then `OPTIONS` requests will always be allowed.",
     )
-    @click.argument("id_name", required=resource != "global")
+    @click.argument("id_name", nargs=-1)
     @click.pass_context
     def enable_key_auth(
         ctx: click.Context,
-        id_name: str,
+        id_name: Tuple[str, ...],
         not_enabled: bool,
         key_names: Tuple[str, ...],
         key_in_body: bool,
         hide_credentials: bool,
         anonymous: Optional[UUID],
         not_run_on_preflight: bool,
+        **selectors: Any,
     ) -> None:
         """Enable the key-auth plugin.
 
         Once applied, any user with a valid credential can access the Service. To restrict
         usage to only some of the authenticated users, also add the ACL plugin (not covered
         here) and create whitelist or blacklist groups of users.
+
+        Provide multiple ids / names or selectors (e.g. `--tag`, `--name-glob`) to
+        enable the plugin on many entities at once.
         """
         session = ctx.obj["session"]
         tablefmt = ctx.obj["tablefmt"]
@@ -289,13 +419,16 @@ def _enable_key_auth_on_resource(resource: str) -> click.Command:
         if key_names:
             payload["config"]["key_names"] = list(key_names)
 
-        if resource != "global":
+        if resource == "global":
+            payload["name"] = "key-auth"
+            plugin = general.add("plugins", session, **payload)
+        elif len(id_name) == 1 and not has_selectors(**selectors):
             plugin = plugins.enable_on(
-                session, resource, id_name, "key-auth", **payload
+                session, resource, id_name[0], "key-auth", **payload
             )
         else:
-            payload["name"] = "key-auth"
-            plugin = general.add("plugins", session, **payload)
+            _enable_on_many(ctx, resource, id_name, "key-auth", payload, selectors)
+            return
 
         parse_datetimes(plugin)
         substitude_ids(plugin)
@@ -316,6 +449,7 @@ def _enable_acl_on_resource(resource: str) -> click.Command:
     assert resource in ("services", "routes", "global")
 
     @click.command(name=f"enable-acl-on-{resource}")
+    @selector_options(resource)
     @click.option(
         "--not-enabled",
         is_flag=True,
@@ -336,15 +470,16 @@ def _enable_acl_on_resource(resource: str) -> click.Command:
         is_flag=True,
         help="Flag which if enabled (true), prevents the `X-Consumer-Groups` header to be sent in the request to the upstream service. (ignored in 0.13.x)",
     )
-    @click.argument("id_name", required=resource != "global")
+    @click.argument("id_name", nargs=-1)
     @click.pass_context
     def enable_acl(
         ctx: click.Context,
-        id_name: str,
+        id_name: Tuple[str, ...],
         not_enabled: bool,
         allow: Tuple[str, ...],
         deny: Tuple[str, ...],
         hide_groups_header: bool,
+        **selectors: Any,
     ) -> None:
         """Enable the acl plugin.
 
@@ -357,6 +492,9 @@ def _enable_acl_on_resource(resource: str) -> click.Command:
         the resource (and all others are inherently allowed)
 
         From 0.14.1 onward, `whitelist` changed to `allow` and `blacklist` changed to `deny`.
+
+        Provide multiple ids / names or selectors (e.g. `--tag`, `--name-glob`) to
+        enable the plugin on many entities at once.
         """
         session = ctx.obj["session"]
         tablefmt = ctx.obj["tablefmt"]
@@ -393,11 +531,14 @@ def _enable_acl_on_resource(resource: str) -> click.Command:
         if deny:
             payload["config"][black_key] = list(deny)
 
-        if resource != "global":
-            plugin = plugins.enable_on(session, resource, id_name, "acl", **payload)
-        else:
+        if resource == "global":
             payload["name"] = "acl"
             plugin = general.add("plugins", session, **payload)
+        elif len(id_name) == 1 and not has_selectors(**selectors):
+            plugin = plugins.enable_on(session, resource, id_name[0], "acl", **payload)
+        else:
+            _enable_on_many(ctx, resource, id_name, "acl", payload, selectors)
+            return
 
         parse_datetimes(plugin)
         substitude_ids(plugin)
@@ -418,6 +559,7 @@ def _enable_rate_limiting_on_resource(resource: str) -> click.Command:
     assert resource in ("services", "routes", "consumers", "global")
 
     @click.command(name=f"enable-rate-limiting-on-{resource}")
+    @selector_options(resource)
     @click.option(
         "--not-enabled",
         is_flag=True,
@@ -503,11 +645,11 @@ def _enable_rate_limiting_on_resource(resource: str) -> click.Command:
         help="When using the redis policy, this property specifies Redis database to use.",
         default=0,
     )
-    @click.argument("resource_id", required=resource != "global")
+    @click.argument("resource_id", nargs=-1)
     @click.pass_context
     def enable_rate_limit(
         ctx: click.Context,
-        resource_id: str,
+        resource_id: Tuple[str, ...],
         not_enabled: bool,
         second: Optional[int],
         minute: Optional[int],
@@ -524,6 +666,7 @@ def _enable_rate_limiting_on_resource(resource: str) -> click.Command:
         redis_password: Optional[str],
         redis_timeout: int,
         redis_database: int,
+        **selectors: Any,
     ) -> None:
         """Enable the rate-limiting plugin.
 
@@ -534,6 +677,9 @@ def _enable_rate_limiting_on_resource(resource: str) -> click.Command:
 
         A plugin which is not associated to any Service, Route or Consumer is considered
         "global", and will be run on every request.
+
+        Provide multiple ids / names or selectors (e.g. `--tag`, `--name-glob`) to
+        enable the plugin on many entities at once.
         """
         session = ctx.obj["session"]
         tablefmt = ctx.obj["tablefmt"]
@@ -580,13 +726,18 @@ def _enable_rate_limiting_on_resource(resource: str) -> click.Command:
             if redis_password is not None:
                 payload["config"]["redis_password"] = redis_password
 
-        if resource != "global":
+        if resource == "global":
+            payload["name"] = "rate-limiting"
+            plugin = general.add("plugins", session, **payload)
+        elif len(resource_id) == 1 and not has_selectors(**selectors):
             plugin = plugins.enable_on(
-                session, resource, resource_id, "rate-limiting", **payload
+                session, resource, resource_id[0], "rate-limiting", **payload
             )
         else:
-            payload["name"] = "rate-limiting"
-            plugin = general.add("plugins", session, **payload)
+            _enable_on_many(
+                ctx, resource, resource_id, "rate-limiting", payload, selectors
+            )
+            return
 
         parse_datetimes(plugin)
         substitude_ids(plugin)
@@ -945,7 +1096,7 @@ def plugins_cli() -> None:
     Therefore, there exists an order of precedence for running a plugin when it has
     been applied to different entities with different configurations. The rule of thumb is:
     the more specific a plugin is with regards to how many entities it has been
-    configured on, the higher its priority.
+    configured on, the higher its priority (see `kongcli plugins effective`).
     """
     pass
 
@@ -953,6 +1104,7 @@ def plugins_cli() -> None:
 plugins_cli.add_command(list_global_plugins, name="list-global")
 plugins_cli.add_command(list_plugins, name="list")
 plugins_cli.add_command(schema)
+plugins_cli.add_command(effective)
 # plugins_cli.add_command(enable_basic_auth_routes)
 # plugins_cli.add_command(enable_basic_auth_services)
 plugins_cli.add_command(enable_basic_auth_global)
@@ -967,3 +1119,4 @@ plugins_cli.add_command(enable_rate_limiting_global)
 plugins_cli.add_command(enable_response_ratelimiting_global)
 plugins_cli.add_command(enable_request_size_limiting_global)
 plugins_cli.add_command(delete)
+plugins_cli.add_command(delete_many_plugins, name="delete-many")
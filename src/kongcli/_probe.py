@@ -0,0 +1,258 @@
+from collections import Counter, defaultdict
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import click
+from loguru import logger
+from tabulate import tabulate
+
+from ._router import is_regex, route_name, sample
+from ._session import LiveServerSession
+from ._timings import histogram_table, percentile
+from ._util import get, run_concurrently
+from .kong import general
+
+
+class Target:
+    """A synthetic request matching a route."""
+
+    def __init__(
+        self,
+        route: str,
+        service: str,
+        method: str,
+        path: str,
+        host: Optional[str],
+    ) -> None:
+        self.route = route
+        self.service = service
+        self.method = method
+        self.path = path
+        self.host = host
+
+    def __repr__(self) -> str:
+        host = f" (host {self.host})" if self.host else ""
+        return f"{self.method} {self.path}{host}"
+
+
+def target(
+    route: Dict[str, Any], service_name: str, suffix: str = ""
+) -> Optional[Target]:
+    """A request for `route` (first path, host and method) or None, if there is none.
+
+    Routes with only regex paths get a path matched by one of them (see
+    `_router.sample`).
+    """
+    protocols = route.get("protocols") or ["http", "https"]
+    if not {"http", "https"} & set(protocols):
+        logger.warning(f"Skip route `{route_name(route)}`: no http(s) protocol.")
+        return None
+    paths = [p for p in route.get("paths") or [] if not is_regex(p)]
+    if route.get("paths") and not paths:
+        paths = [p for p in map(sample, route["paths"]) if p is not None]
+    if route.get("paths") and not paths:
+        logger.warning(
+            f"Skip route `{route_name(route)}`: no path matched by its regex paths."
+        )
+        return None
+    hosts = route.get("hosts") or []
+    host = hosts[0].replace("*", "probe") if hosts else None
+    methods = route.get("methods") or ["GET"]
+    path = (paths[0] if paths else "/").rstrip("/") + suffix
+    return Target(route_name(route), service_name, methods[0], path or "/", host)
+
+
+Result = Tuple[Target, float, Optional[int]]
+
+
+def send(
+    proxy: LiveServerSession,
+    targets: Sequence[Target],
+    count: int,
+    concurrency: int,
+    rate: Optional[float] = None,
+) -> Tuple[List[Result], float]:
+    """Send `count` requests to every target; returns the results and the duration.
+
+    The requests to the targets are interleaved, the status is None for
+    connection errors.
+    """
+
+    def call(t: Target) -> Result:
+        headers = {"Host": t.host} if t.host else {}
+        start = perf_counter()
+        try:
+            resp = proxy.request(t.method, t.path, headers=headers)
+        except Exception as e:
+            logger.warning(f"`{t!r}` failed: {e}")
+            return t, perf_counter() - start, None
+        return t, perf_counter() - start, resp.status_code
+
+    start = perf_counter()
+    results = run_concurrently(
+        call, [t for _ in range(count) for t in targets], concurrency, rate
+    )
+    return results, perf_counter() - start
+
+
+def _statuses(results: Sequence[Result]) -> str:
+    counts = Counter(
+        str(status) if status is not None else "error" for _, _, status in results
+    )
+    return ", ".join(f"{status}: {n}" for status, n in sorted(counts.items()))
+
+
+def latency_rows(groups: Dict[Tuple[str, ...], List[Result]]) -> List[Tuple[Any, ...]]:
+    rows: List[Tuple[Any, ...]] = []
+    for key, results in groups.items():
+        latencies = sorted(seconds for _, seconds, _ in results)
+        rows.append(
+            key
+            + (
+                len(latencies),
+                _statuses(results),
+                1000 * percentile(latencies, 50),
+                1000 * percentile(latencies, 90),
+                1000 * percentile(latencies, 99),
+                1000 * latencies[-1],
+            )
+        )
+    # slowest first
+    rows.sort(key=lambda row: -row[-3])
+    return rows
+
+
+def proxy_session(proxy: str, header: Sequence[str]) -> LiveServerSession:
+    session = LiveServerSession(proxy)
+    for h in header:
+        name, _, value = h.partition(":")
+        session.headers[name.strip()] = value.strip()
+    return session
+
+
+@click.command()
+@click.option(
+    "--proxy",
+    envvar="KONG_PROXY",
+    default="http://localhost:8000",
+    show_default=True,
+    help="Base url of the kong proxy.",
+)
+@click.option(
+    "--route",
+    "-r",
+    "route_ids",
+    multiple=True,
+    help="Only probe these routes (id or name).",
+)
+@click.option(
+    "--service",
+    "-s",
+    "service_ids",
+    multiple=True,
+    help="Only probe the routes of these services (id or name).",
+)
+@click.option(
+    "--suffix",
+    default="",
+    help="Append this to the route path, e.g. `/get` for httpbin.",
+)
+@click.option(
+    "--header",
+    "-H",
+    multiple=True,
+    help="Send this header with every request, e.g. `apikey: secret`.",
+)
+@click.option(
+    "--requests",
+    "count",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Number of requests per route.",
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Number of requests in parallel.",
+)
+@click.option("--rate", type=float, help="Maximal number of requests per second.")
+@click.pass_context
+def probe(
+    ctx: click.Context,
+    proxy: str,
+    route_ids: Tuple[str, ...],
+    service_ids: Tuple[str, ...],
+    suffix: str,
+    header: Tuple[str, ...],
+    count: int,
+    concurrency: int,
+    rate: Optional[float],
+) -> None:
+    """Measure the proxy latency per route and service.
+
+    Sends `--requests` synthetic requests to every route through the kong proxy,
+    using the first path (regex paths are skipped), host and method of the route.
+    Reports the status codes and latency percentiles per route and service.
+    """
+    session = ctx.obj["session"]
+    tablefmt = ctx.obj["tablefmt"]
+
+    routes = get("routes", lambda: general.all_of("routes", session))
+    services = get("services", lambda: general.all_of("services", session))
+    service_names = {s["id"]: s.get("name") or s["id"] for s in services}
+
+    if service_ids:
+        wanted = {
+            s["id"] for s in services if {s["id"], s.get("name")} & set(service_ids)
+        }
+        routes = [r for r in routes if (r.get("service") or {}).get("id") in wanted]
+    if route_ids:
+        routes = [r for r in routes if {r["id"], r.get("name")} & set(route_ids)]
+
+    targets = []
+    for r in routes:
+        t = target(r, service_names.get((r.get("service") or {}).get("id"), ""), suffix)
+        if t is not None:
+            targets.append(t)
+    if not targets:
+        logger.error("No routes to probe.")
+        raise click.Abort()
+
+    proxy_ = proxy_session(proxy, header)
+    try:
+        results, seconds = send(proxy_, targets, count, concurrency, rate)
+    finally:
+        proxy_.close()
+
+    by_route: Dict[Tuple[str, ...], List[Result]] = defaultdict(list)
+    by_service: Dict[Tuple[str, ...], List[Result]] = defaultdict(list)
+    for result in results:
+        t = result[0]
+        by_route[(t.route, t.service, repr(t))].append(result)
+        by_service[(t.service,)].append(result)
+
+    stats = ["requests", "status", "p50 ms", "p90 ms", "p99 ms", "max ms"]
+    click.echo(
+        f"{len(results)} requests to {len(targets)} routes in {seconds:.2f} s: "
+        f"{len(results) / seconds:.1f} requests per second."
+    )
+    click.echo(
+        tabulate(
+            latency_rows(by_route),
+            headers=["route", "service", "request"] + stats,
+            tablefmt=tablefmt,
+            floatfmt=".1f",
+        )
+    )
+    click.echo(
+        tabulate(
+            latency_rows(by_service),
+            headers=["service"] + stats,
+            tablefmt=tablefmt,
+            floatfmt=".1f",
+        )
+    )
+    click.echo(histogram_table([s for _, s, _ in results], tablefmt))
@@ -0,0 +1,61 @@
+import cProfile
+import linecache
+import tracemalloc
+from typing import Callable, List
+
+import click
+from loguru import logger
+from tabulate import tabulate
+
+
+def start_cpu_profile(path: str) -> Callable[[], None]:
+    """Start cProfile; the returned function stops it and writes the pstats file."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    def stop() -> None:
+        profiler.disable()
+        profiler.dump_stats(path)
+        logger.info(f"Wrote profile to `{path}`, see `python -m pstats {path}`.")
+
+    return stop
+
+
+def start_memory_profile(tablefmt: str, top: int = 20) -> Callable[[], None]:
+    """Start tracemalloc; the returned function stops it and reports the top sites."""
+    tracemalloc.start()
+
+    def stop() -> None:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        snapshot = snapshot.filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+                tracemalloc.Filter(False, "<unknown>"),
+            )
+        )
+        rows: List[List[object]] = []
+        for stat in snapshot.statistics("lineno")[:top]:
+            frame = stat.traceback[0]
+            rows.append(
+                [
+                    f"{frame.filename}:{frame.lineno}",
+                    stat.count,
+                    round(stat.size / 1024, 1),
+                    linecache.getline(frame.filename, frame.lineno).strip(),
+                ]
+            )
+        click.echo(
+            tabulate(
+                rows, headers=["site", "blocks", "KiB", "line"], tablefmt=tablefmt
+            ),
+            err=True,
+        )
+        click.echo(
+            f"current: {current / 1024:.1f} KiB, peak: {peak / 1024:.1f} KiB",
+            err=True,
+        )
+
+    return stop
@@ -0,0 +1,124 @@
+from collections import defaultdict
+from threading import Lock
+from typing import Any, Dict, List, Optional, Set, TextIO, Tuple
+
+from loguru import logger
+import orjson
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError
+from requests.structures import CaseInsensitiveDict
+
+from ._session import LiveServerSession
+
+
+def _body(body: Any) -> Optional[str]:
+    if isinstance(body, bytes):
+        return body.decode()
+    if body is None or isinstance(body, str):
+        return body
+    raise ValueError("Cannot record streamed request bodies.")
+
+
+class Recorder:
+    """Write every request / response pair of a session as json lines to `output`."""
+
+    def __init__(self, output: TextIO) -> None:
+        self.output = output
+        self.lock = Lock()
+
+    def on_request(
+        self, method: str, url: str, response: Optional[Response], seconds: float
+    ) -> None:
+        if response is None:
+            return
+        line = orjson.dumps(
+            {
+                "method": method.upper(),
+                "url": url,
+                "body": _body(response.request.body),
+                "status": response.status_code,
+                "reason": response.reason,
+                "headers": {
+                    k: v
+                    for k, v in response.headers.items()
+                    if k.lower() in ("content-type", "location")
+                },
+                "content": response.text,
+                "seconds": seconds,
+            }
+        ).decode()
+        with self.lock:
+            self.output.write(line)
+            self.output.write("\n")
+
+
+class ReplayAdapter(BaseAdapter):
+    """Serve recorded responses instead of sending requests.
+
+    Requests are matched by method, url and body, then by method and url only.
+    Repeated requests get the recorded responses in order; the last one is
+    repeated, when they are used up. Every recorded response is served once,
+    before any is repeated.
+    """
+
+    def __init__(self, recording: TextIO, prefix_url: str) -> None:
+        super(ReplayAdapter, self).__init__()
+        self.prefix_url = prefix_url
+        self.lock = Lock()
+        self.responses: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+        # indexes of the served entries, shared by the body and url matching
+        self.served: Set[int] = set()
+        count = 0
+        for line in recording:
+            if not line.strip():
+                continue
+            entry = orjson.loads(line)
+            entry["_idx"] = count
+            self.responses[(entry["method"], entry["url"])].append(entry)
+            count += 1
+        logger.info(f"Loaded {count} recorded responses.")
+
+    def _next(
+        self, method: str, url: str, body: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        entries = self.responses.get((method, url), [])
+        for candidates in ([e for e in entries if e["body"] == body], entries):
+            if not candidates:
+                continue
+            for entry in candidates:
+                if entry["_idx"] not in self.served:
+                    self.served.add(entry["_idx"])
+                    return entry
+            return candidates[-1]
+        return None
+
+    def send(self, request: PreparedRequest, **kwargs: Any) -> Response:  # type: ignore
+        url = request.url or ""
+        if url.startswith(self.prefix_url):
+            url = url[len(self.prefix_url) :]
+        method = (request.method or "GET").upper()
+        with self.lock:
+            entry = self._next(method, url, _body(request.body))
+        if entry is None:
+            raise ConnectionError(f"No recorded response for `{method} {url}`.")
+
+        response = Response()
+        response.status_code = entry["status"]
+        response.reason = entry["reason"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = entry["content"].encode()
+        response.encoding = "utf-8"
+        response.url = request.url or ""
+        response.request = request
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def replay(session: LiveServerSession, recording: TextIO) -> None:
+    """Serve all requests of `session` from the `recording`."""
+    adapter = ReplayAdapter(recording, session.prefix_url)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
@@ -0,0 +1,400 @@
+"""Cost of the regex paths of the routes.
+
+Kong tries the regex paths of the routes in order for every request, before
+the prefix paths of the same category, so a slow regex slows down the proxy for
+all requests that reach it. The report combines
+
+- static hazards found in the parse tree: nested unbounded quantifiers (e.g.
+  `(a+)+`), unbounded repeats of alternations with overlapping branches (e.g.
+  `(a|a?)+`) and adjacent unbounded quantifiers over overlapping characters
+  (e.g. `\\d+\\d*`),
+- the mean time per path of synthetic and sampled request paths and
+- the growth of the match time for inputs of increasing length, that repeat a
+  unit of an unbounded quantifier and then fail: python's `re` and kong's pcre
+  are both backtracking engines.
+"""
+from math import log
+import re
+import string
+from time import perf_counter
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Set, TextIO, Tuple
+
+import click
+from tabulate import tabulate
+
+from ._router import (
+    is_regex,
+    literal_prefix,
+    load_routes,
+    MAXREPEAT,
+    parse,
+    parse_request,
+    route_name,
+    sample,
+    sample_of,
+    source_option,
+)
+from ._snapshot import foreign_id
+
+REPEATS = ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+# characters to approximate the character sets of (sub) patterns
+ALPHABET = string.ascii_letters + string.digits + "/-._~% !"
+# times below this are too noisy to estimate the growth
+NOISE = 50e-6
+
+
+def _in(items: Any, char: str) -> bool:
+    negate = False
+    found = False
+    for op, av in items:
+        name = str(op)
+        if name == "NEGATE":
+            negate = True
+        elif name == "LITERAL":
+            found = found or chr(av) == char
+        elif name == "RANGE":
+            found = found or av[0] <= ord(char) <= av[1]
+        elif name == "CATEGORY":
+            category = str(av)
+            if category.endswith("_DIGIT"):
+                found = found or char.isdigit()
+            elif category.endswith("_WORD"):
+                found = found or char.isalnum() or char == "_"
+            elif category.endswith("_SPACE"):
+                found = found or char.isspace()
+            else:
+                found = True
+    return found != negate
+
+
+def first_chars(items: Any) -> Set[str]:
+    """Characters (of `ALPHABET`) a match of the parse tree `items` may start with."""
+    result: Set[str] = set()
+    for op, av in items:
+        name = str(op)
+        if name == "LITERAL":
+            return result | {chr(av)}
+        if name == "NOT_LITERAL":
+            return result | (set(ALPHABET) - {chr(av)})
+        if name == "ANY":
+            return result | set(ALPHABET)
+        if name == "IN":
+            return result | {c for c in ALPHABET if _in(av, c)}
+        if name == "SUBPATTERN":
+            return result | first_chars(av[-1])
+        if name == "BRANCH":
+            for branch in av[1]:
+                result |= first_chars(branch)
+            return result
+        if name in REPEATS:
+            low, _, sub = av
+            result |= first_chars(sub)
+            if low > 0:
+                return result
+            # optional: the next item may start the match
+            continue
+        if name in ("AT", "ASSERT", "ASSERT_NOT"):
+            continue
+        # back references, groupref exists, ...
+        return set(ALPHABET)
+    return result
+
+
+def _unbounded(av: Any) -> bool:
+    return bool(av[1] == MAXREPEAT)
+
+
+def hazards(items: Any, in_repeat: bool = False) -> Set[str]:
+    """Static backtracking hazards of the parse tree `items`."""
+    result: Set[str] = set()
+    previous: Optional[Set[str]] = None
+    for op, av in items:
+        name = str(op)
+        if name in REPEATS:
+            low, high, sub = av
+            unbounded = _unbounded(av)
+            if unbounded and in_repeat and name != "POSSESSIVE_REPEAT":
+                result.add("nested quantifier")
+            if unbounded:
+                for sub_op, sub_av in sub:
+                    if str(sub_op) == "SUBPATTERN":
+                        sub_op, sub_av = (list(sub_av[-1]) or [(None, None)])[0]
+                    if str(sub_op) == "BRANCH":
+                        firsts = [first_chars(b) for b in sub_av[1]]
+                        seen: Set[str] = set()
+                        for chars in firsts:
+                            if chars & seen:
+                                result.add("overlapping alternation in repeat")
+                            seen |= chars
+                chars = first_chars(sub)
+                if previous is not None and previous & chars:
+                    result.add("adjacent quantifiers")
+                previous = chars
+            else:
+                previous = None
+            result |= hazards(sub, in_repeat or (unbounded or high > 1))
+            continue
+        previous = None
+        if name == "SUBPATTERN":
+            result |= hazards(av[-1], in_repeat)
+        elif name == "BRANCH":
+            for branch in av[1]:
+                result |= hazards(branch, in_repeat)
+        elif name in ("ASSERT", "ASSERT_NOT"):
+            result |= hazards(av[1], in_repeat)
+    return result
+
+
+def units(items: Any) -> List[str]:
+    """Samples of the bodies of the unbounded quantifiers, to build long inputs."""
+    result: List[str] = []
+    for op, av in items:
+        name = str(op)
+        if name in REPEATS:
+            if _unbounded(av):
+                unit = sample_of(av[2])
+                if unit:
+                    result.append(unit)
+            result.extend(units(av[2]))
+        elif name == "SUBPATTERN":
+            result.extend(units(av[-1]))
+        elif name == "BRANCH":
+            for branch in av[1]:
+                result.extend(units(branch))
+    # unique, in order
+    return list(dict.fromkeys(result))
+
+
+def attacks(items: Any) -> List[Tuple[str, str]]:
+    """`(prefix, unit)` to build long inputs for every unbounded quantifier.
+
+    The prefix is a sample of the part of the regex before the (top level) item
+    with the quantifier.
+    """
+    result = []
+    for idx in range(len(items)):
+        prefix = sample_of(items[:idx])
+        if prefix is None:
+            break
+        for unit in units(items[idx : idx + 1]):
+            result.append((prefix, unit))
+    return result
+
+
+def synthetic_paths(regex: str) -> List[str]:
+    """Typical paths for `regex`: matching ones and near misses."""
+    prefix = literal_prefix(regex)
+    paths = [prefix, f"{prefix}x", f"{prefix}x/y/z", "/", "/" + "a" * 32]
+    s = sample(regex)
+    if s is not None:
+        paths += [s, f"{s}/more", s[:-1]]
+    return [p if p.startswith("/") else f"/{p}" for p in paths]
+
+
+def mean_time(regex: Pattern[str], paths: List[str], repeat: int = 3) -> float:
+    """Best mean seconds per path of matching all `paths`."""
+    best = float("inf")
+    match = regex.match
+    for _ in range(repeat):
+        start = perf_counter()
+        for p in paths:
+            match(p)
+        best = min(best, perf_counter() - start)
+    return best / max(len(paths), 1)
+
+
+def growth(
+    regex: Pattern[str],
+    prefix: str,
+    unit: str,
+    budget: float,
+    max_length: int,
+) -> List[Tuple[int, float]]:
+    """`(length, seconds)` of (failing) inputs `prefix + unit * n + "!"`.
+
+    The length grows by a quarter per step (so an exponential blow up cannot
+    overshoot the budget by much) and stops after the first input that takes
+    longer than `budget` seconds.
+    """
+    result = []
+    n = 4
+    while n * len(unit) <= max_length:
+        text = f"{prefix}{unit * n}!"
+        seconds = float("inf")
+        for _ in range(3):
+            start = perf_counter()
+            regex.match(text)
+            seconds = min(seconds, perf_counter() - start)
+            if seconds > budget:
+                break
+        result.append((n * len(unit), seconds))
+        if seconds > budget:
+            break
+        n += max(1, n // 4)
+    return result
+
+
+def complexity(points: List[Tuple[int, float]], budget: float) -> Tuple[str, float]:
+    """Classify the growth of the match time and estimate its exponent."""
+    if not points:
+        return "-", 0.0
+    length, seconds = points[-1]
+    if seconds > budget and length <= 64:
+        return "exponential", float("inf")
+    measurable = [(n, s) for n, s in points if s > NOISE]
+    exponent = 1.0
+    if len(measurable) >= 2 and measurable[-1][0] > measurable[0][0]:
+        (n0, s0), (n1, s1) = measurable[0], measurable[-1]
+        exponent = log(s1 / s0) / log(n1 / n0)
+    if seconds > budget:
+        return ("exponential" if exponent > 4 else "polynomial"), exponent
+    if exponent >= 1.7:
+        return "polynomial", exponent
+    return "linear", exponent
+
+
+RANK = {"invalid": 4, "exponential": 3, "polynomial": 2, "linear": 0, "-": 0}
+
+
+def profile(
+    regex: str,
+    samples: List[str],
+    budget: float,
+    max_length: int,
+) -> Dict[str, Any]:
+    """Hazards, mean match time and growth of one regex path."""
+    parsed = parse(regex)
+    try:
+        compiled = re.compile(regex)
+    except re.error:
+        compiled = None
+    if parsed is None or compiled is None:
+        return {
+            "hazards": "invalid regex",
+            "complexity": "invalid",
+            "exponent": None,
+            "mean us": None,
+            "worst ms": None,
+            "at length": None,
+        }
+
+    paths = synthetic_paths(regex) + samples
+    worst: Tuple[str, float] = ("-", 0.0)
+    worst_point = (0, 0.0)
+    for prefix, unit in attacks(parsed) or [(literal_prefix(regex), "a")]:
+        points = growth(compiled, prefix, unit, budget, max_length)
+        kind, exponent = complexity(points, budget)
+        if (RANK[kind], exponent) > (RANK[worst[0]], worst[1]):
+            worst = (kind, exponent)
+        if points and points[-1][1] > worst_point[1]:
+            worst_point = points[-1]
+    return {
+        "hazards": ", ".join(sorted(hazards(parsed))),
+        "complexity": worst[0],
+        "exponent": worst[1] if worst[1] != float("inf") else None,
+        "mean us": 1e6 * mean_time(compiled, paths),
+        "worst ms": 1000 * worst_point[1],
+        "at length": worst_point[0],
+    }
+
+
+def regex_paths(routes: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Routes by regex path."""
+    result: Dict[str, List[Dict[str, Any]]] = {}
+    for route in routes:
+        for path in route.get("paths") or []:
+            if is_regex(path):
+                result.setdefault(path, []).append(route)
+    return result
+
+
+@click.command(name="regex-report")
+@source_option
+@click.option(
+    "--file",
+    "requests_file",
+    type=click.File("r"),
+    help="Also time the paths of these requests (format of `routes match`).",
+)
+@click.option(
+    "--samples",
+    type=click.IntRange(min=0),
+    default=1000,
+    show_default=True,
+    help="Use at most this many paths of `--file`.",
+)
+@click.option(
+    "--budget",
+    type=click.FloatRange(min=0.1),
+    default=10.0,
+    show_default=True,
+    help="Stop growing the input, when a match takes longer (ms).",
+)
+@click.option(
+    "--max-length",
+    type=click.IntRange(min=8),
+    default=2048,
+    show_default=True,
+    help="Maximal length of the growing inputs.",
+)
+@click.option("--top", type=click.IntRange(min=1), help="Only show the worst N.")
+@click.pass_context
+def regex_report(
+    ctx: click.Context,
+    source: Optional[str],
+    requests_file: Optional[TextIO],
+    samples: int,
+    budget: float,
+    max_length: int,
+    top: Optional[int],
+) -> None:
+    """Rank the regex paths of the routes by their matching cost.
+
+    Every regex path is compiled and timed against synthetic paths and the
+    sampled paths of `--file` (mean us). Inputs of growing length, repeating a
+    unit of every unbounded quantifier and then failing, reveal catastrophic
+    backtracking: the match time grows linear, polynomial or exponential with
+    the length (worst ms at length). Static hazards of the regex are listed as
+    well.
+    """
+    tablefmt = ctx.obj["tablefmt"]
+
+    routes, services = load_routes(ctx, source)
+    service_names = {s["id"]: s.get("name") or s["id"] for s in services}
+    sampled: List[str] = []
+    if requests_file is not None:
+        for line in requests_file:
+            if len(sampled) >= samples:
+                break
+            if not line.strip() or line.startswith("#"):
+                continue
+            try:
+                sampled.append(parse_request(line)[2])
+            except ValueError:
+                continue
+
+    rows = []
+    for regex, regex_routes in regex_paths(routes).items():
+        result = profile(regex, sampled, budget / 1000, max_length)
+        for route in regex_routes:
+            service_id = foreign_id(route, "service")
+            rows.append(
+                {
+                    "route": route_name(route),
+                    "service": service_names.get(service_id, service_id),
+                    "regex": regex,
+                    "priority": route.get("regex_priority") or 0,
+                    **result,
+                }
+            )
+    rows.sort(
+        key=lambda r: (
+            -RANK[r["complexity"]],
+            -(r["exponent"] or 0) if r["complexity"] != "linear" else 0,
+            -bool(r["hazards"]),
+            -(r["mean us"] or 0),
+        )
+    )
+    if top:
+        rows = rows[:top]
+    click.echo(tabulate(rows, headers="keys", tablefmt=tablefmt, floatfmt=".2f"))
@@ -0,0 +1,816 @@
+"""Local model of kong's (0.13 - 2.x) http router.
+
+A route matches a request, if all attributes it sets match: one of its
+`methods`, one of its `hosts` (exact, `*.example.com` or `example.*`), one
+value of each of its `headers` and one of its `paths`. Paths with characters
+other than `a-zA-Z0-9.-_~/%` are regexes matched at the start of the request
+path, others are plain prefixes.
+
+When several routes match, kong's documented evaluation order decides:
+
+1. routes with more attributes (hosts, headers, paths, methods) first, then by
+   the attribute (hosts before headers before paths before methods),
+2. exact hosts before wildcard hosts,
+3. regex paths before prefix paths; regex paths by `regex_priority` (highest
+   first), prefix paths by length (longest first),
+4. the older route first.
+
+The router indexes routes by host (exact hosts in a dict, the few wildcard
+patterns in a list) and, per host, their prefix paths (and the literal
+prefixes of regex paths) in a trie of path segments. Matching a request only
+looks at the routes of its host and at the trie nodes along its path.
+"""
+from collections import defaultdict
+import re
+import sys
+from time import perf_counter
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    Set,
+    TextIO,
+    Tuple,
+)
+from urllib.parse import urlsplit
+
+# the parser behind `re`, shared with `_regex_report`
+if sys.version_info >= (3, 11):
+    from re import _constants as sre_constants  # type: ignore[attr-defined]
+    from re import _parser as sre_parse  # type: ignore[attr-defined]
+else:  # pragma: no cover
+    import sre_constants
+    import sre_parse
+
+import click
+from loguru import logger
+from tabulate import tabulate
+
+from ._snapshot import foreign_id, load
+from ._util import get, json_dumps, json_loads
+from .kong import general
+
+# the upper bound of unbounded repeats (`*`, `+`, `{n,}`) in the parse tree
+MAXREPEAT = sre_constants.MAXREPEAT
+# kong treats a path as regex, if it has other characters than these
+PLAIN = re.compile(r"^[a-zA-Z0-9.\-_~/%]*$")
+# characters of a regex that match themselves (not `.`)
+LITERAL = re.compile(r"[a-zA-Z0-9\-_~/%]*")
+
+# attribute bits of the route categories (see kong's router.lua)
+HOST = 0x40
+HEADER = 0x20
+PATH = 0x10
+METHOD = 0x08
+
+
+def is_regex(path: str) -> bool:
+    return not PLAIN.match(path)
+
+
+def literal_prefix(regex: str) -> str:
+    """The prefix every path matched by `regex` starts with."""
+    if "|" in regex:
+        return ""
+    if regex.startswith("^"):
+        regex = regex[1:]
+    prefix = LITERAL.match(regex).group()  # type: ignore
+    if regex[len(prefix) : len(prefix) + 1] in ("?", "*", "{"):
+        # the last character is optional
+        prefix = prefix[:-1]
+    return prefix
+
+
+def sample_of(items: Any) -> Optional[str]:
+    """A string matched by the (sub) parse tree `items` or None."""
+    result = []
+    for op, av in items:
+        name = str(op)
+        if name == "LITERAL":
+            result.append(chr(av))
+        elif name == "ANY":
+            result.append("a")
+        elif name == "IN":
+            s = _sample_in(av)
+            if s is None:
+                return None
+            result.append(s)
+        elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+            low, _, sub = av
+            s = sample_of(sub)
+            if s is None:
+                return None
+            result.append(s * max(low, 1))
+        elif name == "SUBPATTERN":
+            s = sample_of(av[-1])
+            if s is None:
+                return None
+            result.append(s)
+        elif name == "BRANCH":
+            s = sample_of(av[1][0])
+            if s is None:
+                return None
+            result.append(s)
+        elif name in ("AT", "ASSERT", "ASSERT_NOT"):
+            continue
+        else:
+            return None
+    return "".join(result)
+
+
+def _sample_in(items: Any) -> Optional[str]:
+    for op, av in items:
+        name = str(op)
+        if name == "NEGATE":
+            return None
+        if name == "LITERAL":
+            return chr(av)
+        if name == "RANGE":
+            return chr(av[0])
+        if name == "CATEGORY":
+            category = str(av)
+            if category.endswith("_DIGIT"):
+                return "1"
+            if category.endswith("_WORD"):
+                return "a"
+            if category.endswith("_SPACE"):
+                return " "
+            return None
+    return None
+
+
+def parse(regex: str) -> Any:
+    """The parse tree of python's `re` for `regex` or None, if it is invalid."""
+    try:
+        return sre_parse.parse(regex)
+    except Exception:
+        return None
+
+
+def sample(regex: str) -> Optional[str]:
+    """A (short) path matched by `regex` or None, if there is no simple one."""
+    parsed = parse(regex)
+    if parsed is None:
+        return None
+    return sample_of(parsed)
+
+
+def host_matches(pattern: str, host: str) -> bool:
+    if pattern.startswith("*."):
+        return host.endswith(pattern[1:])
+    if pattern.endswith(".*"):
+        return host.startswith(pattern[:-1])
+    return pattern == host
+
+
+def route_name(route: Dict[str, Any]) -> str:
+    return str(route.get("name") or route["id"])
+
+
+class Entry:
+    """A route in the index: one of its hosts (or none) and paths (or none)."""
+
+    def __init__(
+        self,
+        route: Dict[str, Any],
+        host: Optional[str],
+        path: Optional[str],
+    ) -> None:
+        self.route = route
+        self.host = host
+        self.path = path
+        self.regex: Optional[Pattern[str]] = None
+        # a path matched by the regex path, parsed once for the analysis
+        self.sample: Optional[str] = None
+        if path is not None and is_regex(path):
+            self.sample = sample(path)
+            try:
+                self.regex = re.compile(path)
+            except re.error:
+                # kong uses pcre; never matches here
+                self.regex = re.compile(r"(?!)")
+        methods = route.get("methods")
+        self.methods: Optional[Set[str]] = set(methods) if methods else None
+        headers = route.get("headers") or {}
+        self.headers: Dict[str, Set[str]] = {
+            k.lower(): {v.lower() for v in vs} for k, vs in headers.items()
+        }
+        self.bits = (
+            (HOST if host is not None else 0)
+            | (HEADER if self.headers else 0)
+            | (PATH if path is not None else 0)
+            | (METHOD if self.methods else 0)
+        )
+        if self.regex is not None:
+            path_rank: Tuple[int, int] = (0, -int(route.get("regex_priority") or 0))
+        elif path is not None:
+            path_rank = (1, -len(path))
+        else:
+            path_rank = (2, 0)
+        # entries in the same category compete by the evaluation order only
+        self.category = (
+            self.bits,
+            tuple(sorted((k, tuple(sorted(v))) for k, v in self.headers.items())),
+        )
+        self.key = (
+            -bin(self.bits).count("1"),
+            -self.bits,
+            1 if host is not None and "*" in host else 0,
+            path_rank,
+            route.get("created_at") or 0,
+            route["id"],
+        )
+
+    def matches(self, method: str, path: str, headers: Dict[str, str]) -> Optional[str]:
+        """The matched part of the path ("" without paths) or None."""
+        if self.methods is not None and method.upper() not in self.methods:
+            return None
+        for name, values in self.headers.items():
+            if headers.get(name, "").lower() not in values:
+                return None
+        if self.path is None:
+            return ""
+        if self.regex is not None:
+            m = self.regex.match(path)
+            return m.group() if m else None
+        return self.path if path.startswith(self.path) else None
+
+
+class _Node:
+    def __init__(self) -> None:
+        self.children: Dict[str, _Node] = {}
+        # last (partial) segment of a prefix -> entries
+        self.tails: Dict[str, List[Entry]] = defaultdict(list)
+
+
+class PathTrie:
+    """Entries by (literal) path prefix, in a trie of `/` separated segments."""
+
+    def __init__(self) -> None:
+        self.root = _Node()
+        self.pathless: List[Entry] = []
+
+    def add(self, entry: Entry) -> None:
+        if entry.path is None:
+            self.pathless.append(entry)
+            return
+        prefix = entry.path if entry.regex is None else literal_prefix(entry.path)
+        segments = prefix.split("/")
+        node = self.root
+        for segment in segments[:-1]:
+            node = node.children.setdefault(segment, _Node())
+        node.tails[segments[-1]].append(entry)
+
+    def lookup(self, path: str) -> Iterator[Entry]:
+        """Entries with a prefix of `path` as (literal) prefix, and the pathless."""
+        yield from self.pathless
+        node: Optional[_Node] = self.root
+        for segment in path.split("/"):
+            assert node is not None
+            for idx in range(len(segment) + 1):
+                yield from node.tails.get(segment[:idx], ())
+            node = node.children.get(segment)
+            if node is None:
+                return
+
+    def under(self, prefix: str) -> Iterator[Entry]:
+        """Entries with a (literal) prefix starting with `prefix`."""
+        segments = prefix.split("/")
+        node: Optional[_Node] = self.root
+        for segment in segments[:-1]:
+            node = node.children.get(segment) if node is not None else None
+        if node is None:
+            return
+        last = segments[-1]
+        for tail, entries in node.tails.items():
+            if tail.startswith(last):
+                yield from entries
+        for segment, child in node.children.items():
+            if segment.startswith(last):
+                yield from self._all(child)
+
+    def _all(self, node: _Node) -> Iterator[Entry]:
+        for entries in node.tails.values():
+            yield from entries
+        for child in node.children.values():
+            yield from self._all(child)
+
+    def groups(self) -> Iterator[List[Entry]]:
+        """Entries with the same (literal) prefix."""
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            yield from node.tails.values()
+            stack.extend(node.children.values())
+
+
+class Match:
+    def __init__(
+        self,
+        entry: Entry,
+        matched: str,
+        service: Optional[Dict[str, Any]],
+        method: str,
+        host: Optional[str],
+        path: str,
+    ) -> None:
+        self.entry = entry
+        self.route = entry.route
+        self.service = service
+        self.matched = matched
+
+        rest = path
+        if self.route.get("strip_path", True) and matched:
+            rest = path[len(matched) :]
+        if not rest.startswith("/"):
+            rest = f"/{rest}"
+        base = (service or {}).get("path") or "/"
+        if base == "/":
+            self.upstream_path = rest
+        elif rest == "/":
+            self.upstream_path = base
+        else:
+            self.upstream_path = base.rstrip("/") + rest
+        self.upstream_host: Optional[str] = None
+        if self.route.get("preserve_host") and host:
+            self.upstream_host = host
+        else:
+            self.upstream_host = (service or {}).get("host")
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "route": route_name(self.route),
+            "service": (self.service or {}).get("name")
+            or foreign_id(self.route, "service"),
+            "matched": self.entry.path,
+            "upstream_host": self.upstream_host,
+            "upstream_path": self.upstream_path,
+        }
+
+
+class Router:
+    """Index of the http routes by host and path (see the module docstring)."""
+
+    def __init__(
+        self,
+        routes: Iterable[Dict[str, Any]],
+        services: Iterable[Dict[str, Any]] = (),
+    ) -> None:
+        self.services = {s["id"]: s for s in services}
+        self.routes: List[Dict[str, Any]] = []
+        # exact host (None for routes without hosts) -> trie
+        self.hosts: Dict[Optional[str], PathTrie] = defaultdict(PathTrie)
+        self.wildcards: Dict[str, PathTrie] = defaultdict(PathTrie)
+        for route in routes:
+            protocols = route.get("protocols") or ["http", "https"]
+            if not {"http", "https"} & set(protocols):
+                continue
+            self.routes.append(route)
+            for host in route.get("hosts") or [None]:
+                if host is not None:
+                    host = host.lower()
+                trie = (
+                    self.wildcards[host]
+                    if host is not None and "*" in host
+                    else self.hosts[host]
+                )
+                for path in route.get("paths") or [None]:
+                    trie.add(Entry(route, host, path))
+
+    def tries(self) -> Iterator[PathTrie]:
+        yield from self.hosts.values()
+        yield from self.wildcards.values()
+
+    def candidates(self, host: Optional[str], path: str) -> Iterator[Entry]:
+        if host:
+            host = host.lower()
+            if host in self.hosts:
+                yield from self.hosts[host].lookup(path)
+            if ":" in host:
+                # kong ignores the port, unless the route host has one
+                yield from self.hosts.get(host.rsplit(":", 1)[0], PathTrie()).lookup(
+                    path
+                )
+            for pattern, trie in self.wildcards.items():
+                if host_matches(pattern, host) or host_matches(
+                    pattern, host.rsplit(":", 1)[0]
+                ):
+                    yield from trie.lookup(path)
+        if None in self.hosts:
+            yield from self.hosts[None].lookup(path)
+
+    def match(
+        self,
+        method: str,
+        host: Optional[str],
+        path: str,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Optional[Match]:
+        """The route kong would select for the request or None."""
+        lowered = {k.lower(): v for k, v in (headers or {}).items()}
+        best: Optional[Tuple[Entry, str]] = None
+        for entry in self.candidates(host, path):
+            if best is not None and entry.key >= best[0].key:
+                continue
+            matched = entry.matches(method, path, lowered)
+            if matched is not None:
+                best = (entry, matched)
+        if best is None:
+            return None
+        entry, matched = best
+        service = self.services.get(foreign_id(entry.route, "service") or "")
+        return Match(entry, matched, service, method, host, path)
+
+
+def _methods_cover(a: Optional[Set[str]], b: Optional[Set[str]]) -> bool:
+    # same category: both have methods or both have none
+    return a is None or b is None or a >= b
+
+
+def _methods_overlap(a: Optional[Set[str]], b: Optional[Set[str]]) -> bool:
+    return a is None or b is None or bool(a & b)
+
+
+def signature(route: Dict[str, Any]) -> str:
+    """Everything kong matches a route by, to find duplicates."""
+    headers = route.get("headers") or {}
+    return repr(
+        (
+            sorted(h.lower() for h in route.get("hosts") or []),
+            sorted(route.get("paths") or []),
+            sorted(route.get("methods") or []),
+            sorted((k.lower(), sorted(v)) for k, v in headers.items()),
+            sorted(route.get("protocols") or ["http", "https"]),
+            sorted(route.get("snis") or []),
+        )
+    )
+
+
+Finding = Dict[str, Any]
+
+
+Shadowed = Dict[str, Dict[Tuple[Optional[str], Optional[str]], Set[str]]]
+Ambiguous = Dict[Tuple[str, str], Set[str]]
+
+
+def _duplicates(router: Router) -> Tuple[List[Finding], Dict[str, Set[str]]]:
+    """Findings of routes with the same signature and the twins of every route."""
+    findings: List[Finding] = []
+    by_signature: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for route in router.routes:
+        by_signature[signature(route)].append(route)
+    twins: Dict[str, Set[str]] = {}
+    for routes in by_signature.values():
+        if len(routes) < 2:
+            continue
+        routes = sorted(routes, key=lambda r: (r.get("created_at") or 0, r["id"]))
+        ids = {r["id"] for r in routes}
+        for route in routes:
+            twins[route["id"]] = ids - {route["id"]}
+        for route in routes[1:]:
+            findings.append(
+                _finding("duplicate", route, [routes[0]], "matches the same requests")
+            )
+    return findings, twins
+
+
+def _shadow(trie: PathTrie, shadowed: Shadowed) -> None:
+    """Add the prefix paths taken by routes evaluated earlier per host and path."""
+    for group in (trie.pathless, *trie.groups()):
+        by_category: Dict[Any, List[Entry]] = defaultdict(list)
+        for e in group:
+            if e.regex is None:
+                by_category[(e.path, e.category)].append(e)
+        for competing in by_category.values():
+            competing.sort(key=lambda e: e.key)
+            for idx, e in enumerate(competing):
+                earlier = {
+                    o.route["id"]
+                    for o in competing[:idx]
+                    if o.route["id"] != e.route["id"]
+                    and _methods_cover(o.methods, e.methods)
+                }
+                if earlier:
+                    shadowed[e.route["id"]][(e.host, e.path)] = earlier
+
+
+def _overlap(r: Entry, e: Entry) -> bool:
+    """Whether the regex paths of `r` and `e` compete for the same requests."""
+    if (
+        e.regex is None
+        or e.route["id"] <= r.route["id"]
+        or e.category != r.category
+        or e.key[3] != r.key[3]
+        or not _methods_overlap(r.methods, e.methods)
+    ):
+        return False
+    assert r.regex is not None
+    return bool(
+        (r.sample is not None and e.regex.match(r.sample))
+        or (e.sample is not None and r.regex.match(e.sample))
+    )
+
+
+def _near(trie: PathTrie, prefix: str) -> Tuple[List[Entry], List[Entry]]:
+    """The prefix paths under `prefix`, the regex paths under or above it."""
+    plain = [e for e in trie.under(prefix) if e.regex is None]
+    # `lookup` and `under` both yield the entries with exactly this prefix
+    regexes = {id(e): e for e in trie.lookup(prefix) if e.regex is not None}
+    regexes.update((id(e), e) for e in trie.under(prefix) if e.regex is not None)
+    return plain, list(regexes.values())
+
+
+def _ambiguity(trie: PathTrie, ambiguous: Ambiguous) -> None:
+    """Add the paths also matched by a regex path of another route."""
+    regexes = [e for group in trie.groups() for e in group if e.regex is not None]
+    near: Dict[str, Tuple[List[Entry], List[Entry]]] = {}
+    for r in regexes:
+        assert r.regex is not None and r.path is not None
+        prefix = literal_prefix(r.path)
+        if prefix not in near:
+            near[prefix] = _near(trie, prefix)
+        plain, candidates = near[prefix]
+        for e in plain:
+            if e.route["id"] == r.route["id"] or e.category != r.category:
+                continue
+            if _methods_overlap(r.methods, e.methods):
+                assert e.path is not None
+                if r.regex.match(e.path):
+                    ambiguous[(e.route["id"], r.route["id"])].add(
+                        f"regex `{r.path}` also matches `{e.path}`"
+                    )
+        for e in candidates:
+            if _overlap(r, e):
+                first, second = sorted((r, e), key=lambda x: x.key)
+                ambiguous[(second.route["id"], first.route["id"])].add(
+                    f"regexes `{first.path}` and `{second.path}` with the same "
+                    "regex_priority overlap, the creation time decides"
+                )
+
+
+def analyze_routes(router: Router) -> List[Finding]:
+    """Find duplicate, shadowed and ambiguous routes.
+
+    - duplicate: another route matches exactly the same requests,
+    - shadowed: all (or some) of the paths of a route are taken by a route that
+      is evaluated earlier,
+    - ambiguous: a regex path of another route, evaluated earlier, also matches
+      a path of the route, or two regex paths with the same `regex_priority`
+      may match the same requests and only the creation time decides.
+    """
+    findings, twins = _duplicates(router)
+
+    # entry -> routes evaluated earlier, that take all its requests
+    shadowed: Shadowed = defaultdict(dict)
+    entries: Dict[str, int] = defaultdict(int)
+    ambiguous: Ambiguous = defaultdict(set)
+    for trie in router.tries():
+        _shadow(trie, shadowed)
+        _ambiguity(trie, ambiguous)
+        for group in (trie.pathless, *trie.groups()):
+            for e in group:
+                entries[e.route["id"]] += 1
+
+    routes_by_id = {r["id"]: r for r in router.routes}
+    for route_id, paths in shadowed.items():
+        by = set.union(*paths.values()) - twins.get(route_id, set())
+        if not by:
+            continue
+        kind = "shadowed" if len(paths) == entries[route_id] else "partly shadowed"
+        detail = ", ".join(sorted({path or "(no path)" for _, path in paths}))
+        findings.append(
+            _finding(
+                kind,
+                routes_by_id[route_id],
+                [routes_by_id[i] for i in sorted(by)],
+                detail,
+            )
+        )
+    for (route_id, other_id), details in ambiguous.items():
+        findings.append(
+            _finding(
+                "ambiguous",
+                routes_by_id[route_id],
+                [routes_by_id[other_id]],
+                "; ".join(sorted(details)),
+            )
+        )
+    findings.sort(key=lambda f: (f["kind"], f["route"], f["other"]))
+    return findings
+
+
+def _finding(
+    kind: str, route: Dict[str, Any], others: List[Dict[str, Any]], detail: str
+) -> Finding:
+    return {
+        "kind": kind,
+        "route": route_name(route),
+        "service": foreign_id(route, "service"),
+        "other": "\n".join(route_name(o) for o in others),
+        "detail": detail,
+    }
+
+
+Request = Tuple[str, Optional[str], str, Dict[str, str]]
+
+
+def parse_request(line: str) -> Request:
+    """`(method, host, path, headers)` of a line of a requests file.
+
+    Lines are json objects with `method`, `host`, `path` (or `url`) and
+    `headers`, or `[METHOD] PATH|URL [HOST]`, e.g. the request part of an access
+    log line (`GET /path HTTP/1.1`).
+    """
+    line = line.strip()
+    if line.startswith("{"):
+        data = json_loads(line)
+        method = data.get("method") or "GET"
+        host = data.get("host")
+        path = data.get("path") or data.get("url") or "/"
+        headers = data.get("headers") or {}
+    else:
+        parts = line.split()
+        if parts and not parts[0].startswith(("/", "http://", "https://")):
+            method = parts.pop(0)
+        else:
+            method = "GET"
+        if not parts:
+            raise ValueError(f"No path in `{line}`.")
+        path = parts[0]
+        host = parts[1] if len(parts) > 1 and not parts[1].startswith("HTTP/") else None
+        headers = {}
+    if path.startswith(("http://", "https://")):
+        url = urlsplit(path)
+        host = host or url.netloc
+        path = url.path or "/"
+    # kong routes by the path only
+    path = path.split("?", 1)[0]
+    return method.upper(), host, path, headers
+
+
+def load_routes(
+    ctx: click.Context, source: Optional[str]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Routes and services of the live kong or of `source` (url or export file)."""
+    session = ctx.obj["session"]
+    if source:
+        snapshot = load(source, session)
+        return snapshot["routes"], snapshot["services"]
+    return (
+        get("routes", lambda: general.all_of("routes", session)),
+        get("services", lambda: general.all_of("services", session)),
+    )
+
+
+source_option = click.option(
+    "--from",
+    "source",
+    help="Use the routes of this kong admin url or `kongcli export` file.",
+)
+
+
+@click.command()
+@source_option
+@click.option(
+    "--exit-code",
+    is_flag=True,
+    help="Exit with 1 if there are findings and 0 otherwise.",
+)
+@click.pass_context
+def analyze(ctx: click.Context, source: Optional[str], exit_code: bool) -> None:
+    """Find shadowed, duplicate and ambiguous routes.
+
+    \b
+    - duplicate: another route matches exactly the same requests.
+    - shadowed: a route evaluated earlier takes all requests of (some of) the
+      paths of the route, e.g. the same path and host with fewer methods.
+    - ambiguous: a regex path of another route, evaluated earlier, also matches
+      a path of the route, or two regex paths with the same regex_priority
+      overlap and only the creation time of the routes decides.
+
+    Routes are indexed by host and path prefix, so this also works for tens of
+    thousands of routes.
+    """
+    tablefmt = ctx.obj["tablefmt"]
+
+    routes, services = load_routes(ctx, source)
+    router = Router(routes, services)
+    findings = analyze_routes(router)
+    service_names = {s["id"]: s.get("name") or s["id"] for s in services}
+    for f in findings:
+        f["service"] = service_names.get(f["service"], f["service"])
+
+    if findings:
+        click.echo(tabulate(findings, headers="keys", tablefmt=tablefmt))
+    kinds: Dict[str, int] = defaultdict(int)
+    for f in findings:
+        kinds[f["kind"]] += 1
+    summary = ", ".join(f"{n} {kind}" for kind, n in sorted(kinds.items()))
+    click.echo(f"Analyzed {len(router.routes)} routes: {summary or 'no findings'}.")
+    if exit_code and findings:
+        ctx.exit(1)
+
+
+def _row(router: Router, request: Request) -> Dict[str, Any]:
+    method, host, path, headers = request
+    row: Dict[str, Any] = {"method": method, "host": host, "path": path}
+    m = router.match(method, host, path, headers)
+    if m is None:
+        row.update(route=None, service=None, matched=None)
+        row.update(upstream_host=None, upstream_path=None)
+    else:
+        row.update(m.as_dict())
+    return row
+
+
+@click.command()
+@source_option
+@click.option("--method", "-X", default="GET", show_default=True)
+@click.option("--host", help="The host header of the request.")
+@click.option(
+    "--header",
+    "-H",
+    multiple=True,
+    help="A header of the request, e.g. `x-version: 2`.",
+)
+@click.option(
+    "--file",
+    "requests_file",
+    type=click.File("r"),
+    help="Match every request of this file (`-` for stdin) instead of PATH.",
+)
+@click.option("--ndjson", is_flag=True, help="Print one json object per request.")
+@click.argument("path", required=False)
+@click.pass_context
+def match(
+    ctx: click.Context,
+    source: Optional[str],
+    method: str,
+    host: Optional[str],
+    header: Tuple[str, ...],
+    requests_file: Optional[TextIO],
+    ndjson: bool,
+    path: Optional[str],
+) -> None:
+    """Show the route and service kong would select for a request.
+
+    The routes are matched locally (hosts, headers, methods, prefix and regex
+    paths, regex_priority) and the upstream path and host are derived with
+    strip_path, preserve_host and the path of the service. PATH may also be a
+    url.
+
+    With `--file`, every line is a request, either a json object with `method`,
+    `host`, `path` and `headers` or `[METHOD] PATH|URL [HOST]`, e.g.
+    `GET /users/1 api.example.com`. Unmatched requests have no route.
+    """
+    tablefmt = ctx.obj["tablefmt"]
+
+    if requests_file is None and path is None:
+        logger.error("Give a PATH or `--file`.")
+        raise click.Abort()
+
+    routes, services = load_routes(ctx, source)
+    start = perf_counter()
+    router = Router(routes, services)
+    logger.info(
+        f"Indexed {len(router.routes)} routes in {perf_counter() - start:.3f} s."
+    )
+
+    requests: List[Request] = []
+    if requests_file is None:
+        assert path is not None
+        headers = {}
+        for h in header:
+            name, _, value = h.partition(":")
+            headers[name.strip()] = value.strip()
+        m, host_, path_, _ = parse_request(f"{method} {path} {host or ''}")
+        requests.append((m, host_, path_, headers))
+    else:
+        for idx, line in enumerate(requests_file, start=1):
+            if not line.strip() or line.startswith("#"):
+                continue
+            try:
+                requests.append(parse_request(line))
+            except ValueError as e:
+                logger.warning(f"Skip line {idx}: {e}")
+
+    start = perf_counter()
+    rows = [_row(router, r) for r in requests]
+    seconds = perf_counter() - start
+
+    if ndjson:
+        for row in rows:
+            click.echo(json_dumps(row))
+    else:
+        click.echo(tabulate(rows, headers="keys", tablefmt=tablefmt))
+    if requests_file is not None:
+        matched = sum(1 for row in rows if row["route"] is not None)
+        click.echo(
+            f"Matched {matched} of {len(rows)} requests in {seconds:.3f} s, "
+            f"{len(rows) - matched} without route.",
+            err=True,
+        )
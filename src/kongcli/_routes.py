@@ -1,5 +1,5 @@
-from operator import itemgetter
-from typing import Any, Dict, Optional, Tuple
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
 from uuid import UUID
 
 import click
@@ -7,6 +7,8 @@ from loguru import logger
 from pyfiglet import print_figlet
 from tabulate import tabulate
 
+from ._bulk import delete_many_routes
+from ._consolidate import consolidate
 from ._plugins import (
     enable_acl_routes,
     enable_basic_auth_routes,
@@ -15,18 +17,82 @@ from ._plugins import (
     enable_request_size_limiting_routes,
     enable_response_ratelimiting_routes,
 )
+from ._regex_report import regex_report
+from ._router import analyze, match
+from ._timings import phase
 from ._util import get, json_pretty, parse_datetimes
+from ._watch import watch_option, watch_rows
 from .kong import general
 
 
+def _route_rows(
+    session: Any, full_plugins: bool
+) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Routes joined with their service name and plugins as table rows."""
+    with phase("fetch"):
+        services = get("services", lambda: general.all_of("services", session))
+        routes = get("routes", lambda: general.all_of("routes", session))
+        plugins = get("plugins", lambda: general.all_of("plugins", session))
+
+    with phase("join"):
+        service_names = {s["id"]: s["name"] for s in services}
+        route_plugins = defaultdict(list)
+        for p in plugins:
+            # kong < 0.15: `route_id`, later `route: {"id": ...}` or `route: None`;
+            # `route.id`, if normalized by `substitude_ids` (chained list commands)
+            route = p.get("route")
+            route_id = route.get("id") if route else None
+            route_id = route_id or p.get("route_id") or p.get("route.id")
+            if route_id:
+                route_plugins[route_id].append(p)
+
+        data = []
+        for r in routes:
+            rdata = {
+                "route_id": r["id"],
+                "service_name": None,
+                "methods": r["methods"],
+                "protocols": r["protocols"],
+                "hosts": r.get("hosts"),
+                "paths": r["paths"],
+                "whitelist": set(),
+                "blacklist": set(),
+                "plugins": [],
+            }
+            rdata["service_name"] = service_names.get(r["service"]["id"])
+            for p in route_plugins.get(r["id"], []):
+                if p["name"] == "acl":
+                    rdata["whitelist"] |= set(p["config"].get("whitelist", []))
+                    rdata["blacklist"] |= set(p["config"].get("blacklist", []))
+                elif full_plugins:
+                    rdata["plugins"] += [f"{p['name']}:\n{json_pretty(p['config'])}"]
+                else:
+                    rdata["plugins"] += [p["name"]]
+            rdata["whitelist"] = "\n".join(sorted(rdata["whitelist"]))
+            rdata["blacklist"] = "\n".join(sorted(rdata["blacklist"]))
+            rdata["plugins"] = "\n".join(rdata["plugins"])
+            data.append((r, rdata))
+    return data
+
+
+def _route_sort_key(row: Dict[str, Any]) -> Any:
+    return row["service_name"] or ""
+
+
 @click.command()
 @click.option(
     "--full-plugins",
     is_flag=True,
     help="Whether to show full plugin config.",
 )
+@watch_option
 @click.pass_context
-def list_routes(ctx: click.Context, full_plugins: bool) -> None:
+def list_routes(
+    ctx: click.Context,
+    full_plugins: bool,
+    interval: Optional[float],
+    count: Optional[int],
+) -> None:
     """List all routes along with relevant information."""
     session = ctx.obj["session"]
     tablefmt = ctx.obj["tablefmt"]
@@ -34,51 +100,17 @@ def list_routes(ctx: click.Context, full_plugins: bool) -> None:
 
     print_figlet("Routes", font=font, width=160)
 
-    services = get("services", lambda: general.all_of("services", session))
-    routes = get("routes", lambda: general.all_of("routes", session))
-    plugins = get("plugins", lambda: general.all_of("plugins", session))
-
-    data = []
-    for r in routes:
-        rdata = {
-            "route_id": r["id"],
-            "service_name": None,
-            "methods": r["methods"],
-            "protocols": r["protocols"],
-            "hosts": r.get("hosts"),
-            "paths": r["paths"],
-            "whitelist": set(),
-            "blacklist": set(),
-            "plugins": [],
-        }
-        for s in services:
-            if s["id"] == r["service"]["id"]:
-                rdata["service_name"] = s["name"]
-                break
-        for p in plugins:
-            if p.get("route", {}) is None:
-                # kong 1.x sets route to none, if plugin is not accoziated to a route
-                continue
-            if r["id"] in (p.get("route_id"), p.get("route", {}).get("id")):
-                if p["name"] == "acl":
-                    rdata["whitelist"] |= set(p["config"].get("whitelist", []))
-                    rdata["blacklist"] |= set(p["config"].get("blacklist", []))
-                elif full_plugins:
-                    rdata["plugins"] += [f"{p['name']}:\n{json_pretty(p['config'])}"]
-                else:
-                    rdata["plugins"] += [p["name"]]
-        rdata["whitelist"] = "\n".join(sorted(rdata["whitelist"]))
-        rdata["blacklist"] = "\n".join(sorted(rdata["blacklist"]))
-        rdata["plugins"] = "\n".join(rdata["plugins"])
-        data.append(rdata)
-
-    click.echo(
-        tabulate(
-            sorted(data, key=itemgetter("service_name")),
-            headers="keys",
-            tablefmt=tablefmt,
-        )
-    )
+    def rows() -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        return _route_rows(session, full_plugins)
+
+    if interval is not None:
+        watch_rows(rows, "route_id", _route_sort_key, tablefmt, interval, count)
+        return
+
+    data = [row for _, row in rows()]
+    with phase("render"):
+        data.sort(key=_route_sort_key)
+        click.echo(tabulate(data, headers="keys", tablefmt=tablefmt))
 
 
 @click.command()
@@ -126,6 +158,12 @@ def list_routes(ctx: click.Context, full_plugins: bool) -> None:
     help="The Service this Route is associated to. This is where the Route proxies traffic to.",
     required=True,
 )
+@click.option("--name", help="The name of the Route (kong >= 0.14).")
+@click.option(
+    "--upsert",
+    is_flag=True,
+    help="Create or replace the route by its name with a single idempotent request (kong >= 1.0).",
+)
 @click.pass_context
 def add(
     ctx: click.Context,
@@ -137,10 +175,13 @@ def add(
     strip_path: bool,
     preserve_host: bool,
     service: UUID,
+    name: Optional[str],
+    upsert: bool,
 ) -> None:
     """Add a route to kong.
 
-    At least one of hosts, paths, or methods must be set.
+    At least one of hosts, paths, or methods must be set. With `--upsert` the
+    `name` is required.
     """
     session = ctx.obj["session"]
     tablefmt = ctx.obj["tablefmt"]
@@ -155,6 +196,12 @@ def add(
         logger.error("At least one of hosts, paths, or methods must be set.")
         raise click.Abort()
 
+    if upsert and not name:
+        logger.error("You must set `--name` to upsert a route.")
+        raise click.Abort()
+
+    if name:
+        payload["name"] = name
     if protocols:
         payload["protocols"] = list(set(protocols))
     if methods:
@@ -164,7 +211,11 @@ def add(
     if paths:
         payload["paths"] = list(set(paths))
 
-    route = general.add("routes", session, **payload)
+    if upsert:
+        assert name
+        route = general.upsert("routes", session, name, **payload)
+    else:
+        route = general.add("routes", session, **payload)
     parse_datetimes(route)
     click.echo(tabulate([route], headers="keys", tablefmt=tablefmt))
 
@@ -321,11 +372,16 @@ def routes_cli() -> None:
 routes_cli.add_command(add)
 routes_cli.add_command(retrieve)
 routes_cli.add_command(delete)
+routes_cli.add_command(delete_many_routes, name="delete-many")
 routes_cli.add_command(update)
 routes_cli.add_command(list_routes, name="list")
+routes_cli.add_command(analyze)
+routes_cli.add_command(match)
+routes_cli.add_command(regex_report)
+routes_cli.add_command(consolidate)
 routes_cli.add_command(enable_basic_auth_routes, name="enable-basic-auth")
 routes_cli.add_command(enable_key_auth_routes, name="enable-key-auth")
-routes_cli.add_command(enable_acl_routes, name="enable-key-auth")
+routes_cli.add_command(enable_acl_routes, name="enable-acl")
 routes_cli.add_command(enable_rate_limiting_routes, name="enable-rate-limiting")
 routes_cli.add_command(
     enable_request_size_limiting_routes, name="enable-request-size-limiting"
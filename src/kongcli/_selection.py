@@ -0,0 +1,120 @@
+from fnmatch import fnmatchcase
+from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple
+
+import click
+from loguru import logger
+
+from ._util import get
+from .kong import general
+
+
+def selector_options(resource: str) -> Callable[[Any], Any]:
+    """Add the options to select many entities of `resource` to a command."""
+
+    def decorator(fkt: Any) -> Any:
+        if resource == "global":
+            return fkt
+        for option in reversed(
+            [
+                click.option(
+                    "--tag",
+                    multiple=True,
+                    help="Select entities having this tag (multiple: all tags).",
+                ),
+                click.option(
+                    "--name-glob",
+                    help="Select entities whose name (username for consumers) matches this glob, e.g. `billing-*`.",
+                ),
+                click.option(
+                    "--host",
+                    multiple=True,
+                    help="Select services with this host or routes with one of these hosts.",
+                ),
+                click.option(
+                    "--ids-from",
+                    type=click.File("r"),
+                    help="File with one id or name per line (`-` for stdin).",
+                ),
+                click.option(
+                    "--concurrency",
+                    type=int,
+                    default=10,
+                    help="Number of requests in parallel.",
+                ),
+            ]
+        ):
+            fkt = option(fkt)
+        return fkt
+
+    return decorator
+
+
+def has_selectors(
+    tag: Tuple[str, ...] = (),
+    name_glob: Optional[str] = None,
+    host: Tuple[str, ...] = (),
+    ids_from: Optional[TextIO] = None,
+    **kwargs: Any,
+) -> bool:
+    return bool(tag or name_glob or host or ids_from)
+
+
+def entity_name(resource: str, entity: Dict[str, Any]) -> Optional[str]:
+    if resource == "consumers":
+        return entity.get("username") or entity.get("custom_id")
+    return entity.get("name")
+
+
+def select(
+    resource: str,
+    session: Any,
+    ids: Tuple[str, ...] = (),
+    tag: Tuple[str, ...] = (),
+    name_glob: Optional[str] = None,
+    host: Tuple[str, ...] = (),
+    ids_from: Optional[TextIO] = None,
+    **kwargs: Any,
+) -> List[Dict[str, Any]]:
+    """Select all entities of `resource` by the given ids and selectors.
+
+    Explicit ids (or names) and the ids from `ids_from` are always selected,
+    the other selectors filter all entities and have to match all at once.
+    Unknown ids are kept as `{"id": id_}`, kong will complain about them.
+    """
+    assert resource in ("consumers", "services", "routes", "plugins")
+    if host and resource not in ("services", "routes"):
+        click.echo("Selecting by `--host` works for services and routes.", err=True)
+        raise click.Abort()
+
+    entities = get(resource, lambda: general.all_of(resource, session))
+
+    wanted = list(ids)
+    if ids_from:
+        wanted += [line.strip() for line in ids_from if line.strip()]
+
+    by_key: Dict[str, Dict[str, Any]] = {}
+    for e in entities:
+        by_key[e["id"]] = e
+        for k in ("name", "username", "custom_id"):
+            if e.get(k):
+                by_key.setdefault(e[k], e)
+
+    selected: Dict[str, Dict[str, Any]] = {}
+    for id_ in wanted:
+        if id_ not in by_key:
+            logger.warning(f"Unknown {resource} `{id_}`.")
+        e = by_key.get(id_, {"id": id_})
+        selected[e["id"]] = e
+
+    if tag or name_glob or host:
+        for e in entities:
+            if tag and not set(tag) <= set(e.get("tags") or []):
+                continue
+            if name_glob and not fnmatchcase(entity_name(resource, e) or "", name_glob):
+                continue
+            if host and not ({e.get("host")} | set(e.get("hosts") or [])) & set(host):
+                continue
+            selected[e["id"]] = e
+
+    logger.info(f"Selected {len(selected)} {resource}.")
+    return list(selected.values())
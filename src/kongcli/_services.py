@@ -1,3 +1,4 @@
+from collections import defaultdict
 from operator import itemgetter
 from typing import Any, Dict, Optional, Union
 
@@ -6,6 +7,7 @@ from loguru import logger
 from pyfiglet import print_figlet
 from tabulate import tabulate
 
+from ._bulk import delete_many_services
 from ._plugins import (
     enable_acl_services,
     enable_basic_auth_services,
@@ -14,6 +16,7 @@ from ._plugins import (
     enable_request_size_limiting_services,
     enable_response_ratelimiting_services,
 )
+from ._timings import phase
 from ._util import get, json_pretty, parse_datetimes, sort_dict, substitude_ids
 from .kong import general
 
@@ -58,25 +61,34 @@ def list_services(ctx: click.Context, full_plugins: bool) -> None:
 
     print_figlet("Service", font=font, width=160)
 
-    services_data = get("services", lambda: general.all_of("services", session))
-    plugins_data = get("plugins", lambda: general.all_of("plugins", session))
-
-    data = []
-    for s in services_data:
-        sdata = {
-            "service_id": s["id"],
-            "name": s["name"],
-            "protocol": s["protocol"],
-            "host": s["host"],
-            "port": s["port"],
-            "path": s["path"],
-            "whitelist": set(),
-            "blacklist": set(),
-            "plugins": [],
-        }
+    with phase("fetch"):
+        services_data = get("services", lambda: general.all_of("services", session))
+        plugins_data = get("plugins", lambda: general.all_of("plugins", session))
+
+    with phase("normalize"):
         for p in plugins_data:
             substitude_ids(p)
-            if s["id"] == p.get("service.id"):
+
+    with phase("join"):
+        service_plugins = defaultdict(list)
+        for p in plugins_data:
+            if p.get("service.id"):
+                service_plugins[p["service.id"]].append(p)
+
+        data = []
+        for s in services_data:
+            sdata = {
+                "service_id": s["id"],
+                "name": s["name"],
+                "protocol": s["protocol"],
+                "host": s["host"],
+                "port": s["port"],
+                "path": s["path"],
+                "whitelist": set(),
+                "blacklist": set(),
+                "plugins": [],
+            }
+            for p in service_plugins.get(s["id"], []):
                 if p["name"] == "acl":
                     sdata["whitelist"] |= set(p["config"].get("whitelist") or []) | set(
                         p["config"].get("allow") or []
@@ -88,16 +100,17 @@ def list_services(ctx: click.Context, full_plugins: bool) -> None:
                     sdata["plugins"] += [f"{p['name']}:\n{json_pretty(p['config'])}"]
                 else:
                     sdata["plugins"] += [p["name"]]
-        sdata["whitelist"] = "\n".join(sorted(sdata["whitelist"]))
-        sdata["blacklist"] = "\n".join(sorted(sdata["blacklist"]))
-        sdata["plugins"] = "\n".join(sdata["plugins"])
-        data.append(sdata)
-
-    click.echo(
-        tabulate(
-            sorted(data, key=itemgetter("name")), headers="keys", tablefmt=tablefmt
+            sdata["whitelist"] = "\n".join(sorted(sdata["whitelist"]))
+            sdata["blacklist"] = "\n".join(sorted(sdata["blacklist"]))
+            sdata["plugins"] = "\n".join(sdata["plugins"])
+            data.append(sdata)
+
+    with phase("render"):
+        click.echo(
+            tabulate(
+                sorted(data, key=itemgetter("name")), headers="keys", tablefmt=tablefmt
+            )
         )
-    )
 
 
 @click.command()
@@ -141,6 +154,11 @@ def list_services(ctx: click.Context, full_plugins: bool) -> None:
     "--url",
     help="Shorthand attribute to set protocol, host, port and path at once. This attribute is write-only (the Admin API never “returns” the url).",
 )
+@click.option(
+    "--upsert",
+    is_flag=True,
+    help="Create or replace the service by its name with a single idempotent request (kong >= 1.0).",
+)
 @click.pass_context
 def add(
     ctx: click.Context,
@@ -154,8 +172,12 @@ def add(
     write_timeout: int,
     read_timeout: int,
     url: Optional[str],
+    upsert: bool,
 ) -> None:
-    """Add a service to kong."""
+    """Add a service to kong.
+
+    With `--upsert` the `name` is required.
+    """
     session = ctx.obj["session"]
     tablefmt = ctx.obj["tablefmt"]
     payload: Dict[str, Union[str, int]] = {
@@ -179,6 +201,10 @@ def add(
         )
         raise click.Abort()
 
+    if upsert and not name:
+        logger.error("You must set `--name` to upsert a service.")
+        raise click.Abort()
+
     if url:
         payload["url"] = url
     if protocol:
@@ -190,7 +216,11 @@ def add(
     if path:
         payload["path"] = path
 
-    service = general.add("services", session, **payload)
+    if upsert:
+        assert name
+        service = general.upsert("services", session, name, **payload)
+    else:
+        service = general.add("services", session, **payload)
     parse_datetimes(service)
     service = sort_service_dict(service)
 
@@ -368,6 +398,7 @@ def services_cli() -> None:
 services_cli.add_command(add)
 services_cli.add_command(retrieve)
 services_cli.add_command(delete)
+services_cli.add_command(delete_many_services, name="delete-many")
 services_cli.add_command(update)
 services_cli.add_command(enable_basic_auth_services, name="enable-basic-auth")
 services_cli.add_command(enable_key_auth_services, name="enable-key-auth")
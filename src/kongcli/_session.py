@@ -1,17 +1,46 @@
-from typing import Any
+from time import perf_counter
+from typing import Any, Callable, List, Optional
 
 from requests import Response, Session
+from requests.adapters import HTTPAdapter
+
+# called with (method, url without prefix, response or None on errors, seconds)
+RequestHook = Callable[[str, str, Optional[Response], float], None]
+# called with (method, url without prefix) before sending; raise to not send it
+SendHook = Callable[[str, str], None]
 
 
 class LiveServerSession(Session):
-    def __init__(self, prefix_url: str) -> None:
+    def __init__(self, prefix_url: str, pool_maxsize: int = 32) -> None:
         super(LiveServerSession, self).__init__()
         while prefix_url.endswith("/"):
             prefix_url = prefix_url[:-1]
         self.prefix_url = prefix_url
+        self.request_hooks: List[RequestHook] = []
+        self.send_hooks: List[SendHook] = []
+        # keep connections for concurrent requests (see `_util.run_concurrently`)
+        adapter = HTTPAdapter(pool_maxsize=pool_maxsize)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
 
     def request(  # type: ignore
         self, method: str, url: str, *args: Any, **kwargs: Any
     ) -> Response:
-        url = f"{self.prefix_url}{url}"
-        return super(LiveServerSession, self).request(method, url, *args, **kwargs)
+        for send_hook in self.send_hooks:
+            send_hook(method, url)
+        if not self.request_hooks:
+            return super(LiveServerSession, self).request(
+                method, f"{self.prefix_url}{url}", *args, **kwargs
+            )
+
+        response = None
+        start = perf_counter()
+        try:
+            response = super(LiveServerSession, self).request(
+                method, f"{self.prefix_url}{url}", *args, **kwargs
+            )
+            return response
+        finally:
+            seconds = perf_counter() - start
+            for hook in self.request_hooks:
+                hook(method, url, response, seconds)
@@ -0,0 +1,217 @@
+from collections import defaultdict
+from hashlib import blake2b
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+import click
+from loguru import logger
+from tabulate import tabulate
+
+from ._session import LiveServerSession
+from ._util import json_dumps, json_loads
+from .kong import general
+
+RESOURCES = (
+    "consumers",
+    "services",
+    "routes",
+    "plugins",
+    "acls",
+    "key-auths",
+    "basic-auths",
+)
+VOLATILE = {"id", "created_at", "updated_at"}
+FOREIGN = ("consumer", "service", "route")
+
+Snapshot = Dict[str, List[Dict[str, Any]]]
+Index = Dict[str, Dict[str, str]]
+
+
+def fetch(session: LiveServerSession) -> Snapshot:
+    return {resource: general.all_of(resource, session) for resource in RESOURCES}
+
+
+def load(source: str, session: LiveServerSession) -> Snapshot:
+    """Load a snapshot from a live kong admin url or an export file."""
+    if source.startswith(("http://", "https://")):
+        logger.info(f"Fetching snapshot from `{source}` ...")
+        remote = LiveServerSession(source)
+        remote.headers.update(session.headers)
+        remote.auth = session.auth
+        try:
+            return fetch(remote)
+        finally:
+            remote.close()
+
+    logger.info(f"Reading snapshot from `{source}` ...")
+    with open(source) as f:
+        data: Snapshot = json_loads(f.read())
+    return {resource: data.get(resource) or [] for resource in RESOURCES}
+
+
+def foreign_id(entity: Dict[str, Any], key: str) -> Optional[str]:
+    # kong < 1.0 uses `consumer_id`, later `consumer: {"id": ...}` or `consumer: None`
+    ref = entity.get(key)
+    if isinstance(ref, dict):
+        return ref.get("id")
+    return entity.get(f"{key}_id")
+
+
+def _consumer_key(c: Dict[str, Any]) -> str:
+    if c.get("username"):
+        return f"username:{c['username']}"
+    if c.get("custom_id"):
+        return f"custom_id:{c['custom_id']}"
+    return f"id:{c['id']}"
+
+
+def _named_key(e: Dict[str, Any]) -> str:
+    if e.get("name"):
+        return f"name:{e['name']}"
+    return f"id:{e['id']}"
+
+
+def _secret_hash(secret: str) -> str:
+    return "blake2b:" + blake2b(secret.encode(), digest_size=8).hexdigest()
+
+
+def entity_hash(entity: Dict[str, Any], refs: Dict[str, Optional[str]]) -> str:
+    """Hash of the canonical json of an entity.
+
+    Volatile fields are dropped and references to other entities are replaced by
+    their stable keys, so that the same configuration in two kong instances gives
+    the same hash.
+    """
+    canonical = {
+        k: v
+        for k, v in entity.items()
+        if k not in VOLATILE
+        and k not in FOREIGN
+        and not (k.endswith("_id") and k[:-3] in FOREIGN)
+    }
+    canonical.update({k: v for k, v in refs.items() if v is not None})
+    return blake2b(json_dumps(canonical).encode(), digest_size=16).hexdigest()
+
+
+def index(snapshot: Snapshot) -> Index:
+    """Map every entity of every resource from its stable key to its hash."""
+    consumer_keys = {c["id"]: _consumer_key(c) for c in snapshot["consumers"]}
+    service_keys = {s["id"]: _named_key(s) for s in snapshot["services"]}
+    route_keys = {}
+    for r in snapshot["routes"]:
+        if r.get("name"):
+            route_keys[r["id"]] = f"name:{r['name']}"
+        else:
+            route_keys[r["id"]] = json_dumps(
+                [
+                    service_keys.get(foreign_id(r, "service") or ""),
+                    sorted(r.get("paths") or []),
+                    sorted(r.get("hosts") or []),
+                    sorted(r.get("methods") or []),
+                ]
+            )
+    keys = {"consumer": consumer_keys, "service": service_keys, "route": route_keys}
+
+    result: Index = {}
+    for resource in RESOURCES:
+        buckets: Dict[str, List[Tuple[Any, str]]] = defaultdict(list)
+        for e in snapshot[resource]:
+            refs = {
+                f: keys[f].get(foreign_id(e, f) or "", foreign_id(e, f))
+                for f in FOREIGN
+            }
+            if resource == "consumers":
+                key = consumer_keys[e["id"]]
+            elif resource == "services":
+                key = service_keys[e["id"]]
+            elif resource == "routes":
+                key = route_keys[e["id"]]
+            elif resource == "plugins":
+                key = json_dumps(
+                    [e["name"], refs["consumer"], refs["service"], refs["route"]]
+                )
+            elif resource == "acls":
+                key = json_dumps([refs["consumer"], e["group"]])
+            elif resource == "key-auths":
+                # the diff shows the keys: never the secret itself
+                key = json_dumps([refs["consumer"], _secret_hash(e["key"])])
+            else:
+                key = json_dumps([refs["consumer"], e["username"]])
+            h = entity_hash(e, refs)
+            buckets[key].append(((h, e.get("created_at") or 0, e["id"]), h))
+
+        result[resource] = {}
+        for key, hashes in buckets.items():
+            if len(hashes) == 1:
+                result[resource][key] = hashes[0][1]
+                continue
+            # non-unique keys (e.g. equal routes): order by content, which is the
+            # same in every kong instance, then by creation
+            for idx, (_, h) in enumerate(sorted(hashes)):
+                result[resource][f"{key}#{idx}"] = h
+    return result
+
+
+def diff(a: Snapshot, b: Snapshot) -> List[Tuple[str, str, str]]:
+    """Compare two snapshots in linear time.
+
+    Returns tuples of `(resource, key, change)` where change is one of
+    `added`, `removed` or `changed` (from `a` to `b`).
+    """
+    index_a = index(a)
+    index_b = index(b)
+    changes = []
+    for resource in RESOURCES:
+        ia = index_a[resource]
+        ib = index_b[resource]
+        for key, h in ia.items():
+            if key not in ib:
+                changes.append((resource, key, "removed"))
+            elif ib[key] != h:
+                changes.append((resource, key, "changed"))
+        for key in ib.keys() - ia.keys():
+            changes.append((resource, key, "added"))
+    changes.sort()
+    return changes
+
+
+@click.command()
+@click.argument("output", type=click.File("w"), default="-")
+@click.pass_context
+def export(ctx: click.Context, output: TextIO) -> None:
+    """Export all entities of the kong instance as json.
+
+    The export can be used as input for `kongcli diff`.
+    """
+    session = ctx.obj["session"]
+    output.write(json_dumps(fetch(session)))
+    output.write("\n")
+
+
+@click.command(name="diff")
+@click.option(
+    "--exit-code",
+    is_flag=True,
+    help="Exit with 1 if there are differences and 0 otherwise.",
+)
+@click.argument("a")
+@click.argument("b")
+@click.pass_context
+def diff_cmd(ctx: click.Context, a: str, b: str, exit_code: bool) -> None:
+    """Show differences between two kong configurations.
+
+    A and B can each be a url to a kong admin api (authentication is taken from
+    the global options) or a file created with `kongcli export`.
+
+    Entities are compared by stable keys, e.g. the username or custom_id of
+    consumers, the name of services and the paths and service of routes.
+    """
+    session = ctx.obj["session"]
+    tablefmt = ctx.obj["tablefmt"]
+
+    changes = diff(load(a, session), load(b, session))
+    if changes:
+        click.echo(
+            tabulate(changes, headers=["resource", "key", "change"], tablefmt=tablefmt)
+        )
+    if exit_code and changes:
+        ctx.exit(1)
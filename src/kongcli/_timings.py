@@ -0,0 +1,187 @@
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from math import ceil
+import re
+from threading import Lock
+from time import perf_counter
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from requests import Response
+from tabulate import tabulate
+
+TIMINGS: Optional["Timings"] = None
+
+COLLECTIONS = {
+    "consumers",
+    "services",
+    "routes",
+    "plugins",
+    "acls",
+    "key-auths",
+    "basic-auths",
+    "key-auth",
+    "basic-auth",
+    "certificates",
+    "snis",
+    "upstreams",
+    "targets",
+}
+UUID = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+def endpoint(method: str, url: str) -> str:
+    """Group requests by endpoint, i.e. `GET /consumers/foo` -> `GET /consumers/{id}`."""
+    parts = url.split("?", 1)[0].split("/")
+    for idx in range(1, len(parts)):
+        if UUID.match(parts[idx]) or (
+            parts[idx - 1] in COLLECTIONS
+            and parts[idx]
+            and parts[idx] not in COLLECTIONS
+            and parts[idx] != "schema"
+        ):
+            parts[idx] = "{id}"
+    return f"{method.upper()} {'/'.join(parts)}"
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+    """Nearest-rank percentile of the sorted `values`."""
+    rank = max(1, ceil(p / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+# upper bounds of the latency histogram buckets in ms
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+def histogram(
+    seconds: Sequence[float], buckets: Sequence[float] = BUCKETS
+) -> List[Tuple[str, int]]:
+    """Count latencies per bucket, e.g. `[("<= 1 ms", 3), ("<= 2 ms", 7), ...]`.
+
+    Empty buckets before the first and after the last latency are left out.
+    """
+    counts = [0] * (len(buckets) + 1)
+    for s in seconds:
+        counts[bisect_left(buckets, 1000 * s)] += 1
+    labels = [f"<= {b} ms" for b in buckets] + [f"> {buckets[-1]} ms"]
+    used = [idx for idx, c in enumerate(counts) if c]
+    if not used:
+        return []
+    return [(labels[idx], counts[idx]) for idx in range(used[0], used[-1] + 1)]
+
+
+def histogram_table(latencies: Sequence[float], tablefmt: str, width: int = 40) -> str:
+    buckets = histogram(latencies)
+    most = max((count for _, count in buckets), default=0)
+    table: str = tabulate(
+        [
+            (
+                label,
+                count,
+                100 * count / len(latencies),
+                "#" * round(width * count / most),
+            )
+            for label, count in buckets
+        ],
+        headers=["latency", "count", "%", ""],
+        tablefmt=tablefmt,
+        floatfmt=".1f",
+    )
+    return table
+
+
+class Timings:
+    """Collect the latency of requests and the time spent in phases of a command."""
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+        # endpoint -> [(status, bytes, seconds), ...]
+        self.requests: Dict[str, List[Tuple[int, int, float]]] = defaultdict(list)
+        # phase -> [seconds, ...]
+        self.phases: Dict[str, List[float]] = defaultdict(list)
+
+    def on_request(
+        self, method: str, url: str, response: Optional[Response], seconds: float
+    ) -> None:
+        status = response.status_code if response is not None else 0
+        size = len(response.content) if response is not None else 0
+        with self.lock:
+            self.requests[endpoint(method, url)].append((status, size, seconds))
+
+    def on_phase(self, name: str, seconds: float) -> None:
+        with self.lock:
+            self.phases[name].append(seconds)
+
+    def report(self, tablefmt: str = "simple") -> str:
+        rows = []
+        for name, calls in self.requests.items():
+            latencies = sorted(seconds for _, _, seconds in calls)
+            rows.append(
+                (
+                    name,
+                    len(calls),
+                    sum(1 for status, _, _ in calls if not 200 <= status < 300),
+                    sum(size for _, size, _ in calls),
+                    1000 * percentile(latencies, 50),
+                    1000 * percentile(latencies, 95),
+                    1000 * latencies[-1],
+                    1000 * sum(latencies),
+                )
+            )
+        rows.sort(key=lambda row: -row[-1])
+        result = [
+            tabulate(
+                rows,
+                headers=[
+                    "endpoint",
+                    "count",
+                    "errors",
+                    "bytes",
+                    "p50 ms",
+                    "p95 ms",
+                    "max ms",
+                    "total ms",
+                ],
+                tablefmt=tablefmt,
+                floatfmt=".1f",
+            )
+        ]
+        if self.phases:
+            result.append(
+                tabulate(
+                    [
+                        (name, len(times), 1000 * sum(times))
+                        for name, times in self.phases.items()
+                    ],
+                    headers=["phase", "count", "total ms"],
+                    tablefmt=tablefmt,
+                    floatfmt=".1f",
+                )
+            )
+        return "\n\n".join(result)
+
+
+def enable() -> Timings:
+    global TIMINGS
+    TIMINGS = Timings()
+    return TIMINGS
+
+
+def disable() -> None:
+    global TIMINGS
+    TIMINGS = None
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Measure the time spent in the block, if timings are enabled."""
+    timings = TIMINGS
+    if timings is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.on_phase(name, perf_counter() - start)
@@ -0,0 +1,163 @@
+from contextlib import contextmanager
+from functools import wraps
+from inspect import signature
+from threading import current_thread, local, Lock
+from time import perf_counter, time
+from typing import Any, Callable, cast, Dict, Iterator, List, Optional, TextIO, TypeVar
+from uuid import uuid4
+
+import orjson
+from requests import Response
+
+# NOTE: `_util` imports this module (see `run_concurrently`), do not import `_util`.
+
+TRACER: Optional["Tracer"] = None
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# arguments of the `kong.*` functions recorded as span attributes (never secrets)
+ATTRIBUTES = {
+    "resource",
+    "id_",
+    "id_name",
+    "consumer_id",
+    "plugin_name",
+    "kind",
+    "group",
+}
+
+_local = local()
+
+
+def _stack() -> List[str]:
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    stack: List[str] = _local.stack
+    return stack
+
+
+def current_span_id() -> Optional[str]:
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+class Tracer:
+    """Write spans as json lines to `output`."""
+
+    def __init__(self, output: TextIO) -> None:
+        self.output = output
+        self.trace_id = uuid4().hex
+        self.lock = Lock()
+
+    def write(
+        self,
+        name: str,
+        span_id: str,
+        parent_id: Optional[str],
+        start: float,
+        seconds: float,
+        attributes: Dict[str, Any],
+        error: Optional[str] = None,
+    ) -> None:
+        line = orjson.dumps(
+            {
+                "trace_id": self.trace_id,
+                "span_id": span_id,
+                "parent_id": parent_id,
+                "name": name,
+                "start": start,
+                "duration_ms": 1000 * seconds,
+                "thread": current_thread().name,
+                "attributes": attributes,
+                "error": error,
+            },
+            default=str,
+        ).decode()
+        with self.lock:
+            self.output.write(line)
+            self.output.write("\n")
+
+    def on_request(
+        self, method: str, url: str, response: Optional[Response], seconds: float
+    ) -> None:
+        attributes: Dict[str, Any] = {"method": method.upper(), "url": url}
+        if response is not None:
+            attributes["status"] = response.status_code
+            attributes["bytes"] = len(response.content)
+        self.write(
+            f"HTTP {method.upper()}",
+            uuid4().hex[:16],
+            current_span_id(),
+            time() - seconds,
+            seconds,
+            attributes,
+            None if response is not None else "no response",
+        )
+
+
+def start(output: TextIO) -> Tracer:
+    global TRACER
+    TRACER = Tracer(output)
+    return TRACER
+
+
+def stop() -> None:
+    global TRACER
+    TRACER = None
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[None]:
+    """Record the block as span; spans opened inside are its children."""
+    tracer = TRACER
+    if tracer is None:
+        yield
+        return
+    span_id = uuid4().hex[:16]
+    parent_id = current_span_id()
+    stack = _stack()
+    stack.append(span_id)
+    error = None
+    start = time()
+    t0 = perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        stack.pop()
+        tracer.write(
+            name, span_id, parent_id, start, perf_counter() - t0, attributes, error
+        )
+
+
+@contextmanager
+def attach(span_id: Optional[str]) -> Iterator[None]:
+    """Make `span_id` (e.g. from another thread) the parent of spans in the block."""
+    if span_id is None or TRACER is None:
+        yield
+        return
+    stack = _stack()
+    stack.append(span_id)
+    try:
+        yield
+    finally:
+        stack.pop()
+
+
+def traced(fkt: F) -> F:
+    """Record every call of `fkt` as span."""
+    name = f"{fkt.__module__.replace('kongcli.', '')}.{fkt.__name__}"
+    sig = signature(fkt)
+
+    @wraps(fkt)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if TRACER is None:
+            return fkt(*args, **kwargs)
+        bound = sig.bind_partial(*args, **kwargs)
+        attributes = {k: v for k, v in bound.arguments.items() if k in ATTRIBUTES}
+        with span(name, **attributes):
+            return fkt(*args, **kwargs)
+
+    return cast(F, wrapper)
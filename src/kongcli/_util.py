@@ -1,25 +1,188 @@
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+import sys
+from threading import Lock
+from time import monotonic, perf_counter, sleep
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
 
-from cachetools import LRUCache
+from cachetools import Cache, LRUCache
 from loguru import logger
 import orjson
 
+from ._tracing import attach, current_span_id
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class CacheStats:
+    """Hits, misses, evictions, bytes and fetch time per key of the cache in `get`.
+
+    The bytes are the size of the json serialization of the cached values,
+    computed only when the statistics are asked for.
+    """
+
+    def __init__(self) -> None:
+        self.hits: Dict[str, int] = Counter()
+        self.misses: Dict[str, int] = Counter()
+        self.evictions: Dict[str, int] = Counter()
+        self.fetch_seconds: Dict[str, float] = defaultdict(float)
+
+    def as_dict(self, cache: Optional[Cache] = None) -> Dict[str, Any]:
+        # `Cache.__getitem__` does not move the keys of a `LRUCache`
+        sizes = {key: _size(Cache.__getitem__(cache, key)) for key in cache or ()}
+        keys = sorted(set(self.hits) | set(self.misses))
+        return {
+            "hits": sum(self.hits.values()),
+            "misses": sum(self.misses.values()),
+            "evictions": sum(self.evictions.values()),
+            "bytes": sum(sizes.values()),
+            "fetch_seconds": sum(self.fetch_seconds.values()),
+            "keys": {
+                key: {
+                    "hits": self.hits[key],
+                    "misses": self.misses[key],
+                    "evictions": self.evictions[key],
+                    "bytes": sizes.get(key, 0),
+                    "fetch_seconds": self.fetch_seconds[key],
+                }
+                for key in keys
+            },
+        }
+
+
+class _LRUCache(LRUCache):
+    def popitem(self) -> Tuple[str, Any]:
+        # only called to make room: `clear` below does not go through here
+        key, value = super().popitem()
+        STATS.evictions[key] += 1
+        logger.debug(f"Evicted `{key}` from the cache.")
+        return key, value
+
+    def clear(self) -> None:
+        for key in list(self):
+            del self[key]
+
+
 CACHE: Optional[LRUCache] = None
+STATS = CacheStats()
+
+
+def _size(obj: Any) -> int:
+    try:
+        return len(orjson.dumps(obj))
+    except TypeError:
+        return sys.getsizeof(obj)
 
 
 def get(key: str, fkt: Callable[[], Any]) -> Any:
     global CACHE
     if CACHE is None:
-        CACHE = LRUCache(maxsize=32)
-    if key not in CACHE:
-        CACHE[key] = fkt()
-    return CACHE[key]
+        CACHE = _LRUCache(maxsize=32)
+    if key in CACHE:
+        STATS.hits[key] += 1
+        logger.debug(f"Cache hit for `{key}`.")
+        return CACHE[key]
+    STATS.misses[key] += 1
+    start = perf_counter()
+    value = fkt()
+    STATS.fetch_seconds[key] += perf_counter() - start
+    logger.debug(f"Cache miss for `{key}`: fetched in {STATS.fetch_seconds[key]:.3f}s.")
+    CACHE[key] = value
+    return value
+
+
+def invalidate(*keys: str) -> None:
+    """Drop the given keys (all, if none are given) from the cache of `get`."""
+    if CACHE is None:
+        return
+    if not keys:
+        CACHE.clear()
+    for key in keys:
+        CACHE.pop(key, None)
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Statistics of the cache used by `get` (see `CacheStats`)."""
+    return STATS.as_dict(CACHE)
+
+
+def log_cache_stats() -> None:
+    stats = cache_stats()
+    logger.debug(
+        f"Cache: {stats['hits']} hits, {stats['misses']} misses, "
+        f"{stats['evictions']} evictions, {stats['bytes']} bytes, "
+        f"{stats['fetch_seconds']:.3f}s fetching."
+    )
+    for key, s in stats["keys"].items():
+        logger.debug(
+            f"Cache `{key}`: {s['hits']} hits, {s['misses']} misses, "
+            f"{s['evictions']} evictions, {s['bytes']} bytes, "
+            f"{s['fetch_seconds']:.3f}s fetching."
+        )
 
 
 def _reset_cache() -> None:
+    global STATS
     if CACHE is not None:
         CACHE.clear()
+    STATS = CacheStats()
+
+
+class RateLimit:
+    """Spread calls to `wait` evenly, such that at most `rate` pass per second."""
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1.0 / rate
+        self.lock = Lock()
+        self.next_slot = monotonic()
+
+    def wait(self) -> None:
+        with self.lock:
+            now = monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            sleep(slot - now)
+
+
+def run_concurrently(
+    fkt: Callable[[T], R],
+    items: Iterable[T],
+    concurrency: int = 10,
+    rate: Optional[float] = None,
+) -> List[R]:
+    """Call `fkt` on every item using up to `concurrency` threads.
+
+    With `rate`, at most `rate` calls are started per second. The results are in
+    the order of `items`; the first exception is re-raised.
+    """
+    items = list(items)
+    limit = RateLimit(rate) if rate else None
+    # spans opened in the worker threads are children of the current span
+    parent = current_span_id()
+
+    def call(item: T) -> R:
+        if limit is not None:
+            limit.wait()
+        with attach(parent):
+            return fkt(item)
+
+    if concurrency <= 1 or len(items) <= 1:
+        return [call(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(items))) as pool:
+        return list(pool.map(call, items))
 
 
 def dict_from_dot(data: Sequence[Tuple[str, str]]) -> Dict[str, Any]:
@@ -0,0 +1,207 @@
+from datetime import datetime, timezone
+from hashlib import blake2b
+from time import monotonic, sleep
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+import click
+from loguru import logger
+from tabulate import tabulate
+
+from ._budget import BudgetExceeded
+from ._util import invalidate, json_dumps
+from .kong.general import status_call
+
+F = TypeVar("F", bound=Callable[..., Any])
+Row = Dict[str, Any]
+
+# monotonic counters of `/status` (rates per second are derived)
+COUNTERS = ("connections_accepted", "connections_handled", "total_requests")
+GAUGES = (
+    "connections_active",
+    "connections_reading",
+    "connections_writing",
+    "connections_waiting",
+)
+
+
+def ticks(interval: float, count: Optional[int] = None) -> Iterator[int]:
+    """Yield every `interval` seconds (without drift), `count` times or forever."""
+    next_at = monotonic()
+    tick = 0
+    while count is None or tick < count:
+        if tick:
+            next_at += interval
+            # do not try to catch up, when a tick took longer than the interval
+            next_at = max(next_at, monotonic())
+            sleep(next_at - monotonic())
+        yield tick
+        tick += 1
+
+
+def rates(
+    prev: Dict[str, Any], curr: Dict[str, Any], seconds: float
+) -> Dict[str, Optional[float]]:
+    """Per second rates of the counters; None after a reset (e.g. kong restarted)."""
+    result: Dict[str, Optional[float]] = {}
+    for k in COUNTERS:
+        if k not in prev or k not in curr or seconds <= 0:
+            continue
+        delta = curr[k] - prev[k]
+        result[k] = delta / seconds if delta >= 0 else None
+    return result
+
+
+def _label(key: str) -> str:
+    return key.replace("connections_", "").replace("total_", "")
+
+
+def _fmt_rate(rate: Optional[float]) -> str:
+    return "-" if rate is None else f"{rate:.1f}/s"
+
+
+def watch_status(
+    session: Any,
+    interval: float,
+    ndjson: bool,
+    count: Optional[int] = None,
+) -> None:
+    """Poll `/status` and print the gauges and rates of the counters per line."""
+    prev: Optional[Dict[str, Any]] = None
+    prev_at = 0.0
+    try:
+        for _ in ticks(interval, count):
+            now = datetime.now(timezone.utc)
+            try:
+                status = status_call(session)
+            except BudgetExceeded:
+                raise
+            except Exception as e:
+                logger.error(f"Could not get the status: {e}")
+                if ndjson:
+                    click.echo(json_dumps({"time": now, "error": str(e)}))
+                prev = None
+                continue
+            at = monotonic()
+            server = status.get("server", {})
+            reachable = (status.get("database") or {}).get("reachable")
+            current_rates = (
+                rates(prev, server, at - prev_at) if prev is not None else {}
+            )
+            prev, prev_at = server, at
+
+            if ndjson:
+                click.echo(
+                    json_dumps(
+                        {
+                            "time": now,
+                            "database_reachable": reachable,
+                            "server": server,
+                            "rates": current_rates,
+                        }
+                    )
+                )
+                continue
+            click.echo(
+                " ".join(
+                    [now.strftime("%Y-%m-%dT%H:%M:%S")]
+                    + [
+                        f"{_label(k)}={_fmt_rate(current_rates.get(k))}"
+                        for k in COUNTERS
+                    ]
+                    + [f"{_label(k)}={server.get(k)}" for k in GAUGES]
+                    + [f"db={'ok' if reachable else 'unreachable'}"]
+                )
+            )
+    except KeyboardInterrupt:
+        pass
+
+
+def watch_option(fkt: F) -> F:
+    """Add `--watch SECONDS` and `--count` to a list command."""
+    fkt = click.option(
+        "--count",
+        type=click.IntRange(min=1),
+        help="With `--watch`, stop after this many refreshes.",
+    )(fkt)
+    fkt = click.option(
+        "--watch",
+        "interval",
+        type=click.FloatRange(min=0.1),
+        metavar="SECONDS",
+        help="Show the table, then re-fetch every SECONDS and only show the changes.",
+    )(fkt)
+    return fkt
+
+
+def fingerprint(entity: Dict[str, Any], row: Row) -> Tuple[Any, str]:
+    """Version of an entity: its timestamp and the content hash of its table row.
+
+    The row also contains joined entities (e.g. acl groups) that do not change the
+    timestamp; the timestamp catches changes of fields not shown in the row.
+    """
+    stamp = entity.get("updated_at") or entity.get("created_at")
+    return stamp, blake2b(json_dumps(row).encode(), digest_size=16).hexdigest()
+
+
+def changes(
+    prev: Dict[str, Tuple[Any, Row]], curr: Dict[str, Tuple[Any, Row]]
+) -> List[Tuple[str, Row]]:
+    """`(change, row)` for every added, changed and removed key."""
+    result = []
+    for key, (version, row) in curr.items():
+        if key not in prev:
+            result.append(("added", row))
+        elif prev[key][0] != version:
+            result.append(("changed", row))
+    for key in prev.keys() - curr.keys():
+        result.append(("removed", prev[key][1]))
+    return result
+
+
+def watch_rows(
+    fetch: Callable[[], List[Tuple[Dict[str, Any], Row]]],
+    key: str,
+    sort_key: Callable[[Row], Any],
+    tablefmt: str,
+    interval: float,
+    count: Optional[int] = None,
+) -> None:
+    """Print the rows of `fetch`, then poll and print only the changed rows."""
+    prev: Optional[Dict[str, Tuple[Any, Row]]] = None
+    try:
+        for _ in ticks(interval, count):
+            # always ask kong, not the cache of `get`
+            invalidate()
+            try:
+                data = fetch()
+            except BudgetExceeded:
+                raise
+            except Exception as e:
+                logger.error(f"Could not refresh: {e}")
+                continue
+            curr = {row[key]: (fingerprint(entity, row), row) for entity, row in data}
+            if prev is None:
+                rows = sorted((row for _, row in curr.values()), key=sort_key)
+                click.echo(tabulate(rows, headers="keys", tablefmt=tablefmt))
+            else:
+                changed = changes(prev, curr)
+                if changed:
+                    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+                    counts = {
+                        c: sum(1 for c_, _ in changed if c_ == c)
+                        for c in ("added", "changed", "removed")
+                    }
+                    click.echo(
+                        f"{now}: " + ", ".join(f"{n} {c}" for c, n in counts.items())
+                    )
+                    changed.sort(key=lambda c: sort_key(c[1]))
+                    click.echo(
+                        tabulate(
+                            [{"change": c, **row} for c, row in changed],
+                            headers="keys",
+                            tablefmt=tablefmt,
+                        )
+                    )
+            prev = curr
+    except KeyboardInterrupt:
+        pass
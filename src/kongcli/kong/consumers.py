@@ -4,6 +4,7 @@ from loguru import logger
 import requests
 
 from ._util import _check_resp
+from .._tracing import traced
 from .general import get_assoziated
 
 
@@ -18,11 +19,13 @@ def _delete(
 
 
 # ACLS / groups
+@traced
 def groups(session: requests.Session, id_: str) -> List[str]:
     data = get_assoziated("consumers", session, id_, "acls")
     return [acl["group"] for acl in data]
 
 
+@traced
 def add_group(session: requests.Session, id_: str, group: str) -> Dict[str, Any]:
     logger.debug(f"Add group `{group}` to consumer with id = `{id_}` ... ")
     resp = session.post(f"/consumers/{id_}/acls", json={"group": group})
@@ -31,15 +34,18 @@ def add_group(session: requests.Session, id_: str, group: str) -> Dict[str, Any]
     return data
 
 
+@traced
 def delete_group(session: requests.Session, id_: str, group: str) -> None:
     _delete(session, id_, "acls", group)
 
 
 # basic auth
+@traced
 def basic_auths(session: requests.Session, id_: str) -> List[Dict[str, Any]]:
     return get_assoziated("consumers", session, id_, "basic-auth")
 
 
+@traced
 def add_basic_auth(
     session: requests.Session, id_: str, username: str, password: str
 ) -> Dict[str, Any]:
@@ -53,6 +59,7 @@ def add_basic_auth(
     return data
 
 
+@traced
 def update_basic_auth(
     session: requests.Session,
     consumer_id: str,
@@ -77,6 +84,7 @@ def update_basic_auth(
     return data
 
 
+@traced
 def delete_basic_auth(
     session: requests.Session, consumer_id: str, basic_auth_id: str
 ) -> None:
@@ -84,10 +92,12 @@ def delete_basic_auth(
 
 
 # key auth
+@traced
 def key_auths(session: requests.Session, id_: str) -> List[Dict[str, Any]]:
     return get_assoziated("consumers", session, id_, "key-auth")
 
 
+@traced
 def add_key_auth(
     session: requests.Session, id_: str, key: Optional[str] = None
 ) -> Dict[str, Any]:
@@ -101,6 +111,7 @@ def add_key_auth(
     return data
 
 
+@traced
 def update_key_auth(
     session: requests.Session, consumer_id: str, key_auth_id: str, key: str
 ) -> Dict[str, Any]:
@@ -116,6 +127,7 @@ def update_key_auth(
     return data
 
 
+@traced
 def delete_key_auth(
     session: requests.Session, consumer_id: str, key_auth_id: str
 ) -> None:
@@ -123,5 +135,6 @@ def delete_key_auth(
 
 
 # plugins
+@traced
 def plugins(session: requests.Session, id_: str) -> List[Dict[str, Any]]:
     return get_assoziated("consumers", session, id_, "plugins")
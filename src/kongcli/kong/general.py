@@ -5,9 +5,12 @@ import requests
 from urllib3.util import parse_url
 
 from ._util import _check_resp
+from .._timings import phase
+from .._tracing import traced
 from .._util import json_dumps
 
 
+@traced
 def information(session: requests.Session) -> Dict[str, Any]:
     logger.debug("Collecting information about kong ...")
     resp = session.get("/")
@@ -16,6 +19,7 @@ def information(session: requests.Session) -> Dict[str, Any]:
     return data
 
 
+@traced
 def status_call(session: requests.Session) -> Dict[str, Any]:
     logger.debug("Collecting status information about kong ...")
     resp = session.get("/status")
@@ -24,6 +28,7 @@ def status_call(session: requests.Session) -> Dict[str, Any]:
     return data
 
 
+@traced
 def all_of(resource: str, session: requests.Session) -> List[Dict[str, Any]]:
     assert resource in (
         "consumers",
@@ -40,7 +45,8 @@ def all_of(resource: str, session: requests.Session) -> List[Dict[str, Any]]:
     while next_:
         resp = session.get(f"{next_}")
         _check_resp(resp)
-        jresp = resp.json()
+        with phase("decode"):
+            jresp = resp.json()
         data += jresp["data"]
         next_ = jresp.get("next")
         if next_:
@@ -50,6 +56,7 @@ def all_of(resource: str, session: requests.Session) -> List[Dict[str, Any]]:
     return data
 
 
+@traced
 def add(resource: str, session: requests.Session, **kwargs: Any) -> Dict[str, Any]:
     assert resource in (
         "consumers",
@@ -70,6 +77,7 @@ def add(resource: str, session: requests.Session, **kwargs: Any) -> Dict[str, An
     return data
 
 
+@traced
 def retrieve(resource: str, session: requests.Session, id_: str) -> Dict[str, Any]:
     assert resource in (
         "consumers",
@@ -86,6 +94,7 @@ def retrieve(resource: str, session: requests.Session, id_: str) -> Dict[str, An
     return data
 
 
+@traced
 def delete(resource: str, session: requests.Session, id_: str) -> None:
     assert resource in (
         "consumers",
@@ -100,6 +109,7 @@ def delete(resource: str, session: requests.Session, id_: str) -> None:
     _check_resp(resp)
 
 
+@traced
 def update(
     resource: str, session: requests.Session, id_: str, **kwargs: Any
 ) -> Dict[str, Any]:
@@ -115,6 +125,41 @@ def update(
     return data
 
 
+@traced
+def upsert(
+    resource: str, session: requests.Session, id_name: str, **kwargs: Any
+) -> Dict[str, Any]:
+    """Create or replace the entity with the given id or name (kong >= 1.0)."""
+    assert resource in ("consumers", "services", "routes", "plugins")
+    payload = json_dumps(kwargs)
+    logger.debug(
+        f"Upsert `{resource}` with id / name = `{id_name}` and `{payload}` ... "
+    )
+    resp = session.put(
+        f"/{resource}/{id_name}",
+        data=payload,
+        headers={"content-type": "application/json"},
+    )
+    _check_resp(resp)
+    data: Dict[str, Any] = resp.json()
+    return data
+
+
+@traced
+def config(session: requests.Session, declarative: str) -> Dict[str, Any]:
+    """Replace the whole config of a DB-less kong with the `declarative` json."""
+    logger.debug(f"Push declarative config with {len(declarative)} bytes ... ")
+    resp = session.post(
+        "/config",
+        data=json_dumps({"config": declarative}),
+        headers={"content-type": "application/json"},
+    )
+    _check_resp(resp)
+    data: Dict[str, Any] = resp.json()
+    return data
+
+
+@traced
 def get_assoziated(
     resource: str, session: requests.Session, id_: str, kind: str
 ) -> List[Dict[str, Any]]:
@@ -124,7 +169,8 @@ def get_assoziated(
     while next_:
         resp = session.get(next_)
         _check_resp(resp)
-        jresp = resp.json()
+        with phase("decode"):
+            jresp = resp.json()
         data += jresp.get("data", [])
         next_ = jresp.get("next")
         if next_:
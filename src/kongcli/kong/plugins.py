@@ -4,8 +4,10 @@ from loguru import logger
 import requests
 
 from ._util import _check_resp
+from .._tracing import traced
 
 
+@traced
 def schema(session: requests.Session, plugin_name: str) -> Dict[str, Any]:
     logger.debug(f"Plugin schema for `{plugin_name}`.")
     resp = session.get(f"/plugins/schema/{plugin_name}")
@@ -14,6 +16,7 @@ def schema(session: requests.Session, plugin_name: str) -> Dict[str, Any]:
     return data
 
 
+@traced
 def enable_on(
     session: requests.Session, resource: str, id_: str, plugin_name: str, **kwargs: Any
 ) -> Dict[str, Any]:
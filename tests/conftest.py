@@ -1,3 +1,4 @@
+from contextlib import contextmanager
 from datetime import datetime, timezone
 import os
 from typing import List
@@ -8,11 +9,14 @@ import psycopg2
 from psycopg2.extras import DictCursor
 import pytest
 
+from kongcli._budget import request_budget
 from kongcli._cli import cli
 from kongcli._session import LiveServerSession
 from kongcli._util import _reset_cache, json_dumps, parse_datetimes
 from kongcli.kong.general import add, information
 
+from .fake_kong import FakeKong
+
 
 @pytest.fixture()
 def invoke(session):
@@ -108,3 +112,57 @@ def sample(clean_kong, session, httpbin):
     parse_datetimes(consumer)
 
     return service, route, consumer
+
+
+@pytest.fixture()
+def fake_kong(request):
+    """Isolated in-process kong admin api (see `fake_kong.py`).
+
+    The kong version defaults to 2.1.0, use indirect parametrization for others:
+    `@pytest.mark.parametrize("fake_kong", ["0.14.1", "1.5.0"], indirect=True)`
+    """
+    _reset_cache()
+    with FakeKong(version=getattr(request, "param", "2.1.0")) as kong:
+        yield kong
+    _reset_cache()
+
+
+@pytest.fixture()
+def fake_session(fake_kong):
+    session = LiveServerSession(fake_kong.url)
+    yield session
+    session.close()
+
+
+@pytest.fixture()
+def fake_invoke(fake_kong, fake_session):
+    runner = CliRunner(mix_stderr=False)
+
+    def _invoke(args: List[str], **kwargs):
+        _reset_cache()
+        return runner.invoke(
+            cli,
+            ["--url", fake_kong.url] + args,
+            obj={"session": fake_session},
+            **kwargs,
+        )
+
+    return _invoke
+
+
+@pytest.fixture()
+def max_requests(fake_session):
+    """Fail, when the block makes more than `limit` requests to the fake kong.
+
+    `with max_requests(3): fake_invoke([...])`
+    """
+
+    @contextmanager
+    def _max_requests(limit: int):
+        with request_budget(fake_session) as budget:
+            yield budget
+        assert (
+            budget.count <= limit
+        ), f"{budget.count} requests, budget is {limit}: {budget.requests}"
+
+    return _max_requests
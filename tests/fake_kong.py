@@ -0,0 +1,560 @@
+"""In-process stand-in for the kong admin api.
+
+Implements the endpoints kongcli uses for consumers, services, routes,
+plugins and the acl / key-auth / basic-auth credentials, including kong-style
+`offset` / `next` pagination and the response shapes of kong 0.13 to 2.x.
+
+    with FakeKong(version="1.5.0") as kong:
+        kong.add("consumers", username="foobar")
+        session = LiveServerSession(kong.url)
+"""
+from datetime import datetime, timezone
+from itertools import count
+import re
+from socketserver import ThreadingMixIn
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+from uuid import uuid4
+from wsgiref.simple_server import make_server, WSGIRequestHandler, WSGIServer
+
+import orjson
+
+RESOURCES = (
+    "consumers",
+    "services",
+    "routes",
+    "plugins",
+    "acls",
+    "key-auths",
+    "basic-auths",
+)
+# nested credential endpoint of a consumer -> top level resource
+CREDENTIALS = {"acls": "acls", "key-auth": "key-auths", "basic-auth": "basic-auths"}
+# fields (besides the id) an entity can be addressed with
+ALT_KEYS = {
+    "consumers": ("username", "custom_id"),
+    "services": ("name",),
+    "routes": ("name",),
+    "plugins": (),
+    "acls": ("group",),
+    "key-auths": ("key",),
+    "basic-auths": ("username",),
+}
+UNIQUE = {
+    "consumers": (("username",), ("custom_id",)),
+    "services": (("name",),),
+    "routes": (("name",),),
+    "plugins": (("name", "consumer", "service", "route"),),
+    "acls": (("consumer", "group"),),
+    "key-auths": (("key",),),
+    "basic-auths": (("username",),),
+}
+DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "consumers": {"username": None, "custom_id": None, "tags": None},
+    "services": {
+        "name": None,
+        "protocol": "http",
+        "host": None,
+        "port": 80,
+        "path": None,
+        "retries": 5,
+        "connect_timeout": 60000,
+        "write_timeout": 60000,
+        "read_timeout": 60000,
+        "tags": None,
+    },
+    "routes": {
+        "name": None,
+        "protocols": ["http", "https"],
+        "methods": None,
+        "hosts": None,
+        "paths": None,
+        "headers": None,
+        "regex_priority": 0,
+        "strip_path": True,
+        "preserve_host": False,
+        "tags": None,
+    },
+    "plugins": {
+        "consumer": None,
+        "service": None,
+        "route": None,
+        "enabled": True,
+        "config": {},
+        "tags": None,
+    },
+    "acls": {"tags": None},
+    "key-auths": {"ttl": None, "tags": None},
+    "basic-auths": {"tags": None},
+}
+UUID_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+class KongError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class _Server(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+class FakeKong:
+    def __init__(self, version: str = "2.1.0", dbless: bool = False) -> None:
+        self.version = version
+        self.version_tuple = tuple(int(v) for v in version.split(".")[:2])
+        self.dbless = dbless
+        self.data: Dict[str, Dict[str, Dict[str, Any]]] = {r: {} for r in RESOURCES}
+        self.requests: List[Tuple[str, str]] = []
+        self.lock = Lock()
+        self.counter = count()
+        # ordered entities per (resource, tags) for the top level list endpoints
+        self.lists: Dict[Tuple[str, FrozenSet[str]], List[Dict[str, Any]]] = {}
+        self.server: Optional[_Server] = None
+        self.thread: Optional[Thread] = None
+        self.url = ""
+
+    # --- lifecycle -----------------------------------------------------------
+    def start(self) -> "FakeKong":
+        self.server = make_server(  # type: ignore
+            "127.0.0.1", 0, self, server_class=_Server, handler_class=_QuietHandler
+        )
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = Thread(
+            target=self.server.serve_forever,
+            kwargs={"poll_interval": 0.01},
+            daemon=True,
+        )
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self) -> "FakeKong":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    # --- direct data access (seeding) ----------------------------------------
+    def add(self, resource: str, **fields: Any) -> Dict[str, Any]:
+        """Add an entity without http; references are given as ids, e.g. `consumer=id`."""
+        with self.lock:
+            self.lists.clear()
+            return self._render(resource, self._create(resource, fields))
+
+    def load(self, resource: str, entities: Iterable[Dict[str, Any]]) -> None:
+        """Bulk seed entities without validation (for large benchmark datasets).
+
+        References are given as ids, e.g. `{"consumer": id, "group": "g1"}`.
+        """
+        created_at = self._now(resource)
+        updated = resource in ("services", "routes") and self.version_tuple >= (1, 0)
+        with self.lock:
+            self.lists.clear()
+            data = self.data[resource]
+            for fields in entities:
+                entity = dict(DEFAULTS[resource])
+                entity.update(fields)
+                entity.setdefault("id", str(uuid4()))
+                entity.setdefault("created_at", created_at)
+                if updated:
+                    entity.setdefault("updated_at", entity["created_at"])
+                entity["_seq"] = next(self.counter)
+                data[entity["id"]] = entity
+
+    def all(self, resource: str) -> List[Dict[str, Any]]:
+        return [self._render(resource, e) for e in self.data[resource].values()]
+
+    # --- entity handling -------------------------------------------------------
+    def _now(self, resource: str) -> int:
+        now = datetime.now(timezone.utc).timestamp()
+        if self.version_tuple < (1, 0) and resource not in ("services", "routes"):
+            return int(now * 1000)
+        return int(now)
+
+    def _ref(self, key: str, value: Any) -> Optional[str]:
+        # references are given by id (or name in the declarative config / kong >= 1.0)
+        if isinstance(value, dict):
+            value = value.get("id") or value.get("name") or value.get("username")
+        target = f"{key}s"
+        if value is None or value in self.data[target]:
+            return value
+        try:
+            return self._find(target, value)["id"]  # type: ignore
+        except KongError:
+            return value
+
+    def _create(
+        self, resource: str, fields: Dict[str, Any], id_: Optional[str] = None
+    ) -> Dict[str, Any]:
+        entity = dict(DEFAULTS[resource])
+        entity.update(fields)
+        entity["id"] = id_ or fields.get("id") or str(uuid4())
+        for key in ("consumer", "service", "route"):
+            if key in entity or f"{key}_id" in entity:
+                entity[key] = self._ref(
+                    key, entity.pop(f"{key}_id", None) or entity.get(key)
+                )
+        if resource == "services" and entity.get("url"):
+            u = urlparse(entity.pop("url"))
+            entity["protocol"] = u.scheme or "http"
+            entity["host"] = u.hostname
+            entity["port"] = u.port or (443 if u.scheme == "https" else 80)
+            entity["path"] = u.path or None
+        if resource == "key-auths" and not entity.get("key"):
+            entity["key"] = uuid4().hex
+        self._validate(resource, entity)
+        entity.setdefault("created_at", self._now(resource))
+        entity["_seq"] = next(self.counter)
+        if resource in ("services", "routes") and self.version_tuple >= (1, 0):
+            entity["updated_at"] = entity["created_at"]
+        self.data[resource][entity["id"]] = entity
+        return entity
+
+    def _validate(self, resource: str, entity: Dict[str, Any]) -> None:
+        if resource == "consumers" and not (
+            entity.get("username") or entity.get("custom_id")
+        ):
+            raise KongError(400, "at least one of these fields must be non-empty")
+        if resource == "services" and not entity.get("host"):
+            raise KongError(400, "schema violation (host: required field missing)")
+        if resource == "routes":
+            if entity.get("service") not in self.data["services"]:
+                raise KongError(400, "the foreign key 'service' does not reference")
+            if not (
+                entity.get("paths") or entity.get("hosts") or entity.get("methods")
+            ):
+                raise KongError(400, "must set one of 'methods', 'hosts', 'paths'")
+        if resource == "plugins" and not entity.get("name"):
+            raise KongError(400, "schema violation (name: required field missing)")
+        for key, target in (
+            ("consumer", "consumers"),
+            ("service", "services"),
+            ("route", "routes"),
+        ):
+            if entity.get(key) and entity[key] not in self.data[target]:
+                raise KongError(404, "Not found")
+        for fields in UNIQUE[resource]:
+            if resource != "plugins" and any(entity.get(f) is None for f in fields):
+                continue
+            values = tuple(entity.get(f) for f in fields)
+            for other in self.data[resource].values():
+                if other["id"] != entity["id"] and values == tuple(
+                    other.get(f) for f in fields
+                ):
+                    raise KongError(
+                        409,
+                        f"UNIQUE violation detected on '{{{','.join(fields)}}}'",
+                    )
+
+    def _render(self, resource: str, entity: Dict[str, Any]) -> Dict[str, Any]:
+        result = {k: v for k, v in entity.items() if not k.startswith("_")}
+        old = self.version_tuple < (0, 15)
+        if old and resource not in ("services", "routes"):
+            # the old DAO of kong < 0.15 leaves out unset fields
+            result = {k: v for k, v in result.items() if v is not None}
+        for key in ("consumer", "service", "route"):
+            if key not in result:
+                continue
+            value = result.pop(key)
+            if old and not (resource == "routes" and key == "service"):
+                if value is not None:
+                    result[f"{key}_id"] = value
+            else:
+                result[key] = {"id": value} if value is not None else None
+        if resource == "basic-auths":
+            result["password"] = "x" * 40  # hashed by kong
+        return result
+
+    def _find(
+        self, resource: str, id_or_name: str, consumer: Optional[str] = None
+    ) -> Dict[str, Any]:
+        entities = self.data[resource]
+        if id_or_name in entities:
+            entity = entities[id_or_name]
+            if consumer is None or entity.get("consumer") == consumer:
+                return entity
+        for entity in entities.values():
+            if consumer is not None and entity.get("consumer") != consumer:
+                continue
+            if any(entity.get(k) == id_or_name for k in ALT_KEYS[resource]):
+                return entity
+        raise KongError(404, "Not found")
+
+    def _delete(self, resource: str, id_: str) -> None:
+        entity = self.data[resource][id_]
+        if resource == "services" and any(
+            r["service"] == id_ for r in self.data["routes"].values()
+        ):
+            raise KongError(
+                400, "an existing 'routes' entity references this 'services' entity"
+            )
+        del self.data[resource][id_]
+        key = resource[:-1]
+        for other in ("plugins", "acls", "key-auths", "basic-auths"):
+            for oid in [
+                o["id"] for o in self.data[other].values() if o.get(key) == id_
+            ]:
+                del self.data[other][oid]
+        assert entity
+
+    def _page(
+        self,
+        resource: str,
+        path: str,
+        query: Dict[str, List[str]],
+        keep: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    ) -> Dict[str, Any]:
+        size = min(int(query.get("size", ["100"])[0]), 1000)
+        offset = int(query.get("offset", ["0"])[0] or 0)
+        tags = frozenset(query.get("tags", [""])[0].split(",")) - {""}
+        entities = self.lists.get((resource, tags)) if keep is None else None
+        if entities is None:
+            # entities are (re-)inserted with increasing `_seq`, i.e. in order
+            entities = [
+                e
+                for e in self.data[resource].values()
+                if (keep is None or keep(e)) and tags <= set(e.get("tags") or [])
+            ]
+            if keep is None:
+                self.lists[(resource, tags)] = entities
+        page = entities[offset : offset + size]
+        result: Dict[str, Any] = {
+            "data": [self._render(resource, e) for e in page],
+            "next": None,
+        }
+        if offset + size < len(entities):
+            next_ = f"{path}?offset={offset + size}&size={size}"
+            if self.version_tuple < (1, 0):
+                next_ = f"{self.url}{next_}"
+            result["next"] = next_
+            result["offset"] = str(offset + size)
+        if self.version_tuple < (1, 0):
+            result["total"] = len(entities)
+        return result
+
+    def _update(
+        self, resource: str, entity: Dict[str, Any], body: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        updated = dict(entity)
+        for k, v in body.items():
+            if (
+                isinstance(v, dict)
+                and isinstance(updated.get(k), dict)
+                and k == "config"
+            ):
+                updated[k] = {**updated[k], **v}
+            else:
+                updated[k] = v
+        for key in ("consumer", "service", "route"):
+            if key in updated:
+                updated[key] = self._ref(key, updated[key])
+        self._validate(resource, updated)
+        if "updated_at" in updated:
+            updated["updated_at"] = self._now(resource)
+        self.data[resource][entity["id"]] = updated
+        return updated
+
+    # --- http ----------------------------------------------------------------
+    def __call__(
+        self, environ: Dict[str, Any], start_response: Callable[..., Any]
+    ) -> Iterable[bytes]:
+        method = environ["REQUEST_METHOD"]
+        path = unquote(environ.get("PATH_INFO", "/"))
+        query = parse_qs(environ.get("QUERY_STRING", ""))
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        raw = environ["wsgi.input"].read(length) if length else b""
+        status, body = 200, None
+        try:
+            payload = orjson.loads(raw) if raw else {}
+            with self.lock:
+                self.requests.append((method, path))
+                if method != "GET":
+                    self.lists.clear()
+                status, body = self.handle(method, path, query, payload or {})
+        except KongError as e:
+            status, body = e.status, {"message": e.message}
+        except orjson.JSONDecodeError:
+            status, body = 400, {"message": "Cannot parse JSON body"}
+
+        reasons = {200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request"}
+        reasons.update({404: "Not Found", 405: "Method Not Allowed", 409: "Conflict"})
+        headers = [("Server", f"kong/{self.version}")]
+        content = b""
+        if status != 204:
+            content = orjson.dumps(body)
+            headers.append(("Content-Type", "application/json; charset=utf-8"))
+        headers.append(("Content-Length", str(len(content))))
+        start_response(f"{status} {reasons.get(status, 'Error')}", headers)
+        return [content]
+
+    def handle(  # noqa: C901
+        self, method: str, path: str, query: Dict[str, List[str]], body: Dict[str, Any]
+    ) -> Tuple[int, Any]:
+        parts = [p for p in path.split("/") if p]
+        if not parts:
+            return 200, {
+                "version": self.version,
+                "tagline": "Welcome to kong",
+                "configuration": {"database": "off" if self.dbless else "postgres"},
+                "plugins": {
+                    "available_on_server": {
+                        n: True
+                        for n in (
+                            "acl",
+                            "basic-auth",
+                            "key-auth",
+                            "rate-limiting",
+                            "request-size-limiting",
+                            "response-ratelimiting",
+                        )
+                    },
+                    "enabled_in_cluster": sorted(
+                        {p["name"] for p in self.data["plugins"].values()}
+                    ),
+                },
+            }
+        if parts == ["status"]:
+            total = len(self.requests)
+            return 200, {
+                "database": {"reachable": True},
+                "server": {
+                    "connections_accepted": total,
+                    "connections_handled": total,
+                    "connections_active": 1,
+                    "connections_reading": 0,
+                    "connections_writing": 1,
+                    "connections_waiting": 0,
+                    "total_requests": total,
+                },
+            }
+        if parts == ["config"]:
+            if not self.dbless or method != "POST":
+                raise KongError(
+                    400,
+                    "this endpoint is only available when Kong is configured to not use a database",
+                )
+            return self._config(body)
+        if parts[:2] == ["plugins", "schema"] and len(parts) == 3:
+            return 200, {"fields": {"config": {"type": "record", "fields": []}}}
+
+        resource = parts[0]
+        if resource not in RESOURCES:
+            raise KongError(404, "Not found")
+        if self.dbless and method in ("POST", "PUT", "PATCH", "DELETE"):
+            raise KongError(405, "cannot create/update/delete in DB-less mode")
+
+        if len(parts) == 1:
+            if method == "GET":
+                return 200, self._page(resource, path, query)
+            if method == "POST":
+                return 201, self._render(resource, self._create(resource, body))
+            raise KongError(405, "Method not allowed")
+
+        if len(parts) == 2:
+            if method == "PUT":
+                fields = dict(body)
+                id_ = None
+                if UUID_RE.match(parts[1]):
+                    id_ = parts[1]
+                else:
+                    fields[ALT_KEYS[resource][0]] = parts[1]
+                try:
+                    old = self._find(resource, parts[1])
+                except KongError:
+                    entity = self._create(resource, fields, id_)
+                else:
+                    self.data[resource].pop(old["id"])
+                    try:
+                        entity = self._create(
+                            resource,
+                            {**fields, "created_at": old["created_at"]},
+                            old["id"],
+                        )
+                    except KongError:
+                        self.data[resource][old["id"]] = old
+                        raise
+                return 200, self._render(resource, entity)
+            entity = self._find(resource, parts[1])
+            if method == "GET":
+                return 200, self._render(resource, entity)
+            if method == "PATCH":
+                return 200, self._render(resource, self._update(resource, entity, body))
+            if method == "DELETE":
+                self._delete(resource, entity["id"])
+                return 204, None
+            raise KongError(405, "Method not allowed")
+
+        parent = self._find(resource, parts[1])
+        kind = parts[2]
+        key = resource[:-1]
+        if kind == "plugins" and resource in ("consumers", "services", "routes"):
+            target = "plugins"
+        elif kind == "routes" and resource == "services":
+            target = "routes"
+        elif kind in CREDENTIALS and resource == "consumers":
+            target = CREDENTIALS[kind]
+        else:
+            raise KongError(404, "Not found")
+
+        if len(parts) == 3:
+            if method == "GET":
+                return 200, self._page(
+                    target, path, query, lambda e: e.get(key) == parent["id"]
+                )
+            if method == "POST":
+                fields = {**body, key: parent["id"]}
+                return 201, self._render(target, self._create(target, fields))
+            raise KongError(405, "Method not allowed")
+
+        entity = self._find(target, parts[3], consumer=parent["id"])
+        if method == "GET":
+            return 200, self._render(target, entity)
+        if method == "PATCH":
+            return 200, self._render(target, self._update(target, entity, body))
+        if method == "DELETE":
+            self._delete(target, entity["id"])
+            return 204, None
+        raise KongError(405, "Method not allowed")
+
+    def _config(self, body: Dict[str, Any]) -> Tuple[int, Any]:
+        config = body.get("config", body)
+        if isinstance(config, str):
+            config = orjson.loads(config)
+        if "_format_version" not in config:
+            raise KongError(400, "declarative config is invalid: _format_version")
+        data: Dict[str, Dict[str, Any]] = {r: {} for r in RESOURCES}
+        old = self.data
+        self.data = data
+        try:
+            for resource, key in (
+                ("consumers", "consumers"),
+                ("services", "services"),
+                ("routes", "routes"),
+                ("plugins", "plugins"),
+                ("acls", "acls"),
+                ("key-auths", "keyauth_credentials"),
+                ("basic-auths", "basicauth_credentials"),
+            ):
+                for entity in config.get(key) or []:
+                    self._create(resource, dict(entity))
+        except KongError as e:
+            self.data = old
+            raise KongError(400, f"declarative config is invalid: {e.message}")
+        return 201, {
+            key: [self._render(r, e) for e in data[r].values()]
+            for r, key in (("consumers", "consumers"), ("services", "services"))
+        }
@@ -14,6 +14,7 @@ from kongcli.kong.general import (
     retrieve,
     status_call,
     update,
+    upsert,
 )
 
 
@@ -122,3 +123,16 @@ def test_update_consumer_custom_id(session, clean_kong):
     assert uconsumer.pop("custom_id") == "foobar"
     consumer.pop("custom_id")
     assert uconsumer == consumer
+
+
+def test_upsert_consumer(session, clean_kong, kong_version):
+    if kong_version < 1.0:
+        pytest.skip("Upsert by PUT needs kong >= 1.0.")
+    consumer = upsert("consumers", session, "test-user", custom_id="1234")
+    assert consumer["username"] == "test-user"
+    assert consumer["custom_id"] == "1234"
+
+    uconsumer = upsert("consumers", session, "test-user", custom_id="4321")
+    assert uconsumer["id"] == consumer["id"]
+    assert uconsumer["custom_id"] == "4321"
+    assert 1 == len(all_of("consumers", session))
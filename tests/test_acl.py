@@ -0,0 +1,103 @@
+from kongcli._acl import AclMatrix, members, popcount
+from kongcli._util import json_loads
+
+CONSUMERS = [{"id": f"c{idx}", "username": f"user{idx}"} for idx in range(4)]
+ACLS = [
+    {"consumer": {"id": "c0"}, "group": "admin"},
+    {"consumer": {"id": "c1"}, "group": "users"},
+    {"consumer": {"id": "c2"}, "group": "users"},
+    {"consumer": {"id": "c2"}, "group": "banned"},
+]
+ROUTES = [
+    {"id": "r1", "service": {"id": "s1"}},
+    {"id": "r2", "service": {"id": "s1"}},
+    {"id": "r3", "service": {"id": "s2"}},
+    {"id": "r4", "service": {"id": "s3"}},
+]
+
+
+def acl(id_, route=None, service=None, **config):
+    return {
+        "id": id_,
+        "name": "acl",
+        "route": {"id": route} if route else None,
+        "service": {"id": service} if service else None,
+        "consumer": None,
+        "config": config,
+    }
+
+
+def test_members():
+    assert list(members(0b10110)) == [1, 2, 4]
+    assert list(members(0)) == []
+    assert popcount(0b10110) == 3
+
+
+def test_acl_matrix():
+    plugins = [
+        acl("p1", service="s1", whitelist=["admin"]),
+        acl("p2", route="r2", allow=["users"]),
+        acl("p3", service="s2", deny=["banned"]),
+    ]
+    m = AclMatrix(CONSUMERS, ACLS, plugins, ROUTES)
+    assert list(members(m.routes["r1"])) == [0]
+    assert list(members(m.routes["r2"])) == [1, 2]
+    assert list(members(m.routes["r3"])) == [0, 1, 3]
+    assert m.routes["r4"] == m.all == 0b1111
+    assert list(members(m.services["s1"])) == [0, 1, 2]
+    assert m.rules["r2"].mode == "allow"
+    assert m.rules["r2"].scope == "route"
+    assert m.consumer_groups("c2") == {"users", "banned"}
+
+
+def test_matrix(fake_kong, fake_invoke):
+    service = fake_kong.add("services", name="svc", host="upstream")
+    open_ = fake_kong.add("services", name="open", host="upstream")
+    route = fake_kong.add("routes", service=service["id"], name="r", paths=["/r"])
+    fake_kong.add("routes", service=open_["id"], name="o", paths=["/o"])
+    alice = fake_kong.add("consumers", username="alice")
+    fake_kong.add("consumers", username="bob")
+    fake_kong.add("acls", consumer=alice["id"], group="admin")
+    fake_kong.add("plugins", name="acl", route=route["id"], config={"allow": ["admin"]})
+
+    result = fake_invoke(["--tablefmt", "plain", "acl", "matrix"])
+    assert result.exit_code == 0, result.stderr
+    rows = sorted(line.split() for line in result.stdout.splitlines()[1:])
+    assert rows == [
+        ["open", "1", "none", "2", "100.0"],
+        ["svc", "1", "allow", "admin", "1", "50.0"],
+    ]
+
+    result = fake_invoke(["acl", "matrix", "--by", "route", "--ndjson"])
+    assert result.exit_code == 0, result.stderr
+    rows = sorted(
+        (r["route"], r["consumers"])
+        for r in map(json_loads, result.stdout.splitlines())
+    )
+    assert rows == [("o", ["alice", "bob"]), ("r", ["alice"])]
+
+    result = fake_invoke(
+        [
+            "--tablefmt",
+            "plain",
+            "acl",
+            "matrix",
+            "--consumer",
+            "bob",
+            "--service",
+            "svc",
+        ]
+    )
+    assert result.exit_code == 0, result.stderr
+    assert result.stdout.splitlines()[1].split() == [
+        "bob",
+        "r",
+        "svc",
+        "allow",
+        "route",
+        "False",
+        "in",
+        "no",
+        "allowed",
+        "group",
+    ]
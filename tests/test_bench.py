@@ -0,0 +1,74 @@
+from threading import Thread
+from time import sleep
+from wsgiref.simple_server import make_server
+
+import pytest
+
+from .fake_kong import _QuietHandler
+
+
+def test_bench_admin(fake_kong, fake_invoke):
+    fake_kong.add("consumers", username="foobar")
+
+    result = fake_invoke(
+        ["--tablefmt", "plain", "bench", "admin", "--requests", "50", "--rate", "500"]
+    )
+    assert result.exit_code == 0, result.stderr
+    assert "50 operations in" in result.stdout
+    for operation in ("list", "retrieve", "create", "delete", "total"):
+        assert operation in result.stdout
+    assert "<= " in result.stdout
+    # only the benchmark entities are cleaned up
+    assert [c["username"] for c in fake_kong.all("consumers")] == ["foobar"]
+
+
+def test_bench_admin_mix(fake_kong, fake_invoke):
+    result = fake_invoke(
+        ["bench", "admin", "--resource", "services", "--mix", "create=1,delete=1"]
+        + ["--requests", "20", "--concurrency", "2"]
+    )
+    assert result.exit_code == 0, result.stderr
+    assert "retrieve" not in result.stdout
+    assert fake_kong.all("services") == []
+
+    result = fake_invoke(["bench", "admin", "--mix", "update=1"])
+    assert result.exit_code == 1
+    assert "Invalid mix `update=1`" in result.stderr
+
+
+@pytest.fixture()
+def fake_proxy(fake_kong):
+    """Answers every request, 5 ms slower while a plugin is configured."""
+
+    def app(environ, start_response):
+        if fake_kong.data["plugins"]:
+            sleep(0.005)
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return [b"ok"]
+
+    server = make_server("127.0.0.1", 0, app, handler_class=_QuietHandler)
+    thread = Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01})
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_bench_plugin(fake_kong, fake_proxy, fake_invoke):
+    result = fake_invoke(
+        ["--tablefmt", "plain", "bench", "plugin", "rate-limiting"]
+        + ["--proxy", fake_proxy, "--upstream", "http://httpbin:80"]
+        + ["-c", "minute", "100000", "-c", "policy", "local"]
+        + ["--requests", "20", "--warmup", "2", "--concurrency", "1"]
+    )
+    assert result.exit_code == 0, result.stderr
+    rows = {
+        line.split()[0]: line.split() for line in result.stdout.splitlines() if line
+    }
+    assert rows["baseline"][1:3] == ["20", "200:"]
+    assert rows["rate-limiting"][1:3] == ["20", "200:"]
+    assert float(rows["delta"][2]) >= 4  # p50 ms
+    # cleaned up
+    assert fake_kong.all("services") == []
+    assert fake_kong.all("routes") == []
+    assert fake_kong.all("plugins") == []
@@ -0,0 +1,17 @@
+from benchmarks.run import compare, run
+
+
+def test_benchmarks():
+    result = run([20], cases=("diff", "list consumers"), repeat=1)
+    assert [(r["case"], r["size"]) for r in result["results"]] == [
+        ("diff", 20),
+        ("list consumers", 20),
+    ]
+    for r in result["results"]:
+        assert r["seconds"] > 0
+        assert r["requests"] > 0
+        assert r["peak_bytes"] > 0
+
+    table = compare(result, result, "plain")
+    assert "list consumers" in table
+    assert "1.000" in table
@@ -0,0 +1,74 @@
+import pytest
+
+
+@pytest.fixture()
+def foobar(fake_kong):
+    consumer = fake_kong.add("consumers", username="foobar")
+    fake_kong.add("acls", consumer=consumer["id"], group="g1")
+    fake_kong.add("key-auths", consumer=consumer["id"])
+    return consumer
+
+
+def test_retrieve_consumer(foobar, fake_invoke, max_requests):
+    with max_requests(5):
+        result = fake_invoke(
+            [
+                "consumers",
+                "retrieve",
+                "--acls",
+                "--basic-auths",
+                "--key-auths",
+                "--plugins",
+                "foobar",
+            ]
+        )
+    assert result.exit_code == 0, result.stderr
+
+
+@pytest.mark.parametrize("groups", [1, 5, 20])
+def test_add_groups(foobar, fake_invoke, max_requests, groups):
+    new_groups = [f"new-{idx}" for idx in range(groups)]
+    # consumer, its groups, one post per missing group and the new groups
+    with max_requests(3 + groups):
+        result = fake_invoke(["consumers", "add-groups", "foobar", "g1"] + new_groups)
+    assert result.exit_code == 0, result.stderr
+
+    with max_requests(2):
+        result = fake_invoke(["consumers", "retrieve", "--acls", "foobar"])
+    assert result.exit_code == 0, result.stderr
+    assert "new-0" in result.stdout
+
+
+def test_retrieve_route(fake_kong, fake_invoke, max_requests):
+    service = fake_kong.add("services", name="httpbin", host="httpbin")
+    fake_kong.add("routes", service=service["id"], name="anything", paths=["/a"])
+
+    with max_requests(2):
+        result = fake_invoke(["routes", "retrieve", "anything"])
+    assert result.exit_code == 0, result.stderr
+
+
+def test_max_requests_option(foobar, fake_invoke):
+    args = ["consumers", "retrieve", "--acls", "--plugins", "foobar"]
+    result = fake_invoke(["--max-requests", "3"] + args)
+    assert result.exit_code == 0, result.stderr
+
+    result = fake_invoke(["--max-requests", "2"] + args)
+    assert result.exit_code == 1
+    assert (
+        "Exceeded the budget of 2 requests with `GET /consumers/foobar/plugins`"
+        in result.stderr
+    )
+
+
+def test_max_requests_stops_bulk(fake_kong, fake_invoke):
+    for idx in range(5):
+        fake_kong.add("consumers", username=f"test-{idx}")
+
+    args = ["consumers", "delete-many", "--name-glob", "test-*", "--yes"]
+    result = fake_invoke(["--max-requests", "3"] + args + ["--concurrency", "1"])
+    assert result.exit_code == 1
+    assert "Exceeded the budget of 3 requests with `DELETE" in result.stderr
+    # the request over the budget is not sent, the others are not failures
+    assert len(fake_kong.requests) == 3
+    assert "failed" not in result.stderr
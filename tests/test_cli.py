@@ -1,4 +1,5 @@
 import json
+import pstats
 import re
 from uuid import uuid4
 
@@ -84,3 +85,53 @@ def test_list_cmd(invoke, clean_kong):
  |_____  |_____| |  \\_| ______| |_____| |  |  | |______ |    \\_ ______|
                                                                        \n\n\n"""
     )
+
+
+def test_list_chained_route_plugins(fake_kong, fake_invoke):
+    service = fake_kong.add("services", name="httpbin", host="httpbin")
+    route = fake_kong.add("routes", service=service["id"], paths=["/httpbin"])
+    fake_kong.add("plugins", name="cors", route=route["id"])
+
+    # `list services` normalizes the cached plugins to `route.id` first
+    result = fake_invoke(["--tablefmt", "plain", "list", "services", "routes"])
+    assert result.exit_code == 0, result.stderr
+    (line,) = [line for line in result.stdout.splitlines() if route["id"] in line]
+    assert "cors" in line
+
+
+def test_list_plugins(fake_kong, fake_invoke):
+    service = fake_kong.add("services", name="httpbin", host="httpbin")
+    consumer = fake_kong.add("consumers", username="foobar")
+    fake_kong.add("plugins", name="key-auth", service=service["id"])
+    fake_kong.add(
+        "plugins", name="rate-limiting", consumer=consumer["id"], config={"minute": 5}
+    )
+
+    result = fake_invoke(["--tablefmt", "plain", "plugins", "list"])
+    assert result.exit_code == 0, result.stderr
+    lines = result.stdout.splitlines()
+    header = next(line.split() for line in lines if "config" in line)
+    # sorted keys, followed by the names of the service and consumer
+    assert header[:3] == ["config", "created_at", "enabled"]
+    assert {"service_name", "consumer_name", "consumer_custom_id"} <= set(header)
+    (key_auth,) = [line for line in lines if "key-auth" in line]
+    assert "httpbin" in key_auth
+    (rate_limiting,) = [line for line in lines if "rate-limiting" in line]
+    assert "foobar" in rate_limiting
+    # the config is pretty printed over several lines
+    assert any(line.strip() == '"minute": 5' for line in lines)
+
+
+def test_timings(invoke):
+    result = invoke(["--timings", "info"])
+    assert result.exit_code == 0
+    assert "GET /" in result.stderr
+    assert "p95 ms" in result.stderr
+
+
+def test_profile(invoke, tmp_path):
+    path = tmp_path / "info.pstats"
+    result = invoke(["--profile", str(path), "--profile-memory", "info"])
+    assert result.exit_code == 0
+    assert pstats.Stats(str(path)).total_calls > 0
+    assert "peak:" in result.stderr
@@ -0,0 +1,125 @@
+from kongcli._consolidate import merged_paths, proposals, safe_proposals
+
+from .fake_kong import KongError
+
+
+def route(id_, paths, **fields):
+    return {
+        "id": id_,
+        "service": {"id": "s1"},
+        "created_at": int(id_[1:]),
+        "paths": paths,
+        "strip_path": True,
+        **fields,
+    }
+
+
+def test_proposals():
+    routes = [
+        route("r3", ["/c"], methods=["POST", "GET"]),
+        route("r1", ["/a"], methods=["GET", "POST"]),
+        route("r2", ["/b", "/a"], methods=["GET", "POST"]),
+        # other methods, settings, service and plugins
+        route("r4", ["/d"], methods=["GET"]),
+        route("r5", ["/e"], methods=["GET", "POST"], strip_path=False),
+        route("r6", ["/f"], methods=["GET", "POST"], service={"id": "s2"}),
+        route("r7", ["/g"], methods=["GET", "POST"]),
+        # no paths
+        route("r8", None, methods=["GET", "POST"], hosts=["example.com"]),
+    ]
+    plugins = [
+        {"id": "p1", "name": "acl", "route": {"id": "r7"}, "config": {"allow": ["a"]}},
+    ]
+    groups = proposals(routes, plugins, 100)
+    assert [[r["id"] for r in group] for group in groups] == [["r1", "r2", "r3"]]
+    assert merged_paths(groups[0]) == ["/a", "/b", "/c"]
+
+    # same plugins (by name and config) on both routes
+    plugins.append(
+        {"id": "p2", "name": "acl", "route": {"id": "r1"}, "config": {"allow": ["a"]}}
+    )
+    groups = proposals(routes, plugins, 100)
+    assert [[r["id"] for r in group] for group in groups] == [
+        ["r1", "r7"],
+        ["r2", "r3"],
+    ]
+
+    groups = proposals(routes[:3], [], 2)
+    assert [[r["id"] for r in group] for group in groups] == [["r1", "r2"]]
+
+
+def test_safe_proposals():
+    routes = [
+        route("r1", ["/a/b/c"]),
+        route("r2", ["/a"]),
+        route("r3", ["/a/bb"], service={"id": "s2"}),
+        route("r4", ["/x"]),
+        route("r5", ["/y"], service={"id": "s2"}),
+        route("r6", ["/y"]),
+    ]
+    # the longest path of r2 would become 6: `/a/bbb` could match `/a`
+    groups, rejected = safe_proposals(routes, [], proposals(routes[:3], [], 100))
+    assert groups == []
+    assert [([r["id"] for r in g], reason) for g, reason in rejected] == [
+        (["r1", "r2"], "`/a` would be tried before `/a/bb` of `r3`")
+    ]
+
+    # `/y` of r6 would get the age of r4 and win over the older r5
+    groups, rejected = safe_proposals(routes, [], proposals(routes[3:], [], 100))
+    assert groups == []
+    assert rejected[0][1] == "`GET /y` would match another route than `r5`"
+
+    groups, rejected = safe_proposals(routes, [], [[routes[0], routes[3]]])
+    assert [[r["id"] for r in g] for g in groups] == [["r1", "r4"]]
+    assert rejected == []
+
+
+def test_consolidate(fake_kong, fake_invoke):
+    service = fake_kong.add("services", name="svc", host="upstream")
+    ids = []
+    for idx in range(4):
+        r = fake_kong.add(
+            "routes",
+            service=service["id"],
+            name=f"r{idx}",
+            paths=[f"/p{idx}"],
+            methods=["GET"],
+            created_at=idx,
+        )
+        ids.append(r["id"])
+    fake_kong.add("plugins", name="acl", route=ids[3], config={"allow": ["a"]})
+
+    result = fake_invoke(["--tablefmt", "plain", "routes", "consolidate"])
+    assert result.exit_code == 0, result.stderr
+    assert result.stdout.splitlines()[1].split() == ["svc", "r0", "2", "3", "GET"]
+    assert "3 of 4 routes can be merged into 1 routes" in result.stderr
+    assert len(fake_kong.all("routes")) == 4
+
+    result = fake_invoke(["routes", "consolidate", "--apply"], input="n\n")
+    assert result.exit_code == 1
+    assert len(fake_kong.all("routes")) == 4
+
+    result = fake_invoke(["routes", "consolidate", "--apply", "--yes"])
+    assert result.exit_code == 0, result.stderr
+    assert "updated: 1, deleted: 2, failed: 0" in result.stderr
+    assert f"Deleted route `{ids[1]}` (r1)." in result.stdout
+    routes = {r["name"]: r for r in fake_kong.all("routes")}
+    assert sorted(routes) == ["r0", "r3"]
+    assert routes["r0"]["paths"] == ["/p0", "/p1", "/p2"]
+
+
+def test_consolidate_failed(fake_kong, fake_invoke, monkeypatch):
+    service = fake_kong.add("services", name="svc", host="upstream")
+    for idx in range(3):
+        fake_kong.add(
+            "routes", service=service["id"], name=f"r{idx}", paths=[f"/p{idx}"]
+        )
+
+    def _delete(resource, id_):
+        raise KongError(500, "An unexpected error occurred")
+
+    monkeypatch.setattr(fake_kong, "_delete", _delete)
+    result = fake_invoke(["routes", "consolidate", "--apply", "--yes"])
+    assert result.exit_code == 1
+    assert "updated: 1, deleted: 0, failed: 2" in result.stderr
+    assert len(fake_kong.all("routes")) == 3
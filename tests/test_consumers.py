@@ -186,6 +186,44 @@ def test_list_two_plugins(invoke, sample, session, full_plugins):
         ]
 
 
+def test_list_joins_related(fake_kong, fake_invoke):
+    alice = fake_kong.add("consumers", username="alice")
+    bob = fake_kong.add("consumers", username="bob")
+    fake_kong.add("acls", consumer=alice["id"], group="g1")
+    fake_kong.add("acls", consumer=bob["id"], group="g2")
+    fake_kong.add("key-auths", consumer=alice["id"], key="alice-key")
+    fake_kong.add("basic-auths", consumer=bob["id"], username="bob-basic")
+    fake_kong.add("plugins", consumer=bob["id"], name="rate-limiting")
+    # plugins of other entities have no consumer
+    fake_kong.add("plugins", name="cors")
+
+    result = fake_invoke(["--tablefmt", "plain", "consumers", "list"])
+    assert result.exit_code == 0, result.stderr
+    rows = {
+        line.split()[1]: line.split()[2:]
+        for line in result.stdout.splitlines()
+        if alice["id"] in line or bob["id"] in line
+    }
+    assert rows == {
+        "alice": ["g1", "alice-..."],
+        "bob": ["g2", "rate-limiting", "bob-basic:xxx"],
+    }
+
+
+def test_list_null_custom_id(fake_kong, fake_invoke):
+    fake_kong.add("consumers", username="bob", custom_id="1234")
+    fake_kong.add("consumers", username="alice")
+    fake_kong.add("consumers", custom_id="42")
+
+    result = fake_invoke(["--tablefmt", "plain", "consumers", "list"])
+    assert result.exit_code == 0, result.stderr
+    names = [
+        line.split()[1] for line in result.stdout.splitlines()[-3:] if line.strip()
+    ]
+    # ordered by the length of the custom_id, then by username
+    assert names == ["alice", "42", "1234"]
+
+
 def test_create_no_required(invoke, clean_kong):
     result = invoke(["consumers", "create"])
     assert result.exit_code == 1
@@ -434,6 +472,56 @@ def test_add_groups_multiple(invoke, sample):
     assert values[4] == ["", "", "", "", "", "", "group2", ""]
 
 
+def test_add_groups_skip_existing_many_consumers(invoke, sample, session, tmp_path):
+    service, route, consumer1 = sample
+    consumer2 = general.add("consumers", session, username="foobar2")
+    consumers.add_group(session, consumer1["id"], "group1")
+    pairs = tmp_path / "pairs.txt"
+    pairs.write_text(f"{consumer2['id']} group3\n# comment\n\n")
+
+    result = invoke(
+        [
+            "--tablefmt",
+            "psql",
+            "consumers",
+            "add-groups",
+            "group1",
+            "group2",
+            "-c",
+            consumer1["id"],
+            "-c",
+            consumer2["id"],
+            "--from-file",
+            str(pairs),
+        ]
+    )
+    assert result.exit_code == 0
+    assert sorted(consumers.groups(session, consumer1["id"])) == ["group1", "group2"]
+    assert sorted(consumers.groups(session, consumer2["id"])) == [
+        "group1",
+        "group2",
+        "group3",
+    ]
+
+
+def test_add_groups_consumer_option(fake_kong, fake_invoke):
+    alice = fake_kong.add("consumers", username="alice")
+    fake_kong.add("consumers", username="bob")
+    fake_kong.add("acls", consumer=alice["id"], group="g0")
+
+    result = fake_invoke(
+        ["--tablefmt", "plain", "consumers", "add-groups", "-c", "alice", "g1", "g2"]
+    )
+    assert result.exit_code == 0, result.stderr
+    assert sorted(a["group"] for a in fake_kong.all("acls")) == ["g0", "g1", "g2"]
+    # the table shows the groups after the change
+    assert "g0" in result.stdout and "g2" in result.stdout
+
+    result = fake_invoke(["consumers", "add-groups", "--concurrency", "1"])
+    assert result.exit_code == 1
+    assert "Missing consumer" in result.stderr
+
+
 def test_delete_groups_none(invoke, sample):
     service, route, consumer = sample
     result = invoke(
@@ -506,6 +594,26 @@ def test_delete(invoke, sample, session):
     assert str(e.value).strip() == '404 Not Found: {"message":"Not found"}'
 
 
+def test_delete_many(invoke, sample, session):
+    service, route, consumer = sample
+    others = [general.add("consumers", session, username=f"test-{i}") for i in range(5)]
+    consumers.add_key_auth(session, others[0]["id"])
+
+    args = ["consumers", "delete-many", "--name-glob", "test-*", "--no-credentials"]
+    result = invoke(args + ["--dry-run"])
+    assert result.exit_code == 0
+    assert "4 consumers selected for deletion." in result.stderr
+    assert len(general.all_of("consumers", session)) == 7
+
+    result = invoke(args, input="y\n")
+    assert result.exit_code == 0
+    assert "deleted: 4, failed: 0" in result.stderr
+    assert {c["username"] for c in general.all_of("consumers", session)} == {
+        consumer["username"],
+        "test-0",
+    }
+
+
 def test_key_auth_lists_none(invoke, sample):
     service, route, consumer = sample
     result = invoke(["consumers", "key-auth", "list", consumer["id"]])
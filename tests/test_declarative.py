@@ -0,0 +1,110 @@
+from uuid import uuid4
+
+from kongcli._declarative import build, merge, validate
+from kongcli._snapshot import RESOURCES
+
+
+def _sample():
+    service = {"id": str(uuid4()), "name": "httpbin", "host": "httpbin", "port": 80}
+    route = {
+        "id": str(uuid4()),
+        "created_at": 1422386534,
+        "service": {"id": service["id"]},
+        "paths": ["/httpbin"],
+        "hosts": None,
+    }
+    consumer = {"id": str(uuid4()), "username": "foobar", "custom_id": None}
+    # kong < 0.15 style reference
+    acl = {"id": str(uuid4()), "consumer_id": consumer["id"], "group": "g1"}
+    plugin = {
+        "id": str(uuid4()),
+        "name": "acl",
+        "route": None,
+        "service": {"id": service["id"]},
+        "consumer": None,
+        "config": {"allow": ["g1"]},
+    }
+    data = {resource: [] for resource in RESOURCES}
+    data.update(
+        services=[service],
+        routes=[route],
+        consumers=[consumer],
+        acls=[acl],
+        plugins=[plugin],
+    )
+    return data
+
+
+def test_build():
+    snapshot = _sample()
+    config = build(snapshot)
+    assert config["_format_version"] == "2.1"
+    assert "keyauth_credentials" not in config
+    assert config["routes"] == [
+        {
+            "id": snapshot["routes"][0]["id"],
+            "service": snapshot["services"][0]["id"],
+            "paths": ["/httpbin"],
+        }
+    ]
+    assert config["consumers"] == [
+        {"id": snapshot["consumers"][0]["id"], "username": "foobar"}
+    ]
+    assert config["acls"][0]["consumer"] == snapshot["consumers"][0]["id"]
+    assert "consumer_id" not in config["acls"][0]
+    assert config["plugins"][0]["service"] == snapshot["services"][0]["id"]
+    assert "route" not in config["plugins"][0]
+    assert validate(config) == []
+
+
+def test_build_skips_basic_auths():
+    snapshot = _sample()
+    consumer = snapshot["consumers"][0]
+    snapshot["basic-auths"] = [
+        {
+            "id": str(uuid4()),
+            "consumer": {"id": consumer["id"]},
+            "username": "foobar",
+            # kong exports the hash, it would hash it again
+            "password": "x" * 40,
+        }
+    ]
+    config = build(snapshot)
+    assert "basicauth_credentials" not in config
+    assert validate(config) == []
+
+
+def test_validate_structure():
+    assert validate({"services": {}}) == [
+        "`_format_version` has to be a string, e.g. `2.1`",
+        "`services` has to be a list of entities",
+    ]
+    assert validate({"_format_version": "2.1", "upstreams": []}) == [
+        "unknown top level key `upstreams`"
+    ]
+
+
+def test_validate_integrity():
+    config = build(_sample())
+    config["routes"].append({"service": "unknown", "paths": ["/foo"]})
+    config["routes"].append({"service": "httpbin"})
+    config["keyauth_credentials"] = [{"key": "secret"}]
+    config["consumers"].append({"username": "foobar"})
+
+    assert validate(config) == [
+        "duplicate consumer username `foobar`",
+        "`routes[1]` references unknown service `unknown`",
+        "`routes[2]` needs one of paths, hosts, methods, snis, sources",
+        "`keyauth_credentials[0]` needs a consumer",
+    ]
+
+
+def test_merge():
+    config = build(_sample())
+    merged = merge(
+        [config, {"_format_version": "1.1", "consumers": [{"username": "other"}]}],
+        "2.1",
+    )
+    assert merged["_format_version"] == "2.1"
+    assert len(merged["consumers"]) == 2
+    assert merged["services"] == config["services"]
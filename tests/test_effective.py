@@ -0,0 +1,123 @@
+from kongcli._effective import ANY, effective_rows, PluginIndex
+from kongcli._util import json_loads
+
+
+def plugin(id_, name="rate-limiting", consumer=None, route=None, service=None, **kw):
+    return {
+        "id": id_,
+        "name": name,
+        "consumer": {"id": consumer} if consumer else None,
+        "route": {"id": route} if route else None,
+        "service": {"id": service} if service else None,
+        "enabled": True,
+        **kw,
+    }
+
+
+PLUGINS = [
+    plugin("global"),
+    plugin("service", service="s1"),
+    plugin("route", route="r2"),
+    plugin("route+service", route="r3", service="s1"),
+    plugin("consumer", consumer="c1"),
+    plugin("consumer+service", consumer="c2", service="s1"),
+    plugin("consumer+route", consumer="c2", route="r1"),
+    plugin("consumer+route+service", consumer="c3", route="r1", service="s1"),
+    plugin("disabled", consumer="c3", enabled=False),
+    plugin("acl", name="acl", route="r1"),
+]
+ROUTES = [
+    {"id": "r1", "service": {"id": "s1"}},
+    {"id": "r2", "service": {"id": "s1"}},
+    {"id": "r3", "service": {"id": "s1"}},
+    {"id": "r4", "service": {"id": "s2"}},
+]
+
+
+def test_resolve():
+    index = PluginIndex(PLUGINS)
+
+    def resolve(consumer, route, service):
+        result = index.resolve("rate-limiting", consumer, route, service)
+        return result[1]["id"]
+
+    assert resolve("c3", "r1", "s1") == "consumer+route+service"
+    assert resolve("c2", "r1", "s1") == "consumer+route"
+    assert resolve("c2", "r2", "s1") == "consumer+service"
+    assert resolve("c1", "r3", "s1") == "route+service"
+    assert resolve("c1", "r2", "s1") == "consumer"
+    assert resolve(None, "r2", "s1") == "route"
+    assert resolve("c3", "r2", "s1") == "route"
+    assert resolve(None, "r1", "s1") == "service"
+    assert resolve(None, "r4", "s2") == "global"
+    assert index.resolve("acl", "c1", "r2", "s1") is None
+
+
+def test_effective_rows():
+    index = PluginIndex(PLUGINS)
+    rows = list(effective_rows(index, ROUTES))
+
+    def lookup(name, consumer, route):
+        table = {(c, r, n): p["id"] for c, r, n, (_, p) in rows}
+        for key in ((consumer, route), (consumer, ANY), (ANY, route), (ANY, ANY)):
+            if key + (name,) in table:
+                return table[key + (name,)]
+        return None
+
+    # the compressed rows agree with resolving every pair
+    for consumer in (None, "c1", "c2", "c3", "c4"):
+        for route in ROUTES:
+            for name in ("rate-limiting", "acl"):
+                expected = index.resolve(name, consumer, route["id"], "s1")
+                if route["id"] == "r4":
+                    expected = index.resolve(name, consumer, "r4", "s2")
+                assert lookup(name, consumer or ANY, route["id"]) == (
+                    expected and expected[1]["id"]
+                ), (name, consumer, route["id"])
+
+
+def test_effective(fake_kong, fake_invoke):
+    service = fake_kong.add("services", name="svc", host="upstream")
+    route = fake_kong.add("routes", service=service["id"], name="r", paths=["/r"])
+    fake_kong.add("routes", service=service["id"], name="other", paths=["/o"])
+    consumer = fake_kong.add("consumers", username="alice")
+    fake_kong.add("consumers", username="bob")
+    fake_kong.add("plugins", name="rate-limiting", config={"minute": 10})
+    fake_kong.add(
+        "plugins",
+        name="rate-limiting",
+        consumer=consumer["id"],
+        route=route["id"],
+        config={"minute": 100},
+    )
+    fake_kong.add("plugins", name="acl", route=route["id"], config={"allow": ["a"]})
+
+    result = fake_invoke(
+        [
+            "--tablefmt",
+            "plain",
+            "plugins",
+            "effective",
+            "--consumer",
+            "bob",
+            "--route",
+            "r",
+        ]
+    )
+    assert result.exit_code == 0, result.stderr
+    rows = [line.split()[:5] for line in result.stdout.splitlines() if "bob" in line]
+    assert rows == [
+        ["bob", "r", "svc", "acl", "route"],
+        ["bob", "r", "svc", "rate-limiting", "global"],
+    ]
+
+    result = fake_invoke(["plugins", "effective", "--ndjson", "-p", "rate-limiting"])
+    assert result.exit_code == 0, result.stderr
+    rows = [json_loads(line) for line in result.stdout.splitlines()]
+    assert [(r["consumer"], r["route"], r["scope"], r["config"]) for r in rows] == [
+        ("*", "*", "global", {"minute": 10}),
+        ("alice", "r", "consumer+route", {"minute": 100}),
+    ]
+
+    result = fake_invoke(["plugins", "effective", "--consumer", "carol"])
+    assert result.exit_code == 1
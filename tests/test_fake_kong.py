@@ -0,0 +1,101 @@
+import pytest
+
+from kongcli.kong import consumers
+from kongcli.kong.general import add, all_of, delete, information, retrieve, upsert
+
+VERSIONS = ["0.13.1", "0.14.1", "0.15.0", "1.5.0", "2.1.0"]
+
+
+@pytest.mark.parametrize("fake_kong", VERSIONS, indirect=True)
+def test_information(fake_kong, fake_session):
+    assert information(fake_session)["version"] == fake_kong.version
+
+
+@pytest.mark.parametrize("fake_kong", VERSIONS, indirect=True)
+def test_pagination(fake_kong, fake_session):
+    for idx in range(250):
+        fake_kong.add("consumers", username=f"user-{idx:03d}")
+
+    data = all_of("consumers", fake_session)
+    assert [c["username"] for c in data] == [f"user-{idx:03d}" for idx in range(250)]
+    # 3 pages à 100
+    assert fake_kong.requests.count(("GET", "/consumers")) == 3
+
+
+def test_load(fake_kong, fake_session):
+    fake_kong.load("consumers", ({"username": f"user-{idx}"} for idx in range(150)))
+    assert len(all_of("consumers", fake_session)) == 150
+
+    # the cached listing is invalidated by writes
+    add("consumers", fake_session, username="foobar")
+    assert all_of("consumers", fake_session)[-1]["username"] == "foobar"
+
+
+@pytest.mark.parametrize(
+    "fake_kong, flat, ms",
+    [
+        ("0.13.1", True, True),
+        ("0.14.1", True, True),
+        ("0.15.0", False, True),
+        ("1.5.0", False, False),
+        ("2.1.0", False, False),
+    ],
+    indirect=["fake_kong"],
+)
+def test_response_shapes(fake_kong, fake_session, flat, ms):
+    consumer = add("consumers", fake_session, username="foobar")
+    acl = consumers.add_group(fake_session, consumer["id"], "g1")
+    service = add("services", fake_session, name="s1", url="http://httpbin:8080/p")
+    plugin = add("plugins", fake_session, name="acl", service={"id": service["id"]})
+
+    if flat:
+        assert acl["consumer_id"] == consumer["id"]
+        assert plugin["service_id"] == service["id"]
+        assert "route_id" not in plugin and "custom_id" not in consumer
+    else:
+        assert acl["consumer"] == {"id": consumer["id"]}
+        assert plugin["service"] == {"id": service["id"]}
+        assert plugin["route"] is None
+    assert (consumer["created_at"] > 10 ** 12) == ms
+    assert service["created_at"] < 10 ** 12
+    assert (service["host"], service["port"], service["path"]) == (
+        "httpbin",
+        8080,
+        "/p",
+    )
+
+
+def test_errors(fake_session):
+    add("consumers", fake_session, username="foobar")
+    with pytest.raises(Exception, match="409"):
+        add("consumers", fake_session, username="foobar")
+    with pytest.raises(Exception, match="400"):
+        add("consumers", fake_session)
+    with pytest.raises(Exception, match="404"):
+        retrieve("consumers", fake_session, "unknown")
+
+    service = add("services", fake_session, name="s1", host="httpbin")
+    add("routes", fake_session, service={"id": service["id"]}, paths=["/"])
+    with pytest.raises(Exception, match="400"):
+        delete("services", fake_session, "s1")
+
+
+def test_cascade_and_upsert(fake_kong, fake_session):
+    consumer = upsert("consumers", fake_session, "foobar", custom_id="1")
+    assert upsert("consumers", fake_session, "foobar", custom_id="2")["id"] == (
+        consumer["id"]
+    )
+    consumers.add_group(fake_session, "foobar", "g1")
+    consumers.add_key_auth(fake_session, "foobar")
+    assert consumers.groups(fake_session, "foobar") == ["g1"]
+
+    delete("consumers", fake_session, "foobar")
+    assert fake_kong.all("acls") == []
+    assert fake_kong.all("key-auths") == []
+
+
+def test_cli(fake_kong, fake_invoke):
+    fake_kong.add("consumers", username="foobar", custom_id="1234")
+    result = fake_invoke(["--tablefmt", "plain", "consumers", "retrieve", "foobar"])
+    assert result.exit_code == 0, result.output
+    assert "foobar" in result.output
@@ -0,0 +1,69 @@
+from kongcli._probe import target
+
+
+def test_target():
+    route = {"id": "r1", "paths": ["/httpbin/"], "methods": ["POST", "GET"]}
+    t = target(route, "httpbin", "/anything")
+    assert (t.route, t.service, t.method, t.path, t.host) == (
+        "r1",
+        "httpbin",
+        "POST",
+        "/httpbin/anything",
+        None,
+    )
+
+    t = target({"id": "r2", "name": "wild", "hosts": ["*.example.com"]}, "s")
+    assert (t.route, t.method, t.path, t.host) == (
+        "wild",
+        "GET",
+        "/",
+        "probe.example.com",
+    )
+
+    assert target({"id": "r3", "paths": [r"/users/\d+"]}, "s").path == "/users/1"
+    assert target({"id": "r4", "paths": [r"/users/[^/]+"]}, "s") is None
+    assert target({"id": "r5", "paths": ["/"], "protocols": ["grpc"]}, "s") is None
+
+
+def test_probe(fake_kong, fake_invoke):
+    # the fake admin api doubles as upstream behind the "proxy"
+    service = fake_kong.add("services", name="admin", host="localhost")
+    fake_kong.add("routes", service=service["id"], name="status", paths=["/status"])
+    fake_kong.add("routes", service=service["id"], name="gone", paths=["/missing"])
+    fake_kong.add("routes", service=service["id"], name="regex", paths=[r"/\d+"])
+    fake_kong.add("routes", service=service["id"], name="any", paths=[r"/[^/]+"])
+
+    result = fake_invoke(
+        [
+            "-v",
+            "--tablefmt",
+            "plain",
+            "probe",
+            "--proxy",
+            fake_kong.url,
+            "--requests",
+            "5",
+        ]
+    )
+    assert result.exit_code == 0, result.stderr
+    assert "15 requests to 3 routes" in result.stdout
+    lines = result.stdout.splitlines()
+    assert any(
+        line.split()[:5] == ["status", "admin", "GET", "/status", "5"] for line in lines
+    )
+    assert any("404: 5" in line and line.startswith("gone") for line in lines)
+    assert any(
+        line.split()[:5] == ["regex", "admin", "GET", "/1", "5"] for line in lines
+    )
+    assert any(line.split()[:3] == ["admin", "15", "200:"] for line in lines)
+    assert "Skip route `any`: no path matched by its regex paths." in result.stderr
+
+    result = fake_invoke(
+        ["probe", "--proxy", fake_kong.url, "--route", "gone", "--route", "any"]
+    )
+    assert result.exit_code == 0, result.stderr
+    assert "10 requests to 1 routes" in result.stdout
+
+    result = fake_invoke(["probe", "--proxy", fake_kong.url, "--service", "other"])
+    assert result.exit_code == 1
+    assert "No routes to probe." in result.stderr
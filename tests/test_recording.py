@@ -0,0 +1,98 @@
+from io import StringIO
+import json
+
+import pytest
+from requests.exceptions import ConnectionError
+
+from kongcli._recording import Recorder, replay
+from kongcli._session import LiveServerSession
+
+
+def _entry(method, url, content, body=None, status=200):
+    return json.dumps(
+        {
+            "method": method,
+            "url": url,
+            "body": body,
+            "status": status,
+            "reason": "OK",
+            "headers": {"Content-Type": "application/json; charset=utf-8"},
+            "content": json.dumps(content),
+            "seconds": 0.01,
+        }
+    )
+
+
+@pytest.fixture()
+def recording():
+    return StringIO(
+        "\n".join(
+            [
+                _entry("GET", "/consumers", {"data": [], "next": None}),
+                _entry("POST", "/consumers/", {"username": "a"}, '{"username":"a"}'),
+                _entry("POST", "/consumers/", {"username": "b"}, '{"username":"b"}'),
+                _entry("GET", "/consumers", {"data": [{"id": "1"}], "next": None}),
+            ]
+        )
+    )
+
+
+def test_replay(recording):
+    session = LiveServerSession("http://kong:8001")
+    replay(session, recording)
+
+    assert session.get("/consumers").json()["data"] == []
+    assert session.post("/consumers/", data='{"username":"b"}').json() == {
+        "username": "b"
+    }
+    assert session.post("/consumers/", data='{"username":"a"}').json() == {
+        "username": "a"
+    }
+    assert session.get("/consumers").json()["data"] == [{"id": "1"}]
+    # the last response is repeated
+    assert session.get("/consumers").json()["data"] == [{"id": "1"}]
+
+    with pytest.raises(ConnectionError):
+        session.get("/services")
+    session.close()
+
+
+def test_replay_once_per_entry():
+    recording = StringIO(
+        "\n".join(
+            [
+                _entry("POST", "/consumers/", {"username": "a"}, '{"username":"a"}'),
+                _entry("POST", "/consumers/", {"username": "b"}, '{"username":"b"}'),
+            ]
+        )
+    )
+    session = LiveServerSession("http://kong:8001")
+    replay(session, recording)
+
+    assert session.post("/consumers/", data='{"username":"a"}').json() == {
+        "username": "a"
+    }
+    # the body differs: the unused response of the url, not `a` again
+    assert session.post("/consumers/", data='{"username":"c"}').json() == {
+        "username": "b"
+    }
+    session.close()
+
+
+def test_record_replayed(recording):
+    session = LiveServerSession("http://kong:8001/")
+    replay(session, recording)
+    output = StringIO()
+    session.request_hooks.append(Recorder(output).on_request)
+
+    session.get("/consumers")
+    session.post("/consumers/", data='{"username":"a"}')
+
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [(e["method"], e["url"], e["body"]) for e in lines] == [
+        ("GET", "/consumers", None),
+        ("POST", "/consumers/", '{"username":"a"}'),
+    ]
+    assert json.loads(lines[1]["content"]) == {"username": "a"}
+    assert lines[1]["status"] == 200
+    session.close()
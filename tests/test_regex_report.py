@@ -0,0 +1,54 @@
+from kongcli._regex_report import attacks, complexity, hazards, profile
+from kongcli._router import parse
+
+
+def test_hazards():
+    assert hazards(parse(r"/users/\d+$")) == set()
+    assert hazards(parse(r"/(a+)+$")) == {"nested quantifier"}
+    assert hazards(parse(r"/x/(a|a?)+$")) == {"overlapping alternation in repeat"}
+    assert hazards(parse(r"/\d+\d*$")) == {"adjacent quantifiers"}
+    assert hazards(parse(r"/[a-z]+\d+$")) == set()
+
+
+def test_attacks():
+    assert attacks(parse(r"/v(1|2)/(\w+\s?)+$")) == [("/v1/", "a "), ("/v1/", "a")]
+
+
+def test_complexity():
+    assert complexity([(8, 1e-6), (16, 0.1)], 0.01)[0] == "exponential"
+    assert complexity([(100, 1e-4), (1000, 1e-2)], 0.1) == ("polynomial", 2.0)
+    assert complexity([(100, 1e-4), (1000, 1e-3)], 0.1) == ("linear", 1.0)
+    assert complexity([(100, 1e-7), (1000, 1e-6)], 0.1) == ("linear", 1.0)
+
+
+def test_profile():
+    result = profile(r"/(a+)+$", ["/aaa"], 0.005, 1024)
+    assert result["complexity"] == "exponential"
+    assert result["at length"] <= 64
+    assert profile(r"/users/\d+$", [], 0.005, 1024)["complexity"] == "linear"
+    assert profile("/(", [], 0.005, 1024)["complexity"] == "invalid"
+
+
+def test_regex_report(fake_kong, fake_invoke):
+    service = fake_kong.add("services", name="svc", host="upstream")
+    fake_kong.add("routes", service=service["id"], name="ok", paths=[r"/u/\d+$"])
+    fake_kong.add("routes", service=service["id"], name="bad", paths=[r"/b/(a+)+$"])
+    fake_kong.add("routes", service=service["id"], name="plain", paths=["/p"])
+
+    result = fake_invoke(
+        ["--tablefmt", "plain", "routes", "regex-report", "--file", "-"],
+        input="GET /u/12\nGET /b/aaa\n",
+    )
+    assert result.exit_code == 0, result.stderr
+    lines = result.stdout.splitlines()
+    assert len(lines) == 3
+    assert lines[1].split()[:6] == [
+        "bad",
+        "svc",
+        "/b/(a+)+$",
+        "0",
+        "nested",
+        "quantifier",
+    ]
+    assert "exponential" in lines[1]
+    assert lines[2].split()[:5] == ["ok", "svc", r"/u/\d+$", "0", "linear"]
@@ -0,0 +1,205 @@
+from time import perf_counter
+
+from kongcli._router import (
+    analyze_routes,
+    is_regex,
+    literal_prefix,
+    parse_request,
+    Router,
+    sample,
+)
+from kongcli._util import json_dumps, json_loads
+
+SERVICE = {"id": "s1", "name": "svc", "host": "upstream", "path": "/base"}
+
+
+def route(id_, **fields):
+    return {"id": id_, "service": {"id": "s1"}, "created_at": int(id_[1:]), **fields}
+
+
+def test_is_regex():
+    assert not is_regex("/api/v1.0/~user_name-1/%20")
+    assert is_regex(r"/users/\d+")
+    assert is_regex("/a$")
+
+
+def test_literal_prefix():
+    assert literal_prefix(r"/users/\d+") == "/users/"
+    assert literal_prefix(r"^/api/v1?/x") == "/api/v"
+    assert literal_prefix("/a|/b") == ""
+    assert literal_prefix("/a.b") == "/a"
+
+
+def test_sample():
+    assert sample(r"/users/\d+") == "/users/1"
+    assert sample("/(a|b)/[x-z]") == "/a/x"
+    assert sample("/[^a]") is None
+
+
+def test_match():
+    router = Router(
+        [
+            route("r1", paths=["/api"]),
+            route("r2", paths=["/api/v1"], strip_path=False),
+            route("r3", paths=[r"/api/\d+"], preserve_host=True),
+            route("r4", paths=["/api"], methods=["POST"]),
+            route("r5", hosts=["example.com"], paths=["/"]),
+            route("r6", hosts=["*.example.com"], paths=["/"]),
+            route("r7", paths=["/grpc"], protocols=["grpc"]),
+            route("r8", paths=["/h"], headers={"X-Version": ["2"]}),
+        ],
+        [SERVICE],
+    )
+
+    def match(method, host, path, headers=None):
+        m = router.match(method, host, path, headers)
+        return m and (m.route["id"], m.upstream_host, m.upstream_path)
+
+    assert match("GET", None, "/api/x") == ("r1", "upstream", "/base/x")
+    assert match("GET", None, "/api/v1/x") == ("r2", "upstream", "/base/api/v1/x")
+    assert match("GET", "h", "/api/12") == ("r3", "h", "/base")
+    # more attributes (methods) before longer paths
+    assert match("POST", None, "/api/v1") == ("r4", "upstream", "/base/v1")
+    assert match("GET", "example.com:8000", "/api") == ("r5", "upstream", "/base/api")
+    assert match("GET", "a.example.com", "/") == ("r6", "upstream", "/base")
+    assert match("GET", None, "/grpc") is None
+    assert match("GET", None, "/h", {"x-version": "2"}) == ("r8", "upstream", "/base")
+    assert match("GET", None, "/h") is None
+
+
+def test_analyze_routes():
+    router = Router(
+        [
+            route("r1", paths=["/api"]),
+            route("r2", paths=["/api"]),
+            route("r3", paths=["/x", "/y"], methods=["GET", "POST"]),
+            route("r4", paths=["/x"], methods=["GET"]),
+            route("r5", paths=["/x", "/z"], methods=["POST"]),
+            route("r6", paths=[r"/users/\d+"]),
+            route("r7", paths=["/users/12"]),
+            route("r8", paths=[r"/items/1\d*"]),
+            route("r9", paths=[r"/items/\d+"]),
+            # different category (has a host): not comparable
+            route("r10", hosts=["example.com"], paths=["/users/1"]),
+        ]
+    )
+    findings = {(f["kind"], f["route"], f["other"]) for f in analyze_routes(router)}
+    assert findings == {
+        ("duplicate", "r2", "r1"),
+        ("shadowed", "r4", "r3"),
+        ("partly shadowed", "r5", "r3"),
+        ("ambiguous", "r7", "r6"),
+        ("ambiguous", "r9", "r8"),
+    }
+
+
+def test_analyze_many_routes():
+    routes = [
+        route(f"r{i}", paths=[f"/svc{i % 100}/res{i}"], methods=["GET"])
+        for i in range(1, 20001)
+    ]
+    routes.append(route("r20001", paths=["/svc1/res1"], methods=["GET"]))
+    findings = analyze_routes(Router(routes))
+    assert [(f["kind"], f["route"]) for f in findings] == [("duplicate", "r20001")]
+
+
+def test_analyze_many_regex_routes():
+    routes = [
+        route(f"r{i}", paths=[rf"/api/v1/res\d+/x{i}$", f"/api/v1/res{i}/y"])
+        for i in range(1, 1001)
+    ]
+    routes.append(route("r1001", paths=[r"/api/v1/res\d+/x1$"]))
+    start = perf_counter()
+    findings = analyze_routes(Router(routes))
+    assert perf_counter() - start < 10
+    assert [(f["kind"], f["route"], f["other"]) for f in findings] == [
+        ("ambiguous", "r1001", "r1")
+    ]
+
+
+def test_analyze(fake_kong, fake_invoke, tmp_path):
+    service = fake_kong.add("services", name="svc", host="upstream")
+    for idx, name in enumerate(["first", "second"]):
+        fake_kong.add(
+            "routes", service=service["id"], name=name, paths=["/a"], created_at=idx
+        )
+
+    result = fake_invoke(["--tablefmt", "plain", "routes", "analyze", "--exit-code"])
+    assert result.exit_code == 1, result.stderr
+    assert result.stdout.splitlines()[1].split() == [
+        "duplicate",
+        "second",
+        "svc",
+        "first",
+        "matches",
+        "the",
+        "same",
+        "requests",
+    ]
+    assert "Analyzed 2 routes: 1 duplicate." in result.stdout
+
+    export = tmp_path / "export.json"
+    export.write_text(json_dumps({"routes": fake_kong.all("routes")[:1]}))
+    result = fake_invoke(["routes", "analyze", "--from", str(export), "--exit-code"])
+    assert result.exit_code == 0, result.stderr
+    assert "Analyzed 1 routes: no findings." in result.stdout
+
+
+def test_parse_request():
+    assert parse_request("GET /a?x=1 HTTP/1.1") == ("GET", None, "/a", {})
+    assert parse_request("post https://example.com/a") == (
+        "POST",
+        "example.com",
+        "/a",
+        {},
+    )
+    assert parse_request("/a example.com") == ("GET", "example.com", "/a", {})
+    assert parse_request(
+        '{"method": "PUT", "url": "/b", "headers": {"x-version": "2"}}'
+    ) == ("PUT", None, "/b", {"x-version": "2"})
+
+
+def test_match_cmd(fake_kong, fake_invoke):
+    service = fake_kong.add("services", name="svc", host="upstream", path="/base")
+    fake_kong.add("routes", service=service["id"], name="api", paths=["/api"])
+    fake_kong.add(
+        "routes",
+        service=service["id"],
+        name="users",
+        paths=[r"/api/users/\d+"],
+        hosts=["example.com"],
+        preserve_host=True,
+        strip_path=False,
+    )
+
+    result = fake_invoke(
+        ["--tablefmt", "plain", "routes", "match", "--host", "example.com", "/api/x"]
+    )
+    assert result.exit_code == 0, result.stderr
+    assert result.stdout.splitlines()[1].split() == [
+        "GET",
+        "example.com",
+        "/api/x",
+        "api",
+        "svc",
+        "/api",
+        "upstream",
+        "/base/x",
+    ]
+
+    lines = "\n".join(
+        [
+            "GET http://example.com/api/users/1?page=2",
+            '{"method": "POST", "path": "/other"}',
+            "",
+            "# comment",
+        ]
+    )
+    result = fake_invoke(["routes", "match", "--file", "-", "--ndjson"], input=lines)
+    assert result.exit_code == 0, result.stderr
+    rows = [json_loads(line) for line in result.stdout.splitlines()]
+    assert [(r["route"], r["upstream_host"], r["upstream_path"]) for r in rows] == [
+        ("users", "example.com", "/base/api/users/1"),
+        (None, None, None),
+    ]
+    assert "Matched 1 of 2 requests" in result.stderr
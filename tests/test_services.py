@@ -1,6 +1,6 @@
 import pytest
 
-from kongcli._util import parse_datetimes
+from kongcli._util import _reset_cache, parse_datetimes
 from kongcli.kong import general
 
 
@@ -284,3 +284,50 @@ def test_add_url(invoke, clean_kong, httpbin_parsed, httpbin, now):
         "60000",
         "",
     ]
+
+
+def test_enable_rate_limiting_many(invoke, sample, session, httpbin):
+    service1, route, consumer = sample
+    service2 = general.add("services", session, name="httpbin2", url=httpbin)
+    general.add("services", session, name="other", url=httpbin)
+
+    args = ["--tablefmt", "psql", "services", "enable-rate-limiting", "--minute", "10"]
+    result = invoke(args + ["--name-glob", "httpbin*"])
+    assert result.exit_code == 0
+    assert "enabled: 2, updated: 0, unchanged: 0, failed: 0" in result.stderr
+
+    _reset_cache()
+    result = invoke(args + [service1["id"], service2["name"]])
+    assert result.exit_code == 0
+    assert "enabled: 0, updated: 0, unchanged: 2, failed: 0" in result.stderr
+
+    plugins = [
+        p for p in general.all_of("plugins", session) if p["name"] == "rate-limiting"
+    ]
+    assert len(plugins) == 2
+
+
+def test_enable_rate_limiting_many_failed(fake_kong, fake_invoke, monkeypatch):
+    fake_kong.add("services", name="httpbin1", host="httpbin")
+    fake_kong.add("services", name="httpbin2", host="httpbin")
+
+    def enable_on(session, resource, id_, name, **kwargs):
+        raise Exception("409 Conflict")
+
+    monkeypatch.setattr("kongcli._plugins.plugins.enable_on", enable_on)
+    args = ["services", "enable-rate-limiting", "--minute", "10", "httpbin1"]
+    result = fake_invoke(args + ["httpbin2"])
+    assert result.exit_code == 1
+    assert "enabled: 0, updated: 0, unchanged: 0, failed: 2" in result.stderr
+
+
+def test_delete_many_failed(fake_kong, fake_invoke):
+    service = fake_kong.add("services", name="httpbin1", host="httpbin")
+    fake_kong.add("services", name="httpbin2", host="httpbin")
+    fake_kong.add("routes", service=service["id"], paths=["/httpbin"])
+
+    args = ["services", "delete-many", "--name-glob", "httpbin*", "--yes"]
+    result = fake_invoke(args)
+    assert result.exit_code == 1
+    assert "deleted: 1, failed: 1" in result.stderr
+    assert [s["name"] for s in fake_kong.all("services")] == ["httpbin1"]
@@ -8,3 +8,20 @@ def test_remove_multiple_slash():
 
     assert session.prefix_url == "https://httpbin.org"
     session.close()
+
+
+def test_request_hooks(httpbin):
+    session = LiveServerSession(httpbin)
+    calls = []
+    session.request_hooks.append(
+        lambda method, url, resp, seconds: calls.append(
+            (method, url, resp.status_code, seconds)
+        )
+    )
+    session.get("/status/201")
+
+    assert len(calls) == 1
+    method, url, status, seconds = calls[0]
+    assert (method, url, status) == ("GET", "/status/201", 201)
+    assert seconds > 0
+    session.close()
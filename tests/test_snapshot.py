@@ -0,0 +1,157 @@
+from copy import deepcopy
+import json
+from uuid import uuid4
+
+from kongcli._snapshot import diff, index, RESOURCES
+
+
+def _snapshot(**kwargs):
+    data = {resource: [] for resource in RESOURCES}
+    data.update(kwargs)
+    return data
+
+
+def _sample():
+    service = {"id": str(uuid4()), "name": "httpbin", "host": "httpbin", "port": 80}
+    route = {
+        "id": str(uuid4()),
+        "service": {"id": service["id"]},
+        "paths": ["/httpbin"],
+        "methods": None,
+        "hosts": None,
+    }
+    consumer = {"id": str(uuid4()), "username": "foobar", "custom_id": "1234"}
+    acl = {"id": str(uuid4()), "consumer": {"id": consumer["id"]}, "group": "g1"}
+    plugin = {
+        "id": str(uuid4()),
+        "name": "rate-limiting",
+        "route": {"id": route["id"]},
+        "service": None,
+        "consumer": None,
+        "config": {"minute": 20},
+    }
+    return _snapshot(
+        services=[service],
+        routes=[route],
+        consumers=[consumer],
+        acls=[acl],
+        plugins=[plugin],
+    )
+
+
+def _reid(snapshot):
+    # the same configuration in another kong instance has other ids
+    data = json.dumps(snapshot)
+    for resource in RESOURCES:
+        for e in snapshot[resource]:
+            data = data.replace(e["id"], str(uuid4()))
+    return json.loads(data)
+
+
+def test_diff_equal():
+    a = _sample()
+    assert diff(a, a) == []
+    assert diff(a, _reid(a)) == []
+
+
+def test_diff_added_removed():
+    a = _sample()
+    b = deepcopy(a)
+    b["consumers"].append({"id": str(uuid4()), "username": "new"})
+    b["acls"] = []
+
+    assert diff(a, b) == [
+        ("acls", '["username:foobar","g1"]', "removed"),
+        ("consumers", "username:new", "added"),
+    ]
+    assert diff(b, a) == [
+        ("acls", '["username:foobar","g1"]', "added"),
+        ("consumers", "username:new", "removed"),
+    ]
+
+
+def test_diff_changed():
+    a = _sample()
+    b = _reid(a)
+    b["plugins"][0]["config"]["minute"] = 10
+    b["services"][0]["port"] = 8080
+
+    assert diff(a, b) == [
+        (
+            "plugins",
+            '["rate-limiting",null,null,"[\\"name:httpbin\\",[\\"/httpbin\\"],[],[]]"]',
+            "changed",
+        ),
+        ("services", "name:httpbin", "changed"),
+    ]
+
+
+def test_index_old_kong_references():
+    a = _sample()
+    b = deepcopy(a)
+    # kong 0.13 uses flat foreign keys
+    acl = b["acls"][0]
+    acl["consumer_id"] = acl.pop("consumer")["id"]
+    plugin = b["plugins"][0]
+    plugin["route_id"] = plugin.pop("route")["id"]
+    plugin.pop("service")
+    plugin.pop("consumer")
+
+    assert index(a) == index(b)
+
+
+def test_index_duplicate_keys():
+    a = _sample()
+    route = deepcopy(a["routes"][0])
+    route["id"] = str(uuid4())
+    route["strip_path"] = False
+    a["routes"].append(route)
+
+    keys = list(index(a)["routes"])
+    assert len(keys) == 2
+    assert keys[0].endswith("#0")
+    assert keys[1].endswith("#1")
+
+
+def test_index_duplicate_keys_stable_on_edit():
+    a = _sample()
+    a["routes"][0]["created_at"] = 1
+    route = deepcopy(a["routes"][0])
+    route["id"] = str(uuid4())
+    route["created_at"] = 2
+    a["routes"].append(route)
+
+    b = deepcopy(a)
+    # changing the content of one of two equal routes is one change
+    b["routes"][0]["strip_path"] = False
+    changes = diff(a, b)
+    assert [(resource, change) for resource, _, change in changes] == [
+        ("routes", "changed")
+    ]
+
+
+def test_diff_duplicate_keys_other_instance():
+    a = _sample()
+    a["routes"][0]["created_at"] = 1
+    route = deepcopy(a["routes"][0])
+    route["id"] = str(uuid4())
+    route["created_at"] = 2
+    route["strip_path"] = False
+    a["routes"].append(route)
+
+    # the same routes, created in the other order
+    b = _reid(a)
+    b["routes"][0]["created_at"] = 2
+    b["routes"][1]["created_at"] = 1
+    assert diff(a, b) == []
+
+
+def test_diff_hides_keys():
+    a = _sample()
+    b = deepcopy(a)
+    consumer = {"id": a["consumers"][0]["id"]}
+    b["key-auths"].append({"id": str(uuid4()), "consumer": consumer, "key": "s3cr3t"})
+
+    (change,) = diff(a, b)
+    assert change[0] == "key-auths"
+    assert "s3cr3t" not in change[1]
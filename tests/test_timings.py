@@ -0,0 +1,72 @@
+from kongcli import _timings
+from kongcli._timings import endpoint, histogram, percentile, phase
+
+
+def test_endpoint():
+    assert endpoint("get", "/consumers") == "GET /consumers"
+    assert endpoint("GET", "/consumers?offset=abc") == "GET /consumers"
+    assert endpoint("GET", "/consumers/foobar/acls") == "GET /consumers/{id}/acls"
+    assert (
+        endpoint(
+            "DELETE", "/consumers/foobar/acls/2e4a5a5b-0d1c-4a8a-9c49-0e3bd2e4b4e7"
+        )
+        == "DELETE /consumers/{id}/acls/{id}"
+    )
+    assert endpoint("GET", "/plugins/schema/acl") == "GET /plugins/schema/acl"
+    assert endpoint("GET", "/status") == "GET /status"
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 100) == 100
+    assert percentile([3], 95) == 3
+
+
+def test_histogram():
+    assert histogram([]) == []
+    assert histogram([0.0015, 0.002, 0.0001, 0.007]) == [
+        ("<= 1 ms", 1),
+        ("<= 2 ms", 2),
+        ("<= 5 ms", 0),
+        ("<= 10 ms", 1),
+    ]
+    assert histogram([0.03, 6.0]) == [
+        ("<= 50 ms", 1),
+        ("<= 100 ms", 0),
+        ("<= 200 ms", 0),
+        ("<= 500 ms", 0),
+        ("<= 1000 ms", 0),
+        ("<= 2000 ms", 0),
+        ("<= 5000 ms", 0),
+        ("> 5000 ms", 1),
+    ]
+
+
+def test_phase_disabled():
+    assert _timings.TIMINGS is None
+    with phase("fetch"):
+        pass
+    assert _timings.TIMINGS is None
+
+
+def test_report():
+    timings = _timings.enable()
+    try:
+        timings.on_request("GET", "/consumers", None, 0.5)
+        timings.on_request("GET", "/consumers?offset=x", None, 0.1)
+        with phase("fetch"):
+            pass
+        with phase("fetch"):
+            pass
+    finally:
+        _timings.disable()
+
+    assert len(timings.requests["GET /consumers"]) == 2
+    assert len(timings.phases["fetch"]) == 2
+    report = timings.report("plain")
+    assert "GET /consumers" in report
+    assert "fetch" in report
+    lines = report.splitlines()
+    assert lines[1].split()[2:] == ["2", "2", "0", "100.0", "500.0", "500.0", "600.0"]
@@ -0,0 +1,72 @@
+from io import StringIO
+import json
+
+import pytest
+
+from kongcli import _tracing
+from kongcli._tracing import span, traced
+from kongcli._util import run_concurrently
+
+
+@pytest.fixture()
+def output():
+    output = StringIO()
+    _tracing.start(output)
+    yield output
+    _tracing.stop()
+
+
+def _spans(output):
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_span_disabled():
+    assert _tracing.TRACER is None
+    with span("nothing"):
+        pass
+
+
+def test_span_nesting(output):
+    with span("outer", foo="bar"):
+        with span("inner"):
+            pass
+        with pytest.raises(ValueError):
+            with span("failing"):
+                raise ValueError("boom")
+
+    inner, failing, outer = _spans(output)
+    assert outer["name"] == "outer"
+    assert outer["parent_id"] is None
+    assert outer["attributes"] == {"foo": "bar"}
+    assert inner["parent_id"] == outer["span_id"]
+    assert failing["parent_id"] == outer["span_id"]
+    assert failing["error"] == "ValueError: boom"
+    assert len({s["trace_id"] for s in (inner, failing, outer)}) == 1
+
+
+def test_span_threads(output):
+    def work(idx):
+        with span("work", idx=idx):
+            pass
+
+    with span("bulk"):
+        run_concurrently(work, range(5), concurrency=5)
+
+    spans = _spans(output)
+    bulk = spans[-1]
+    assert bulk["name"] == "bulk"
+    works = [s for s in spans if s["name"] == "work"]
+    assert len(works) == 5
+    assert {s["parent_id"] for s in works} == {bulk["span_id"]}
+
+
+def test_traced(output):
+    @traced
+    def add_basic_auth(session, id_, username, password):
+        return username
+
+    assert add_basic_auth(None, "foobar", "user", password="secret") == "user"
+    (s,) = _spans(output)
+    assert s["name"].endswith(".add_basic_auth")
+    # only whitelisted arguments, never secrets
+    assert s["attributes"] == {"id_": "foobar"}
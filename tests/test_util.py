@@ -1,8 +1,19 @@
 from datetime import datetime, timezone
+from threading import get_ident
+from time import monotonic, sleep
 
 import pytest
 
-from kongcli._util import dict_from_dot, get, parse_datetimes
+from kongcli._util import (
+    _reset_cache,
+    cache_stats,
+    dict_from_dot,
+    get,
+    invalidate,
+    parse_datetimes,
+    run_concurrently,
+    RateLimit,
+)
 
 
 def test_get():
@@ -18,6 +29,105 @@ def test_get():
     assert 42 == get("fooo", _helper)  # get from cache and not from calling again
 
 
+def test_cache_stats():
+    _reset_cache()
+    assert cache_stats()["hits"] == 0
+
+    get("stats-a", lambda: [1, 2, 3])
+    get("stats-a", lambda: [1, 2, 3])
+    get("stats-a", lambda: [1, 2, 3])
+    for idx in range(32):
+        get(f"stats-{idx}", lambda: "x")
+
+    stats = cache_stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 33
+    assert stats["evictions"] == 1
+    assert stats["keys"]["stats-a"] == {
+        "hits": 2,
+        "misses": 1,
+        "evictions": 1,
+        "bytes": 0,
+        "fetch_seconds": stats["keys"]["stats-a"]["fetch_seconds"],
+    }
+    assert stats["keys"]["stats-0"]["bytes"] == len('"x"')
+    assert stats["bytes"] == 32 * len('"x"')
+    _reset_cache()
+
+
+def test_cache_stats_invalidate():
+    _reset_cache()
+    get("stats-a", lambda: "x")
+    get("stats-b", lambda: "y")
+
+    invalidate("stats-a")
+    assert cache_stats()["bytes"] == len('"y"')
+    invalidate()
+    stats = cache_stats()
+    # dropped on purpose, not evicted to make room
+    assert stats["evictions"] == 0
+    assert stats["bytes"] == 0
+    _reset_cache()
+
+
+def test_cache_stats_lazy_size(monkeypatch):
+    _reset_cache()
+    sized = []
+    monkeypatch.setattr("kongcli._util._size", lambda obj: sized.append(obj) or 1)
+    get("stats-a", lambda: "x")
+    get("stats-a", lambda: "x")
+    assert sized == []
+    assert cache_stats()["bytes"] == 1
+    assert sized == ["x"]
+    _reset_cache()
+
+
+def test_run_concurrently_order():
+    def _helper(x):
+        sleep(0.01 * (5 - x))
+        return x * 2
+
+    assert run_concurrently(_helper, range(5)) == [0, 2, 4, 6, 8]
+    assert run_concurrently(_helper, range(5), concurrency=1) == [0, 2, 4, 6, 8]
+    assert run_concurrently(_helper, []) == []
+
+
+def test_run_concurrently_threads():
+    def _helper(x):
+        sleep(0.01)
+        return get_ident()
+
+    assert len(set(run_concurrently(_helper, range(4), concurrency=4))) == 4
+    assert len(set(run_concurrently(_helper, range(4), concurrency=1))) == 1
+
+
+def test_run_concurrently_raises():
+    def _helper(x):
+        if x == 3:
+            raise ValueError("3")
+        return x
+
+    with pytest.raises(ValueError):
+        run_concurrently(_helper, range(5))
+
+
+def test_run_concurrently_rate():
+    start = monotonic()
+    assert run_concurrently(lambda x: x, range(6), rate=50) == list(range(6))
+    # first call is immediate, the others are spaced by 20ms
+    assert monotonic() - start >= 0.1
+
+
+def test_rate_limit_spacing():
+    limit = RateLimit(100)
+    times = []
+    for _ in range(3):
+        limit.wait()
+        times.append(monotonic())
+    assert times[1] - times[0] >= 0.009
+    assert times[2] - times[1] >= 0.009
+
+
 def test_dict_from_dot_hierarchy():
     # dots give deeper hierarchy of objects
     assert dict_from_dot([("foo", "12")]) == {"foo": 12}
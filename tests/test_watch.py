@@ -0,0 +1,101 @@
+from threading import Timer
+from time import monotonic
+
+from kongcli._util import json_loads
+from kongcli._watch import changes, fingerprint, rates, ticks
+
+
+def test_rates():
+    prev = {"connections_accepted": 10, "total_requests": 100, "connections_active": 3}
+    curr = {"connections_accepted": 14, "total_requests": 90, "connections_active": 1}
+    assert rates(prev, curr, 2.0) == {
+        "connections_accepted": 2.0,
+        # counter reset, e.g. kong restarted
+        "total_requests": None,
+    }
+    assert rates(prev, curr, 0) == {}
+
+
+def test_ticks():
+    start = monotonic()
+    assert list(ticks(0.05, 3)) == [0, 1, 2]
+    assert monotonic() - start >= 0.1
+
+
+def test_status_watch(fake_kong, fake_invoke):
+    result = fake_invoke(["status", "--watch", "0.1", "--count", "3", "--ndjson"])
+    assert result.exit_code == 0, result.stderr
+    lines = [json_loads(line) for line in result.stdout.splitlines()]
+    assert len(lines) == 3
+    assert lines[0]["rates"] == {}
+    assert lines[0]["database_reachable"] is True
+    # every poll is one request to the fake kong
+    for line in lines[1:]:
+        assert 5 < line["rates"]["total_requests"] < 20
+        assert line["server"]["connections_active"] == 1
+
+    result = fake_invoke(["status", "--watch", "0.1", "--count", "2"])
+    assert result.exit_code == 0, result.stderr
+    first, second = result.stdout.splitlines()
+    assert "accepted=- handled=- requests=- active=1" in first
+    assert "requests=" in second and "/s" in second
+    assert second.endswith("db=ok")
+
+
+def test_changes():
+    prev = {
+        "a": ((1, "h1"), {"id": "a"}),
+        "b": ((1, "h2"), {"id": "b"}),
+        "c": ((1, "h3"), {"id": "c"}),
+    }
+    curr = {
+        "a": ((1, "h1"), {"id": "a"}),
+        "b": ((2, "h2"), {"id": "b", "name": "new"}),
+        "d": ((1, "h4"), {"id": "d"}),
+    }
+    assert sorted(changes(prev, curr), key=lambda c: c[0]) == [
+        ("added", {"id": "d"}),
+        ("changed", {"id": "b", "name": "new"}),
+        ("removed", {"id": "c"}),
+    ]
+
+
+def test_fingerprint():
+    consumer = {"id": "a", "created_at": 1}
+    row = {"id": "a", "acl_groups": "g1"}
+    assert fingerprint(consumer, row) == fingerprint(consumer, dict(row))
+    # joined data changes, the timestamp does not
+    assert fingerprint(consumer, row) != fingerprint(
+        consumer, {**row, "acl_groups": ""}
+    )
+    assert fingerprint(consumer, row) != fingerprint({**consumer, "updated_at": 2}, row)
+
+
+def test_list_watch(fake_kong, fake_invoke):
+    foo = fake_kong.add("consumers", username="foo")
+    fake_kong.add("consumers", username="bar")
+    service = fake_kong.add("services", name="s", host="h")
+    fake_kong.add("routes", service=service["id"], paths=["/a"])
+
+    def change():
+        fake_kong.add("consumers", username="baz")
+        fake_kong.add("acls", consumer=foo["id"], group="g1")
+        fake_kong.add("routes", service=service["id"], paths=["/b"])
+
+    # refreshes at 0, 0.2, 0.4 and 0.6 s, the change happens in between
+    timer = Timer(0.3, change)
+    timer.start()
+    result = fake_invoke(
+        ["--tablefmt", "plain", "list", "consumers", "--watch", "0.2", "--count", "4"]
+        + ["routes", "--watch", "0.2", "--count", "2"]
+    )
+    timer.join()
+    assert result.exit_code == 0, result.stderr
+
+    consumers, routes = result.stdout.split("route_id")
+    assert consumers.count("1 added, 1 changed, 0 removed") == 1
+    assert "added    " in consumers and "baz" in consumers
+    assert "changed  " in consumers and "g1" in consumers
+    # the first refresh of routes already sees both
+    assert "/b" in routes
+    assert "added" not in routes